@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Cliente, MovimientoCredito
+from .models import Cliente, MovimientoCredito, SaldoCorte
 
 
 @admin.register(Cliente)
@@ -25,3 +25,19 @@ class MovimientoCreditoAdmin(admin.ModelAdmin):
         if obj is not None:
             return False
         return super().has_change_permission(request, obj)
+
+
+@admin.register(SaldoCorte)
+class SaldoCorteAdmin(admin.ModelAdmin):
+    """
+    Solo lectura: los cortes los mantiene clientes/libro_credito.py.
+    """
+    list_display = ("fecha", "cliente", "saldo")
+    search_fields = ("cliente__nombre", "cliente__rut")
+    date_hierarchy = "fecha"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,152 @@
+"""
+Antigüedad de la deuda de crédito (informe de cobranza).
+
+La deuda de cada cliente (saldo_actual) se reparte en tramos de 0-30,
+31-60, 61-90 y más de 90 días según las COMPRA que siguen impagas. Los
+abonos y ajustes pagan primero las compras más antiguas, así que lo que se
+debe son siempre las compras más recientes: si C30 es lo comprado en los
+últimos 30 días, el tramo 0-30 es min(saldo, C30); el 31-60 es
+min(saldo, C60) - min(saldo, C30), y así. Lo que no alcanza a cubrir
+ninguna compra de los últimos 90 días (incluido un saldo inicial sin
+movimientos) va a "mas_90".
+
+Con eso basta con tres sumas condicionales por cliente, en una sola
+consulta agrupada que además ordena y pagina en la BD.
+
+Cada página se guarda en el caché "default" durante
+CREDITO_ANTIGUEDAD_TTL segundos. La clave lleva una versión que sube con
+cada movimiento asentado (ver invalidar(), llamado desde
+clientes/libro_credito.py), así que un abono o una venta a crédito se ve
+en la próxima consulta.
+"""
+
+import datetime
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, F, FilteredRelation, Q, Sum, Value
+from django.db.models.functions import Coalesce, Least
+from django.utils import timezone
+
+from .models import Cliente
+
+TRAMOS = ("dias_0_30", "dias_31_60", "dias_61_90", "mas_90")
+ORDENES = ("total", "nombre") + TRAMOS
+
+CENTAVOS = Decimal("0.01")
+
+_CLAVE_VERSION = "credito_antiguedad:version"
+
+
+def version():
+    return cache.get_or_set(_CLAVE_VERSION, 1, timeout=None)
+
+
+def invalidar():
+    """
+    Descarta todas las páginas guardadas (sube la versión de la clave).
+    """
+    try:
+        cache.incr(_CLAVE_VERSION)
+    except ValueError:  # la versión no estaba en el caché
+        cache.set(_CLAVE_VERSION, 1, timeout=None)
+
+
+def con_tramos(clientes, ahora=None):
+    """
+    Anota en el QuerySet de clientes total (saldo_actual) y un campo por
+    tramo de TRAMOS, con tres SUM condicionales sobre sus COMPRA de los
+    últimos 90 días.
+    """
+    ahora = ahora or timezone.now()
+    dinero = DecimalField(max_digits=12, decimal_places=2)
+    cero = Value(0, output_field=dinero)
+
+    def compras_desde(dias):
+        desde = ahora - datetime.timedelta(days=dias)
+        suma = Sum("compras_90__monto", filter=Q(compras_90__fecha__gte=desde))
+        return Least(F("saldo_actual"), Coalesce(suma, cero), output_field=dinero)
+
+    # el JOIN trae solo las COMPRA de los últimos 90 días, no todo el historial
+    compras_90 = FilteredRelation(
+        "movimientos_credito",
+        condition=Q(
+            movimientos_credito__tipo="COMPRA",
+            movimientos_credito__fecha__gte=ahora - datetime.timedelta(days=90),
+        ),
+    )
+    return clientes.annotate(
+        compras_90=compras_90,
+        total=F("saldo_actual"),
+        hasta_30=compras_desde(30),
+        hasta_60=compras_desde(60),
+        hasta_90=compras_desde(90),
+    ).annotate(
+        dias_0_30=F("hasta_30"),
+        dias_31_60=F("hasta_60") - F("hasta_30"),
+        dias_61_90=F("hasta_90") - F("hasta_60"),
+        mas_90=F("saldo_actual") - F("hasta_90"),
+    )
+
+
+def informe(orden, pagina, limite):
+    """
+    (cuerpo JSON en bytes, "HIT" o "MISS"): la página de armar_informe,
+    desde el caché si no hubo movimientos desde que se guardó.
+    """
+    hoy = timezone.localdate().isoformat()
+    clave = f"credito_antiguedad:{version()}:{hoy}:{orden}:{pagina}:{limite}"
+    contenido = cache.get(clave)
+    if contenido is not None:
+        return contenido, "HIT"
+    contenido = json.dumps(armar_informe(orden, pagina, limite)).encode("utf-8")
+    cache.set(clave, contenido, settings.CREDITO_ANTIGUEDAD_TTL)
+    return contenido, "MISS"
+
+
+def _dinero(valor):
+    # SQLite devuelve las restas sin los dos decimales
+    return str(Decimal(valor or 0).quantize(CENTAVOS))
+
+
+def _fila(c):
+    return {
+        "id": c.id,
+        "nombre": c.nombre,
+        "rut": c.rut,
+        "total": _dinero(c.total),
+        **{tramo: _dinero(getattr(c, tramo)) for tramo in TRAMOS},
+    }
+
+
+def armar_informe(orden, pagina, limite, ahora=None):
+    """
+    Página del informe: clientes con deuda ordenados por orden (un valor de
+    ORDENES, con "-" para descendente) y los totales de cada tramo.
+    """
+    ahora = ahora or timezone.now()
+    con_deuda = con_tramos(Cliente.objects.filter(saldo_actual__gt=0), ahora)
+    deudores = con_deuda.only("id", "nombre", "rut", "saldo_actual")
+
+    desc = orden.startswith("-")
+    campo = orden.lstrip("-")
+    deudores = deudores.order_by(F(campo).desc() if desc else F(campo).asc(), "id")
+
+    inicio = (pagina - 1) * limite
+    filas = [_fila(c) for c in deudores[inicio : inicio + limite]]
+
+    sumas = con_deuda.aggregate(
+        clientes=Count("id"),
+        **{f"suma_{t}": Sum(t) for t in ("total",) + TRAMOS},
+    )
+    return {
+        "fecha": timezone.localdate(ahora).isoformat(),
+        "orden": orden,
+        "page": pagina,
+        "limit": limite,
+        "count": sumas["clientes"],
+        "totales": {t: _dinero(sumas[f"suma_{t}"]) for t in ("total",) + TRAMOS},
+        "results": filas,
+    }
@@ -3,17 +3,23 @@ from decimal import Decimal, InvalidOperation
 
 from django.db.models import Q
 from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
 from django.views.decorators.http import require_GET, require_POST
 from django.views.decorators.csrf import csrf_exempt
 
+from yuyitos.http import condicional, etag_de_tablas
+
 from .models import Cliente
 
 
 @csrf_exempt
 @require_GET
+@cache_control(private=True, no_cache=True)
+@condicional(etag_de_tablas(Cliente))
 def lista_clientes(request):
     """
     Lista clientes activos, con búsqueda opcional por nombre, RUT o teléfono.
+    Con If-None-Match responde 304 si ningún cliente cambió.
     """
     q = request.GET.get("q", "").strip()
     try:
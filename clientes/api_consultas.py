@@ -4,8 +4,7 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_GET
 from django.views.decorators.csrf import csrf_exempt
 
-from .models import Cliente, MovimientoCredito
-from .api_credito import _obtener_cliente
+from .api_credito import _obtener_cliente, pagina_de_movimientos
 
 
 @csrf_exempt
@@ -52,7 +51,9 @@ def obtener_saldo_cliente(request):
 @require_GET
 def listar_movimientos_credito(request):
     """
-    Lista los últimos movimientos de crédito de un cliente.
+    Lista los últimos movimientos de crédito de un cliente, por páginas
+    (limit, cursor, fecha_desde y fecha_hasta; ver pagina_de_movimientos
+    en api_credito.py).
     """
     data = {
         "cliente_id": request.GET.get("cliente_id"),
@@ -66,29 +67,10 @@ def listar_movimientos_credito(request):
             status=404,
         )
 
-    try:
-        limit = int(request.GET.get("limit", 20))
-    except ValueError:
-        limit = 20
-
-    movimientos = (
-        MovimientoCredito.objects.filter(cliente=cliente)
-        .order_by("-fecha", "-id")[:limit]
-    )
-
-    movs_data = []
-    for m in movimientos:
-        movs_data.append(
-            {
-                "id": m.id,
-                "tipo": m.tipo,
-                "monto": str(m.monto),
-                "saldo_despues": str(m.saldo_despues),
-                "fecha": m.fecha.isoformat(),
-                "observaciones": m.observaciones,
-                "venta_id": m.venta_id,
-            }
-        )
+    pagina = pagina_de_movimientos(request, cliente)
+    if isinstance(pagina, JsonResponse):
+        return pagina
+    movs_data, siguiente = pagina
 
     return JsonResponse(
         {
@@ -98,5 +80,6 @@ def listar_movimientos_credito(request):
                 "rut": cliente.rut,
             },
             "movimientos": movs_data,
+            "next": siguiente,
         }
     )
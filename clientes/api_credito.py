@@ -1,10 +1,24 @@
+import datetime
 import json
 from decimal import Decimal, InvalidOperation
 
-from django.http import JsonResponse
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.views.decorators.http import require_POST, require_GET
 from django.views.decorators.csrf import csrf_exempt
 
+from yuyitos.idempotencia import idempotente
+from yuyitos.paginacion import (
+    CursorInvalido,
+    codificar_cursor,
+    decodificar_cursor,
+    leer_limite,
+)
+from yuyitos.streaming import iterar, quiere_streaming, respuesta_json_streaming
+from . import antiguedad
+from .libro_credito import inicio_del_dia, saldo_al
 from .models import Cliente, MovimientoCredito
 
 
@@ -35,7 +49,9 @@ def _obtener_cliente(data):
 # 1) ABONAR CRÉDITO 
 # =========================
 @csrf_exempt
+@login_required
 @require_POST
+@idempotente
 def abonar_credito(request):
     """
     Endpoint para registrar un abono al crédito de un cliente.
@@ -48,6 +64,8 @@ def abonar_credito(request):
         "monto": "5000",
         "observaciones": "Pago en efectivo"
     }
+
+    Con la cabecera Idempotency-Key, un reintento no registra un segundo abono.
     """
     try:
         data = json.loads(request.body.decode("utf-8"))
@@ -133,7 +151,19 @@ def ver_saldo(request):
     """
     Consulta el saldo y cupo de un cliente.
     GET /api/creditos/ver-saldo/?cliente_id=... o ?rut=...
+    GET /api/creditos/saldo/?cliente_id=...&fecha=2025-11-30
+        agrega "saldo_al": el saldo al cierre de ese día (ver saldo_al
+        en clientes/libro_credito.py)
     """
+    fecha = None
+    if request.GET.get("fecha"):
+        fecha = parse_date(request.GET["fecha"])
+        if fecha is None:
+            return JsonResponse(
+                {"error": "El parámetro 'fecha' debe tener formato YYYY-MM-DD."},
+                status=400,
+            )
+
     data = {
         "cliente_id": request.GET.get("cliente_id"),
         "rut": request.GET.get("rut"),
@@ -156,20 +186,25 @@ def ver_saldo(request):
     cupo = cliente.cupo_maximo
     disponible = cupo - saldo
 
-    return JsonResponse(
-        {
-            "cliente": {
-                "id": cliente.id,
-                "nombre": cliente.nombre,
-                "rut": cliente.rut,
-                "tiene_credito": cliente.tiene_credito,
-                "cupo_maximo": str(cupo),
-                "saldo_actual": str(saldo),
-                "disponible": str(disponible),
-            }
-        },
-        status=200,
-    )
+    respuesta = {
+        "cliente": {
+            "id": cliente.id,
+            "nombre": cliente.nombre,
+            "rut": cliente.rut,
+            "tiene_credito": cliente.tiene_credito,
+            "cupo_maximo": str(cupo),
+            "saldo_actual": str(saldo),
+            "disponible": str(disponible),
+        }
+    }
+    if fecha is not None:
+        cierre = inicio_del_dia(fecha + datetime.timedelta(days=1))
+        respuesta["saldo_al"] = {
+            "fecha": fecha.isoformat(),
+            "saldo": str(saldo_al(cliente, cierre)),
+        }
+
+    return JsonResponse(respuesta, status=200)
 
 
 # =========================
@@ -179,8 +214,11 @@ def ver_saldo(request):
 @require_GET
 def listar_movimientos(request):
     """
-    Lista los movimientos de crédito de un cliente.
+    Lista los movimientos de crédito de un cliente, del más nuevo al más
+    antiguo, por páginas (ver pagina_de_movimientos).
     GET /api/creditos/movimientos/?cliente_id=... o ?rut=...
+    GET /api/creditos/movimientos/?cliente_id=...&limit=50&cursor=<next>
+    GET /api/creditos/movimientos/?cliente_id=...&fecha_desde=2025-01-01&fecha_hasta=2025-03-31
     """
     data = {
         "cliente_id": request.GET.get("cliente_id"),
@@ -200,28 +238,10 @@ def listar_movimientos(request):
             status=404,
         )
 
-    # límite de resultados
-    try:
-        limit = int(request.GET.get("limit", 20))
-    except ValueError:
-        limit = 20
-    limit = max(1, min(limit, 100))  # entre 1 y 100
-
-    movimientos_qs = cliente.movimientos_credito.order_by("-fecha", "-id")[:limit]
-
-    movimientos = []
-    for mov in movimientos_qs:
-        movimientos.append(
-            {
-                "id": mov.id,
-                "tipo": mov.tipo,
-                "monto": str(mov.monto),
-                "saldo_despues": str(mov.saldo_despues),
-                "fecha": mov.fecha.isoformat(),
-                "venta_id": mov.venta_id,
-                "observaciones": mov.observaciones,
-            }
-        )
+    pagina = pagina_de_movimientos(request, cliente)
+    if isinstance(pagina, JsonResponse):
+        return pagina
+    movimientos, siguiente = pagina
 
     return JsonResponse(
         {
@@ -231,33 +251,103 @@ def listar_movimientos(request):
                 "rut": cliente.rut,
             },
             "movimientos": movimientos,
+            "next": siguiente,
         },
         status=200,
     )
 
 
+def pagina_de_movimientos(request, cliente):
+    """
+    Página de movimientos del cliente, del más nuevo al más antiguo, con
+    paginación por cursor sobre (fecha, id) (ver yuyitos/paginacion.py):
+
+    - limit: entre 1 y 100 (20 por defecto)
+    - cursor: el "next" de la página anterior
+    - fecha_desde / fecha_hasta (YYYY-MM-DD): solo movimientos de esos días
+
+    Cada página es un solo rango del índice (cliente, fecha, id), así que
+    cuesta lo mismo al principio que al final del historial.
+    Devuelve (lista de dicts, cursor siguiente o None) o un JsonResponse 400.
+    """
+    limite = leer_limite(request, por_defecto=20, maximo=100)
+    movimientos = cliente.movimientos_credito.order_by("-fecha", "-id")
+
+    rango = (
+        ("fecha_desde", "fecha__gte", 0),
+        ("fecha_hasta", "fecha__lt", 1),  # hasta el final de ese día
+    )
+    for nombre, lookup, dias in rango:
+        valor = request.GET.get(nombre)
+        if not valor:
+            continue
+        fecha = parse_date(valor)
+        if fecha is None:
+            return JsonResponse(
+                {"error": f"El parámetro '{nombre}' debe tener formato YYYY-MM-DD."},
+                status=400,
+            )
+        limite_fecha = inicio_del_dia(fecha + datetime.timedelta(days=dias))
+        movimientos = movimientos.filter(**{lookup: limite_fecha})
+
+    cursor = request.GET.get("cursor")
+    if cursor:
+        try:
+            ultimo = decodificar_cursor(cursor)
+            fecha, ultimo_id = datetime.datetime.fromisoformat(ultimo["fecha"]), int(ultimo["id"])
+        except (CursorInvalido, KeyError, TypeError, ValueError):
+            return JsonResponse({"error": "El cursor no es válido."}, status=400)
+        # (fecha, id) < (fecha_cursor, id_cursor), escrito como rango sobre
+        # fecha para que la BD busque en el índice en vez de recorrerlo
+        movimientos = movimientos.filter(fecha__lte=fecha).exclude(fecha=fecha, id__gte=ultimo_id)
+
+    # Se pide una fila de más para saber si hay otra página
+    filas = list(movimientos[: limite + 1])
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = codificar_cursor({"fecha": filas[-1].fecha.isoformat(), "id": filas[-1].id})
+    return [_movimiento_a_dict(mov) for mov in filas], siguiente
+
+
+def _movimiento_a_dict(mov):
+    return {
+        "id": mov.id,
+        "tipo": mov.tipo,
+        "monto": str(mov.monto),
+        "saldo_despues": str(mov.saldo_despues),
+        "fecha": mov.fecha.isoformat(),
+        "venta_id": mov.venta_id,
+        "observaciones": mov.observaciones,
+    }
+
+
+def _deudor_a_dict(c):
+    disponible = c.cupo_maximo - c.saldo_actual
+    return {
+        "id": c.id,
+        "nombre": c.nombre,
+        "rut": c.rut,
+        "saldo_actual": str(c.saldo_actual),
+        "cupo_maximo": str(c.cupo_maximo),
+        "disponible": str(disponible),
+    }
+
+
 @csrf_exempt
 @require_GET
 def clientes_con_deuda(request):
     """
     Lista los clientes con saldo_actual > 0, ordenados por deuda.
     GET /api/creditos/clientes-con-deuda/
+    GET /api/creditos/clientes-con-deuda/?stream=1   (ver yuyitos/streaming.py)
     """
     qs = Cliente.objects.filter(saldo_actual__gt=0).order_by("-saldo_actual")
 
-    results = []
-    for c in qs:
-        disponible = c.cupo_maximo - c.saldo_actual
-        results.append(
-            {
-                "id": c.id,
-                "nombre": c.nombre,
-                "rut": c.rut,
-                "saldo_actual": str(c.saldo_actual),
-                "cupo_maximo": str(c.cupo_maximo),
-                "disponible": str(disponible),
-            }
-        )
+    if quiere_streaming(request):
+        return respuesta_json_streaming(map(_deudor_a_dict, iterar(qs)))
+
+    results = [_deudor_a_dict(c) for c in qs]
 
     return JsonResponse(
         {
@@ -265,3 +355,119 @@ def clientes_con_deuda(request):
             "results": results,
         }
     )
+
+
+# =========================
+# 4) ESTADO DE CUENTA
+# =========================
+@csrf_exempt
+@require_GET
+def estado_de_cuenta(request):
+    """
+    Saldo inicial, movimientos y saldo final de un cliente en un rango de días.
+    GET /api/creditos/estado-cuenta/?cliente_id=...&fecha_desde=2025-11-01&fecha_hasta=2025-11-30
+
+    Sin fechas: desde el primer día del mes en curso hasta hoy. El saldo
+    inicial sale del corte de saldo más cercano (no se recorre todo el
+    historial del cliente).
+    """
+    data = {
+        "cliente_id": request.GET.get("cliente_id"),
+        "rut": request.GET.get("rut"),
+    }
+
+    if not data["cliente_id"] and not data["rut"]:
+        return JsonResponse(
+            {"error": "Debe enviar 'cliente_id' o 'rut' como parámetro."},
+            status=400,
+        )
+
+    hoy = timezone.localdate()
+    fechas = {}
+    for nombre, defecto in (("fecha_desde", hoy.replace(day=1)), ("fecha_hasta", hoy)):
+        valor = request.GET.get(nombre)
+        fechas[nombre] = parse_date(valor) if valor else defecto
+        if fechas[nombre] is None:
+            return JsonResponse(
+                {"error": f"El parámetro '{nombre}' debe tener formato YYYY-MM-DD."},
+                status=400,
+            )
+    if fechas["fecha_desde"] > fechas["fecha_hasta"]:
+        return JsonResponse(
+            {"error": "'fecha_desde' no puede ser posterior a 'fecha_hasta'."},
+            status=400,
+        )
+
+    cliente = _obtener_cliente(data)
+    if cliente is None:
+        return JsonResponse(
+            {"error": "Cliente no encontrado."},
+            status=404,
+        )
+
+    inicio = inicio_del_dia(fechas["fecha_desde"])
+    fin = inicio_del_dia(fechas["fecha_hasta"] + datetime.timedelta(days=1))
+
+    saldo_inicial = saldo_al(cliente, inicio)
+    saldo = saldo_inicial
+    movimientos = []
+    for mov in cliente.movimientos_credito.filter(fecha__gte=inicio, fecha__lt=fin).order_by("fecha", "id"):
+        saldo += mov.monto if mov.tipo == "COMPRA" else -mov.monto
+        movimientos.append(_movimiento_a_dict(mov))
+
+    return JsonResponse(
+        {
+            "cliente": {
+                "id": cliente.id,
+                "nombre": cliente.nombre,
+                "rut": cliente.rut,
+            },
+            "fecha_desde": fechas["fecha_desde"].isoformat(),
+            "fecha_hasta": fechas["fecha_hasta"].isoformat(),
+            "saldo_inicial": str(saldo_inicial),
+            "movimientos": movimientos,
+            "saldo_final": str(saldo),
+        },
+        status=200,
+    )
+
+
+# =========================
+# 5) ANTIGÜEDAD DE LA DEUDA
+# =========================
+@csrf_exempt
+@require_GET
+def antiguedad_deuda(request):
+    """
+    Deuda de los clientes repartida en tramos de 0-30, 31-60, 61-90 y más
+    de 90 días (ver clientes/antiguedad.py), paginada y ordenada.
+    GET /api/creditos/antiguedad/?orden=-mas_90&page=1&limit=50
+
+    orden: total, nombre, dias_0_30, dias_31_60, dias_61_90 o mas_90, con
+    "-" para descendente (por defecto -total). "totales" suma todos los
+    clientes, no solo la página. Cabecera X-Cache: HIT o MISS.
+    """
+    orden = request.GET.get("orden", "-total")
+    if orden.lstrip("-") not in antiguedad.ORDENES:
+        opciones = ", ".join(antiguedad.ORDENES)
+        return JsonResponse(
+            {"error": f"'orden' debe ser uno de: {opciones} (con '-' para descendente)."},
+            status=400,
+        )
+
+    try:
+        pagina = int(request.GET.get("page", 1))
+    except ValueError:
+        pagina = 0
+    if pagina < 1:
+        return JsonResponse(
+            {"error": "'page' debe ser un entero mayor que 0."},
+            status=400,
+        )
+
+    limite = leer_limite(request, por_defecto=50, maximo=500)
+
+    contenido, estado = antiguedad.informe(orden, pagina, limite)
+    response = HttpResponse(contenido, content_type="application/json")
+    response["X-Cache"] = estado
+    return response
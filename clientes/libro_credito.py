@@ -0,0 +1,383 @@
+"""
+Libro de crédito: único lugar donde se graban movimientos de crédito y se
+mueve Cliente.saldo_actual.
+
+asentar(movimientos) recibe MovimientoCredito sin grabar (de uno o varios
+clientes) y, en una transacción:
+
+1. bloquea las filas de esos clientes (SELECT ... FOR UPDATE, en orden de
+   id para que dos cajas no se bloqueen cruzadas) y lee su saldo;
+2. valida cada movimiento contra ese saldo (cupo, deuda) y calcula su
+   saldo_despues, en el orden recibido;
+3. inserta los movimientos y actualiza el saldo de todos los clientes con
+   un solo UPDATE (bulk_update).
+
+Como el saldo se lee con la fila bloqueada, dos cajas que cargan al mismo
+cliente a la vez se turnan y no se pierde ningún movimiento (el saldo del
+objeto Cliente que tenga cada vista en memoria no se usa para calcular).
+En SQLite FOR UPDATE no existe: el mismo efecto se logra con
+transaction_mode IMMEDIATE (ver DATABASES en yuyitos/settings.py).
+
+Si un movimiento no pasa la validación se lanza ValidationError y no queda
+nada grabado.
+
+Cortes de saldo: cuando llega el primer movimiento de un mes nuevo para un
+cliente, asentar graba un SaldoCorte con su saldo al cierre del último mes
+en que tuvo movimientos (el saldo bloqueado, antes de aplicar el nuevo).
+saldo_al() parte del corte más cercano y suma solo los movimientos
+posteriores. Si se asienta un movimiento con fecha anterior a cortes ya
+grabados, esos cortes se borran (reconstruir_cortes los vuelve a calcular).
+
+Un saldo cargado sin movimiento (ej: editado en el admin) se registra con
+asentar_saldos_iniciales(), que agrega el movimiento sin mover el saldo.
+"""
+
+import datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+from django.db.models import Case, F, Min, Sum, When
+from django.utils import timezone
+
+TIPOS = ("COMPRA", "ABONO", "AJUSTE")
+
+
+def nuevo_saldo(cliente, tipo, monto):
+    """
+    Saldo que deja un movimiento sobre el saldo actual del cliente, o
+    ValidationError si no corresponde.
+    """
+    if tipo == "COMPRA":
+        if not cliente.puede_comprar_a_credito(monto):
+            raise ValidationError(
+                "El monto de la compra supera el cupo disponible del cliente."
+            )
+        return cliente.saldo_actual + monto
+
+    if tipo == "ABONO":
+        if monto <= 0:
+            raise ValidationError("El abono debe ser mayor que 0.")
+        if monto > cliente.saldo_actual:
+            raise ValidationError(
+                "El abono no puede ser mayor que la deuda actual del cliente."
+            )
+        return cliente.saldo_actual - monto
+
+    if tipo == "AJUSTE":
+        return cliente.saldo_actual - monto
+
+    raise ValidationError(f"Tipo de movimiento no soportado: {tipo}")
+
+
+def fin_de_mes(fecha):
+    """
+    Último día del mes de fecha (un date).
+    """
+    siguiente = fecha.replace(day=28) + datetime.timedelta(days=4)
+    return siguiente - datetime.timedelta(days=siguiente.day)
+
+
+def inicio_del_dia(fecha):
+    """
+    Primer instante (aware, hora local) del día fecha.
+    """
+    return timezone.make_aware(datetime.datetime.combine(fecha, datetime.time.min))
+
+
+def _mes(momento):
+    local = timezone.localdate(momento)
+    return (local.year, local.month)
+
+
+def _monto_con_signo():
+    return Case(When(tipo="COMPRA", then=F("monto")), default=-F("monto"))
+
+
+def suma_con_signo(movimientos):
+    """
+    COMPRA suma, ABONO y AJUSTE restan: cuánto movieron el saldo los
+    movimientos del QuerySet dado (0 si no hay).
+    """
+    total = movimientos.aggregate(total=Sum(_monto_con_signo()))["total"]
+    return total or Decimal("0")
+
+
+def sumas_por_cliente(movimientos):
+    """
+    {cliente_id: suma con signo} de los movimientos del QuerySet dado, con
+    un solo GROUP BY. Los clientes sin movimientos no aparecen.
+    """
+    return dict(
+        movimientos.order_by()
+        .values("cliente_id")
+        .annotate(total=Sum(_monto_con_signo()))
+        .values_list("cliente_id", "total")
+    )
+
+
+def asentar(movimientos):
+    """
+    Graba los MovimientoCredito dados (sin grabar, con cliente, tipo y
+    monto) y actualiza el saldo de sus clientes. Ver el docstring del módulo.
+
+    Completa saldo_despues (y el id) de cada movimiento y, si el movimiento
+    trae el objeto Cliente cargado, deja su saldo_actual al día.
+    Devuelve la misma lista.
+    """
+    from . import antiguedad
+    from .models import Cliente, MovimientoCredito  # models importa este módulo
+
+    movimientos = list(movimientos)
+    if not movimientos:
+        return movimientos
+
+    # Sin savepoint propio (son dos consultas menos por venta): la
+    # validación se hace antes de escribir y su error se lanza afuera del
+    # bloque, así no deja marcada para rollback la transacción de quien llama.
+    error = None
+    with transaction.atomic(savepoint=False):
+        clientes = (
+            Cliente.objects.select_for_update()
+            .filter(pk__in={m.cliente_id for m in movimientos})
+            .only(
+                "id",
+                "tiene_credito",
+                "es_activo",
+                "cupo_maximo",
+                "saldo_actual",
+                "ultimo_movimiento_en",
+            )
+            .order_by("pk")
+            .in_bulk()
+        )
+
+        ahora = timezone.now()
+        cortes = {}  # (cliente_id, fecha) -> saldo al cierre de ese día
+        desactualizados = {}  # cliente_id -> primer día con cortes a borrar
+        try:
+            for mov in movimientos:
+                cliente = clientes[mov.cliente_id]
+                mov.fecha = mov.fecha or ahora
+                ultimo = cliente.ultimo_movimiento_en
+                if ultimo is not None and _mes(mov.fecha) > _mes(ultimo):
+                    # primer movimiento del mes: se cierra el último mes con movimientos
+                    cierre = fin_de_mes(timezone.localdate(ultimo))
+                    cortes[(cliente.pk, cierre)] = cliente.saldo_actual
+                elif ultimo is not None and mov.fecha < ultimo:
+                    dia = timezone.localdate(mov.fecha)
+                    if dia < desactualizados.get(cliente.pk, datetime.date.max):
+                        desactualizados[cliente.pk] = dia
+                if ultimo is None or mov.fecha > ultimo:
+                    cliente.ultimo_movimiento_en = mov.fecha
+
+                mov.monto = Decimal(mov.monto)
+                mov.saldo_despues = nuevo_saldo(cliente, mov.tipo, mov.monto)
+                cliente.saldo_actual = mov.saldo_despues
+                cliente.actualizado_en = ahora
+        except ValidationError as e:
+            error = e
+        else:
+            base = connections[router.db_for_write(MovimientoCredito)]
+            if len(movimientos) > 1 and base.features.can_return_rows_from_bulk_insert:
+                MovimientoCredito.objects.bulk_create(movimientos)
+            else:
+                # sin RETURNING (MySQL) bulk_create no trae los ids
+                for mov in movimientos:
+                    mov.save(asentado=True)
+
+            Cliente.objects.bulk_update(
+                clientes.values(),
+                ["saldo_actual", "actualizado_en", "ultimo_movimiento_en"],
+            )
+            _grabar_cortes(cortes, desactualizados)
+
+            # Ya (para esta transacción) y al confirmar: otro hilo pudo
+            # guardar entremedio un informe sin estos movimientos
+            antiguedad.invalidar()
+            transaction.on_commit(antiguedad.invalidar)
+
+    if error is not None:
+        raise error
+
+    for mov in movimientos:
+        if MovimientoCredito.cliente.is_cached(mov):
+            mov.cliente.saldo_actual = clientes[mov.cliente_id].saldo_actual
+            mov.cliente.actualizado_en = ahora
+            mov.cliente.ultimo_movimiento_en = clientes[mov.cliente_id].ultimo_movimiento_en
+    return movimientos
+
+
+def _grabar_cortes(cortes, desactualizados):
+    """
+    Graba (o reemplaza) los cortes nuevos y borra los que dejó mal un
+    movimiento con fecha anterior. Sin cambio de mes ni fechas atrasadas
+    no hace ninguna consulta.
+    """
+    from .models import SaldoCorte
+
+    for cliente_id, dia in desactualizados.items():
+        SaldoCorte.objects.filter(cliente_id=cliente_id, fecha__gte=dia).delete()
+
+    nuevos = [
+        SaldoCorte(cliente_id=cliente_id, fecha=fecha, saldo=saldo)
+        for (cliente_id, fecha), saldo in cortes.items()
+        if fecha < desactualizados.get(cliente_id, datetime.date.max)
+    ]
+    if nuevos:
+        SaldoCorte.objects.bulk_create(
+            nuevos,
+            update_conflicts=True,
+            unique_fields=["cliente", "fecha"],
+            update_fields=["saldo"],
+        )
+
+
+def asentar_saldos_iniciales(diferencias):
+    """
+    Registra en el libro el saldo inicial que tienen los clientes sin
+    movimientos que lo expliquen: {cliente: diferencia}, con diferencia =
+    saldo_actual - suma de sus movimientos (ver conciliar_saldos). Las
+    filas de esos clientes deben estar bloqueadas por quien llama.
+
+    A diferencia de asentar(), no mueve saldo_actual: la deuda ya estaba en
+    el saldo y solo faltaba en el libro. Graba un AJUSTE por -diferencia
+    (un AJUSTE resta) fechado antes del primer movimiento del cliente, así
+    el saldo que sigue a cada movimiento ya grabado queda bien explicado.
+    Devuelve los movimientos grabados.
+    """
+    from . import antiguedad
+    from .models import Cliente, MovimientoCredito
+
+    if not diferencias:
+        return []
+
+    primeras = dict(
+        MovimientoCredito.objects.filter(cliente__in=list(diferencias))
+        .order_by()
+        .values("cliente_id")
+        .annotate(primera=Min("fecha"))
+        .values_list("cliente_id", "primera")
+    )
+    movimientos, sin_movimientos = [], []
+    for cliente, diferencia in diferencias.items():
+        fecha = cliente.creado_en
+        primera = primeras.get(cliente.pk)
+        if primera is not None:
+            fecha = min(fecha, primera - datetime.timedelta(seconds=1))
+        movimientos.append(
+            MovimientoCredito(
+                cliente=cliente,
+                tipo="AJUSTE",
+                monto=-diferencia,
+                saldo_despues=diferencia,
+                fecha=fecha,
+                observaciones="Saldo inicial sin movimiento (conciliar_saldos).",
+            )
+        )
+        if cliente.ultimo_movimiento_en is None:
+            cliente.ultimo_movimiento_en = fecha
+            sin_movimientos.append(cliente)
+
+    with transaction.atomic(savepoint=False):
+        MovimientoCredito.objects.bulk_create(movimientos)
+        Cliente.objects.bulk_update(sin_movimientos, ["ultimo_movimiento_en"])
+        antiguedad.invalidar()
+        transaction.on_commit(antiguedad.invalidar)
+    return movimientos
+
+
+def saldo_al(cliente, momento):
+    """
+    Saldo del cliente justo antes de momento (datetime aware). Para el
+    saldo al cierre del día X, momento = inicio_del_dia(X + 1 día).
+
+    Parte del corte más cercano anterior y suma los movimientos desde el
+    corte hasta momento (con el índice (cliente, fecha, id) se leen solo
+    esos). Sin cortes anteriores, resta al saldo actual los movimientos
+    posteriores a momento.
+    """
+    from .models import Cliente, SaldoCorte
+
+    movimientos = cliente.movimientos_credito.all()
+    corte = (
+        SaldoCorte.objects.filter(cliente=cliente, fecha__lt=timezone.localdate(momento))
+        .order_by("-fecha")
+        .values_list("fecha", "saldo")
+        .first()
+    )
+    if corte is not None:
+        fecha, saldo = corte
+        desde = inicio_del_dia(fecha + datetime.timedelta(days=1))
+        return saldo + suma_con_signo(movimientos.filter(fecha__gte=desde, fecha__lt=momento))
+
+    saldo_actual = Cliente.objects.values_list("saldo_actual", flat=True).get(pk=cliente.pk)
+    return saldo_actual - suma_con_signo(movimientos.filter(fecha__gte=momento))
+
+
+def reconstruir_cortes(clientes=None):
+    """
+    Vuelve a calcular todos los cortes (de los clientes dados, o de todos)
+    a partir de los movimientos: uno por cada mes con movimientos, salvo el
+    mes en curso.
+
+    El saldo de cada corte es el saldo actual menos los movimientos
+    posteriores al cierre, igual que en saldo_al, así que cuadra aunque
+    haya movimientos asentados con fecha atrasada. Recorre los movimientos
+    con un iterador, sin cargarlos todos. Devuelve la cantidad de cortes.
+    """
+    from .models import Cliente, MovimientoCredito, SaldoCorte
+
+    movimientos = MovimientoCredito.objects.all()
+    cortes = SaldoCorte.objects.all()
+    saldos = Cliente.objects.filter(ultimo_movimiento_en__isnull=False)
+    if clientes is not None:
+        movimientos = movimientos.filter(cliente__in=clientes)
+        cortes = cortes.filter(cliente__in=clientes)
+        saldos = saldos.filter(pk__in=[getattr(c, "pk", c) for c in clientes])
+
+    mes_actual = _mes(timezone.now())
+    total = 0
+    lote = []
+
+    def cerrar_cliente(cliente_id, acumulados, neto):
+        # acumulados: (cierre, suma con signo hasta el cierre); neto: suma total
+        inicial = saldos_actuales.get(cliente_id, neto) - neto
+        for cierre, acumulado in acumulados:
+            lote.append(SaldoCorte(cliente_id=cliente_id, fecha=cierre, saldo=inicial + acumulado))
+
+    with transaction.atomic():
+        cortes.delete()
+        saldos_actuales = dict(saldos.values_list("id", "saldo_actual"))
+        filas = (
+            movimientos.order_by("cliente_id", "fecha", "id")
+            .values_list("cliente_id", "fecha", "tipo", "monto")
+            .iterator(chunk_size=2000)
+        )
+
+        cliente_actual, mes_anterior = None, None
+        acumulados, neto = [], Decimal("0")
+        for cliente_id, fecha, tipo, monto in filas:
+            mes = _mes(fecha)
+            if cliente_id != cliente_actual:
+                if cliente_actual is not None:
+                    cerrar_cliente(cliente_actual, acumulados, neto)
+                cliente_actual, mes_anterior = cliente_id, None
+                acumulados, neto = [], Decimal("0")
+            elif mes != mes_anterior and mes_anterior < mes_actual:
+                acumulados.append((fin_de_mes(datetime.date(*mes_anterior, 1)), neto))
+            mes_anterior = mes
+            neto += monto if tipo == "COMPRA" else -monto
+
+            if len(lote) >= 1000:
+                SaldoCorte.objects.bulk_create(lote)
+                total += len(lote)
+                lote = []
+
+        if cliente_actual is not None:
+            if mes_anterior < mes_actual:
+                acumulados.append((fin_de_mes(datetime.date(*mes_anterior, 1)), neto))
+            cerrar_cliente(cliente_actual, acumulados, neto)
+        SaldoCorte.objects.bulk_create(lote)
+        total += len(lote)
+    return total
@@ -0,0 +1,203 @@
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection
+from django.utils import timezone
+
+from clientes.libro_credito import asentar, nuevo_saldo, sumas_por_cliente
+from clientes.models import Cliente, MovimientoCredito
+from yuyitos.bench import commit_actual, resumen_latencias
+
+
+# Los clientes del benchmark llevan este prefijo en el RUT, para borrarlos
+PREFIJO = "BENCH-"
+CUPO = Decimal("1000000.00")
+
+
+def _libro(movimientos):
+    """
+    clientes/libro_credito.py: fila del cliente bloqueada, todo en una llamada.
+    """
+    asentar(
+        MovimientoCredito(cliente_id=cliente_id, tipo=tipo, monto=monto)
+        for cliente_id, tipo, monto in movimientos
+    )
+
+
+def _leer_y_grabar(movimientos):
+    """
+    Forma antigua (leer el saldo, calcular en Python y grabarlo), para
+    comparar. Bajo concurrencia pierde movimientos.
+    """
+    for cliente_id, tipo, monto in movimientos:
+        cliente = Cliente.objects.get(pk=cliente_id)
+        saldo = nuevo_saldo(cliente, tipo, monto)
+        MovimientoCredito(
+            cliente=cliente, tipo=tipo, monto=monto, saldo_despues=saldo
+        ).save(asentado=True)
+        cliente.saldo_actual = saldo
+        cliente.save(update_fields=["saldo_actual", "actualizado_en"])
+
+
+MODOS = {
+    "libro": _libro,
+    "leer-grabar": _leer_y_grabar,
+}
+
+
+def verificar(clientes):
+    """
+    Por cliente: saldo_actual contra COMPRA - ABONO - AJUSTE de sus
+    movimientos, y cuántos saldo_despues no siguen del movimiento anterior.
+    """
+    esperado = sumas_por_cliente(MovimientoCredito.objects.filter(cliente__in=clientes))
+
+    anterior = defaultdict(Decimal)
+    cadena_rota = 0
+    movimientos = (
+        MovimientoCredito.objects.filter(cliente__in=clientes)
+        .order_by("id")
+        .values_list("cliente_id", "tipo", "monto", "saldo_despues")
+        .iterator()
+    )
+    for cliente_id, tipo, monto, saldo_despues in movimientos:
+        signo = 1 if tipo == "COMPRA" else -1
+        if anterior[cliente_id] + signo * monto != saldo_despues:
+            cadena_rota += 1
+        anterior[cliente_id] = saldo_despues
+
+    diferencias = {
+        c.pk: str(c.saldo_actual - esperado.get(c.pk, 0))
+        for c in Cliente.objects.filter(pk__in=[c.pk for c in clientes])
+        if c.saldo_actual != esperado.get(c.pk, 0)
+    }
+    return diferencias, cadena_rota
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de concurrencia del crédito: varios hilos asientan COMPRA y "
+        "ABONO sobre los mismos clientes y se verifica que los saldos "
+        "cuadren con los movimientos. El resultado se guarda en JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hilos", type=int, default=8)
+        parser.add_argument(
+            "--operaciones",
+            type=int,
+            default=200,
+            help="Llamadas por hilo.",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=1,
+            help="Movimientos por llamada (de clientes al azar).",
+        )
+        parser.add_argument(
+            "--clientes",
+            type=int,
+            default=3,
+            help="Pocos clientes = más cajas cargando al mismo a la vez.",
+        )
+        parser.add_argument("--modo", choices=sorted(MODOS), default="libro")
+        parser.add_argument("--semilla", type=int, default=1)
+        parser.add_argument("--salida", default=None)
+
+    def handle(self, *args, **options):
+        hilos = options["hilos"]
+        asentar_lote = MODOS[options["modo"]]
+
+        Cliente.objects.filter(rut__startswith=PREFIJO).delete()
+        clientes = [
+            Cliente.objects.create(
+                nombre=f"Cliente bench {n}",
+                rut=f"{PREFIJO}{n}",
+                tiene_credito=True,
+                cupo_maximo=CUPO,
+            )
+            for n in range(options["clientes"])
+        ]
+        ids = [c.pk for c in clientes]
+
+        latencias = [[] for _ in range(hilos)]
+        rechazos = [0] * hilos
+        errores_bloqueo = [0] * hilos
+        partida = threading.Barrier(hilos)
+
+        def trabajar(n):
+            azar = random.Random(options["semilla"] * 1000 + n)
+            try:
+                partida.wait()
+                for _ in range(options["operaciones"]):
+                    movimientos = [
+                        (
+                            azar.choice(ids),
+                            azar.choice(("COMPRA", "ABONO")),
+                            Decimal(azar.randint(1, 50)),
+                        )
+                        for _ in range(options["lote"])
+                    ]
+                    inicio = time.perf_counter()
+                    try:
+                        asentar_lote(movimientos)
+                    except ValidationError:
+                        # ej: abono mayor que la deuda
+                        rechazos[n] += 1
+                    except OperationalError:
+                        # ej: "database is locked" en SQLite
+                        errores_bloqueo[n] += 1
+                    latencias[n].append(time.perf_counter() - inicio)
+            finally:
+                connection.close()
+
+        close_old_connections()
+        inicio = time.perf_counter()
+        threads = [threading.Thread(target=trabajar, args=(n,)) for n in range(hilos)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        duracion = time.perf_counter() - inicio
+
+        diferencias, cadena_rota = verificar(clientes)
+        llamadas = hilos * options["operaciones"]
+        resultado = {
+            "fecha": timezone.now().isoformat(),
+            "commit": commit_actual(),
+            "base_de_datos": connection.vendor,
+            "modo": options["modo"],
+            "hilos": hilos,
+            "llamadas": llamadas,
+            "movimientos_por_llamada": options["lote"],
+            "clientes": len(clientes),
+            "rechazos": sum(rechazos),
+            "errores_bloqueo": sum(errores_bloqueo),
+            "movimientos_grabados": MovimientoCredito.objects.filter(cliente__in=clientes).count(),
+            "duracion_s": round(duracion, 3),
+            "llamadas_por_s": round(llamadas / duracion, 1),
+            "latencia_ms": resumen_latencias([x for lista in latencias for x in lista]),
+            "saldos_descuadrados": diferencias,
+            "saldo_despues_inconsistentes": cadena_rota,
+        }
+
+        Cliente.objects.filter(pk__in=ids).delete()
+
+        texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if options["salida"]:
+            with open(options["salida"], "w", encoding="utf-8") as archivo:
+                archivo.write(texto + "\n")
+            self.stdout.write(f"Resultado guardado en {options['salida']}")
+        self.stdout.write(texto)
+
+        if diferencias or cadena_rota:
+            self.stdout.write(self.style.ERROR("Los saldos NO cuadran con los movimientos."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Saldos exactos: cuadran con los movimientos."))
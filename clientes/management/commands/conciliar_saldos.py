@@ -0,0 +1,147 @@
+import csv
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from clientes import antiguedad
+from clientes.libro_credito import (
+    asentar_saldos_iniciales,
+    reconstruir_cortes,
+    sumas_por_cliente,
+)
+from clientes.models import Cliente, MovimientoCredito
+
+
+CERO = Decimal("0.00")
+COLUMNAS = ["cliente_id", "rut", "nombre", "saldo_actual", "saldo_movimientos", "diferencia"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara Cliente.saldo_actual con la suma de sus movimientos de "
+        "crédito (COMPRA - ABONO - AJUSTE) y escribe un informe CSV con los "
+        "clientes descuadrados. Con --reparar registra cada diferencia como "
+        "saldo inicial (un movimiento AJUSTE que no cambia saldo_actual); con "
+        "--reparar --forzar, en cambio, deja saldo_actual igual a la suma de "
+        "los movimientos. En los dos casos recalcula sus cortes de saldo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--salida",
+            default=None,
+            help="Archivo CSV del informe (por defecto, la salida estándar).",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=5000,
+            help="Clientes por lote (la memoria no crece con el total).",
+        )
+        parser.add_argument(
+            "--reparar",
+            action="store_true",
+            help=(
+                "Cuadrar el libro con los saldos (con las filas bloqueadas): "
+                "la diferencia queda como movimiento AJUSTE de saldo inicial."
+            ),
+        )
+        parser.add_argument(
+            "--forzar",
+            action="store_true",
+            help=(
+                "Con --reparar: sobrescribir saldo_actual con la suma de los "
+                "movimientos (borra los saldos iniciales sin movimiento)."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["forzar"] and not options["reparar"]:
+            raise CommandError("--forzar solo se usa junto con --reparar.")
+
+        if options["salida"]:
+            archivo = open(options["salida"], "w", newline="", encoding="utf-8")
+        else:
+            archivo = self.stdout
+        informe = csv.writer(archivo, lineterminator="\n")
+        informe.writerow(COLUMNAS)
+
+        inicio = time.perf_counter()
+        revisados = descuadrados = 0
+        ultimo_id = 0
+        try:
+            while True:
+                # un lote = clientes id > ultimo_id + un GROUP BY de sus movimientos
+                with transaction.atomic():
+                    clientes = Cliente.objects.filter(pk__gt=ultimo_id).order_by("pk")
+                    if options["reparar"]:
+                        # asentar() no puede mover estos saldos mientras se comparan
+                        clientes = clientes.select_for_update()
+                    lote = list(
+                        clientes.only(
+                            "id", "rut", "nombre", "saldo_actual", "creado_en", "ultimo_movimiento_en"
+                        )[: options["lote"]]
+                    )
+                    if not lote:
+                        break
+                    ultimo_id = lote[-1].pk
+
+                    esperados = sumas_por_cliente(
+                        MovimientoCredito.objects.filter(
+                            cliente_id__gte=lote[0].pk, cliente_id__lte=ultimo_id
+                        )
+                    )
+                    descuadre = {}  # cliente -> saldo_actual - esperado
+                    for cliente in lote:
+                        # SQLite devuelve la suma sin los dos decimales
+                        esperado = esperados.get(cliente.pk, CERO).quantize(CERO)
+                        if cliente.saldo_actual == esperado:
+                            continue
+                        diferencia = cliente.saldo_actual - esperado
+                        informe.writerow(
+                            [
+                                cliente.pk,
+                                cliente.rut,
+                                cliente.nombre,
+                                cliente.saldo_actual,
+                                esperado,
+                                diferencia,
+                            ]
+                        )
+                        descuadre[cliente] = diferencia
+
+                    if options["reparar"] and options["forzar"] and descuadre:
+                        for cliente, diferencia in descuadre.items():
+                            cliente.saldo_actual -= diferencia
+                            cliente.actualizado_en = timezone.now()
+                        Cliente.objects.bulk_update(list(descuadre), ["saldo_actual", "actualizado_en"])
+                        # los cortes se calcularon con el saldo que se acaba de cambiar
+                        reconstruir_cortes(list(descuadre))
+                        transaction.on_commit(antiguedad.invalidar)
+                    elif options["reparar"] and descuadre:
+                        # el saldo queda igual: el libro pasa a explicarlo
+                        asentar_saldos_iniciales(descuadre)
+
+                revisados += len(lote)
+                descuadrados += len(descuadre)
+        finally:
+            if options["salida"]:
+                archivo.close()
+
+        resumen = (
+            f"Clientes revisados: {revisados}. Descuadrados: {descuadrados}. "
+            f"({time.perf_counter() - inicio:.1f} s)"
+        )
+        # con el informe en la salida estándar, el resumen va a stderr
+        salida = self.stdout if options["salida"] else self.stderr
+        if not descuadrados:
+            salida.write(self.style.SUCCESS(resumen))
+        elif options["forzar"]:
+            salida.write(self.style.WARNING(resumen + " Saldos sobrescritos con los movimientos."))
+        elif options["reparar"]:
+            salida.write(self.style.WARNING(resumen + " Diferencias registradas como saldo inicial."))
+        else:
+            salida.write(self.style.ERROR(resumen + " Usar --reparar para corregirlos."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from clientes.libro_credito import reconstruir_cortes
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los cortes de saldo mensuales (SaldoCorte) a partir de los "
+        "movimientos de crédito. Usar después de migrar, para el historial "
+        "existente, o si se asentaron movimientos con fecha atrasada."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cliente",
+            type=int,
+            action="append",
+            help="Id de cliente (se puede repetir). Sin esto, todos.",
+        )
+
+    def handle(self, *args, **options):
+        total = reconstruir_cortes(options["cliente"])
+        self.stdout.write(self.style.SUCCESS(f"Cortes grabados: {total}"))
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+
+def llenar_ultimo_movimiento(apps, schema_editor):
+    """
+    ultimo_movimiento_en de los clientes con movimientos. Los cortes del
+    historial existente se calculan con: python manage.py reconstruir_cortes
+    """
+    Cliente = apps.get_model("clientes", "Cliente")
+    MovimientoCredito = apps.get_model("clientes", "MovimientoCredito")
+
+    ultimo = (
+        MovimientoCredito.objects.filter(cliente=OuterRef("pk"))
+        .values("cliente")
+        .annotate(ultimo=Max("fecha"))
+        .values("ultimo")
+    )
+    Cliente.objects.update(ultimo_movimiento_en=Subquery(ultimo))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0003_movimientocredito_venta'),
+        ('ventas', '0002_venta_anulacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoCorte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('saldo', models.DecimalField(decimal_places=2, max_digits=12)),
+            ],
+            options={
+                'verbose_name': 'Corte de saldo',
+                'verbose_name_plural': 'Cortes de saldo',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='ultimo_movimiento_en',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='movimientocredito',
+            index=models.Index(fields=['cliente', 'fecha', 'id'], name='movcredito_cliente_fecha'),
+        ),
+        migrations.AddField(
+            model_name='saldocorte',
+            name='cliente',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cortes', to='clientes.cliente'),
+        ),
+        migrations.AddConstraint(
+            model_name='saldocorte',
+            constraint=models.UniqueConstraint(fields=('cliente', 'fecha'), name='corte_unico_por_dia'),
+        ),
+        migrations.RunPython(llenar_ultimo_movimiento, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,5 @@
 from decimal import Decimal
 
-from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
 
@@ -31,6 +30,10 @@ class Cliente(models.Model):
         help_text="Deuda actual del cliente (monto pendiente)",
     )
 
+    # Fecha del último movimiento de crédito (la mantiene el libro de
+    # crédito para saber cuándo cerrar el mes con un SaldoCorte)
+    ultimo_movimiento_en = models.DateTimeField(null=True, blank=True, editable=False)
+
     # Estado y auditoría
     es_activo = models.BooleanField(default=True)
     creado_en = models.DateTimeField(auto_now_add=True)
@@ -61,49 +64,22 @@ class Cliente(models.Model):
         Crea un MovimientoCredito usando este cliente como dueño.
         Se usa desde Venta.save() para crear la COMPRA, y también
         lo puedes llamar cuando registres abonos manuales en una vista.
+
+        El saldo se valida y se actualiza en clientes/libro_credito.py, con
+        la fila del cliente bloqueada; al volver, self.saldo_actual queda
+        al día.
         """
-        from .models import MovimientoCredito  # evita import circular
-
-        monto = Decimal(monto)
-
-        # Validaciones de negocio reutilizables
-        if tipo == "COMPRA":
-            if not self.puede_comprar_a_credito(monto):
-                raise ValidationError(
-                    "El monto de la compra supera el cupo disponible del cliente."
-                )
-            nuevo_saldo = self.saldo_actual + monto
-
-        elif tipo == "ABONO":
-            if monto <= 0:
-                raise ValidationError("El abono debe ser mayor que 0.")
-            if monto > self.saldo_actual:
-                raise ValidationError(
-                    "El abono no puede ser mayor que la deuda actual del cliente."
-                )
-            nuevo_saldo = self.saldo_actual - monto
-
-        elif tipo == "AJUSTE":
-            nuevo_saldo = self.saldo_actual - monto
-
-        else:
-            raise ValidationError(f"Tipo de movimiento no soportado: {tipo}")
-
-        # Crea el movimiento con el saldo_despues correcto
-        mov = MovimientoCredito.objects.create(
+        from .libro_credito import asentar
+
+        mov = MovimientoCredito(
             cliente=self,
             venta=venta,
             tipo=tipo,
             monto=monto,
-            saldo_despues=nuevo_saldo,
             fecha=timezone.now(),
             observaciones=observaciones,
         )
-
-        # Actualiza saldo_actual del cliente
-        self.saldo_actual = nuevo_saldo
-        self.save(update_fields=["saldo_actual"])
-
+        asentar([mov])
         return mov
 
 
@@ -144,51 +120,54 @@ class MovimientoCredito(models.Model):
         verbose_name = "Movimiento de crédito"
         verbose_name_plural = "Movimientos de crédito"
         ordering = ["-fecha", "-id"]
+        indexes = [
+            # Historial y estados de cuenta de un cliente por rango de fechas
+            models.Index(fields=["cliente", "fecha", "id"], name="movcredito_cliente_fecha"),
+        ]
 
     def __str__(self):
         return f"{self.tipo} - {self.cliente.nombre} - ${self.monto}"
 
-    def save(self, *args, **kwargs):
+    def save(self, *args, asentado=False, **kwargs):
         """
-        Si se crea un movimiento directamente desde el admin,
-        también queremos actualizar el saldo del cliente aquí.
+        Si se crea un movimiento directamente (ej: desde el admin), pasa
+        por el libro de crédito (clientes/libro_credito.py), que calcula
+        saldo_despues y actualiza el saldo del cliente.
 
-        OJO: la lógica es casi la misma que en Cliente.registrar_movimiento_credito,
-        para que el comportamiento sea consistente.
+        asentado=True lo usa el propio libro para insertar la fila.
         """
-        es_nuevo = self.pk is None
-
-        if es_nuevo:
-            cliente = self.cliente
-            monto = Decimal(self.monto)
+        if self.pk is None and not asentado:
+            from .libro_credito import asentar
 
-            if self.tipo == "COMPRA":
-                if not cliente.puede_comprar_a_credito(monto):
-                    raise ValidationError(
-                        "El monto de la compra supera el cupo disponible del cliente."
-                    )
-                nuevo_saldo = cliente.saldo_actual + monto
+            asentar([self])
+            return
 
-            elif self.tipo == "ABONO":
-                if monto <= 0:
-                    raise ValidationError("El abono debe ser mayor que 0.")
-                if monto > cliente.saldo_actual:
-                    raise ValidationError(
-                        "El abono no puede ser mayor que la deuda actual del cliente."
-                    )
-                nuevo_saldo = cliente.saldo_actual - monto
+        super().save(*args, **kwargs)
 
-            elif self.tipo == "AJUSTE":
-                nuevo_saldo = cliente.saldo_actual - monto
 
-            else:
-                raise ValidationError(f"Tipo de movimiento no soportado: {self.tipo}")
+class SaldoCorte(models.Model):
+    """
+    Saldo de un cliente al cierre de un día (el último del mes), para
+    calcular saldos pasados y estados de cuenta sin recorrer todo el
+    historial: se parte del corte más cercano y se suman solo los
+    movimientos posteriores (ver clientes/libro_credito.py).
+    """
 
-            # Guardamos el saldo que deja este movimiento
-            self.saldo_despues = nuevo_saldo
+    cliente = models.ForeignKey(
+        "clientes.Cliente",
+        on_delete=models.CASCADE,
+        related_name="cortes",
+    )
+    fecha = models.DateField()
+    saldo = models.DecimalField(max_digits=12, decimal_places=2)
 
-            # Actualizamos saldo_actual del cliente
-            cliente.saldo_actual = nuevo_saldo
-            cliente.save(update_fields=["saldo_actual"])
+    class Meta:
+        verbose_name = "Corte de saldo"
+        verbose_name_plural = "Cortes de saldo"
+        ordering = ["-fecha"]
+        constraints = [
+            models.UniqueConstraint(fields=["cliente", "fecha"], name="corte_unico_por_dia"),
+        ]
 
-        super().save(*args, **kwargs)
+    def __str__(self):
+        return f"{self.cliente} al {self.fecha}: ${self.saldo}"
@@ -374,6 +374,61 @@ class ApiCreditoAbonarTests(BaseApiCreditoTestCase):
         # data = response.json()
         # self.assertIn("error", data)
 
+    def test_abono_api_reintento_con_idempotency_key_no_duplica_abono(self):
+        """
+        Si la caja reintenta el mismo abono con la misma Idempotency-Key,
+        el saldo baja una sola vez y se devuelve la respuesta original.
+        """
+        from yuyitos.idempotencia import almacen
+
+        almacen().clear()
+        saldo_inicial = self.cliente.saldo_actual
+
+        payload = {"cliente_id": self.cliente.id, "monto": "1000.00"}
+        respuestas = [
+            self.client.post(
+                "/api/creditos/abonar/",
+                data=json.dumps(payload),
+                content_type="application/json",
+                HTTP_IDEMPOTENCY_KEY="abono-caja1-1",
+            )
+            for _ in range(2)
+        ]
+
+        self.assertEqual([r.status_code for r in respuestas], [201, 201])
+        self.assertEqual(respuestas[1]["Idempotent-Replayed"], "true")
+        self.assertEqual(
+            respuestas[0].json()["movimiento"]["id"],
+            respuestas[1].json()["movimiento"]["id"],
+        )
+
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.saldo_actual, saldo_inicial - Decimal("1000.00"))
+        self.assertEqual(
+            MovimientoCredito.objects.filter(cliente=self.cliente, tipo="ABONO").count(),
+            1,
+        )
+
+    def test_abono_api_sin_sesion_no_registra_el_abono(self):
+        """
+        Sin usuario no se abona: todas las claves de idempotencia anónimas
+        compartirían el mismo espacio.
+        """
+        self.client.logout()
+        saldo_inicial = self.cliente.saldo_actual
+
+        response = self.client.post(
+            "/api/creditos/abonar/",
+            data=json.dumps({"cliente_id": self.cliente.id, "monto": "1000.00"}),
+            content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY="abono-anonimo-1",
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.saldo_actual, saldo_inicial)
+
+
 class ApiCreditoSaldoTests(BaseApiCreditoTestCase):
     def test_saldo_api_cliente_existente_devuelve_200_y_datos_correctos(self):
         """
@@ -690,3 +745,533 @@ class ClienteDatosBasicosTests(TestCase):
         )
 
         self.assertEqual(str(cliente), "Cliente String (22.222.222-2)")
+
+
+from yuyitos.pruebas import PresupuestoConsultasMixin
+
+
+class PresupuestoSQLClientesTests(PresupuestoConsultasMixin, BaseApiCreditoTestCase):
+    """
+    Presupuestos de consultas de los listados de clientes y crédito.
+    """
+
+    def test_lista_clientes_no_crece_con_los_clientes(self):
+        for i in range(15):
+            Cliente.objects.create(nombre=f"Cliente Presupuesto {i}", rut=f"9{i:02d}.000.000-0")
+
+        # sesión + usuario + count + página
+        with self.assertMaxConsultas(4):
+            response = self.client.get("/api/clientes/")
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_movimientos_no_crece_con_los_movimientos(self):
+        for _ in range(10):
+            self.cliente.registrar_movimiento_credito(tipo="COMPRA", monto=Decimal("100.00"))
+
+        # sesión + usuario + cliente + movimientos
+        with self.assertMaxConsultas(4):
+            response = self.client.get(
+                "/api/creditos/movimientos/", {"cliente_id": self.cliente.id}
+            )
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_lista_clientes_sin_cambios_responde_304(self):
+        etag = self.client.get("/api/clientes/")["ETag"]
+
+        # sesión + usuario + huella de clientes
+        with self.assertMaxConsultas(3):
+            response = self.client.get("/api/clientes/", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_movimiento_de_credito_cambia_el_etag(self):
+        etag = self.client.get("/api/clientes/")["ETag"]
+        self.cliente.registrar_movimiento_credito(tipo="COMPRA", monto=Decimal("100.00"))
+
+        response = self.client.get("/api/clientes/", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_clientes_con_deuda_en_streaming(self):
+        response = self.client.get("/api/creditos/deudas/", {"stream": "1"})
+
+        self.assertTrue(response.streaming)
+        datos = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(datos, self.client.get("/api/creditos/deudas/").json())
+        self.assertEqual([c["id"] for c in datos["results"]], [self.cliente.id])
+
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from clientes.libro_credito import asentar
+
+
+class LibroCreditoTests(BaseCreditoTestCase):
+    """
+    clientes/libro_credito.py: saldo leído con la fila bloqueada, varios
+    movimientos por llamada.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.otro = Cliente.objects.create(
+            nombre="Otro Cliente",
+            rut="22.222.222-2",
+            tiene_credito=True,
+            cupo_maximo=Decimal("50000.00"),
+        )
+
+    def test_varios_movimientos_de_varios_clientes_en_una_llamada(self):
+        movimientos = asentar(
+            [
+                MovimientoCredito(cliente=self.cliente, tipo="COMPRA", monto=Decimal("1000.00")),
+                MovimientoCredito(cliente_id=self.otro.id, tipo="COMPRA", monto=Decimal("500.00")),
+                MovimientoCredito(cliente=self.cliente, tipo="ABONO", monto=Decimal("300.00")),
+            ]
+        )
+
+        self.assertEqual(
+            [m.saldo_despues for m in movimientos],
+            [Decimal("21000.00"), Decimal("500.00"), Decimal("20700.00")],
+        )
+        self.assertTrue(all(m.pk for m in movimientos))
+        self.assertEqual(self.cliente.saldo_actual, Decimal("20700.00"))
+        self.cliente.refresh_from_db()
+        self.otro.refresh_from_db()
+        self.assertEqual(self.cliente.saldo_actual, Decimal("20700.00"))
+        self.assertEqual(self.otro.saldo_actual, Decimal("500.00"))
+
+    def test_un_movimiento_invalido_no_graba_ninguno(self):
+        with self.assertRaises(ValidationError):
+            asentar(
+                [
+                    MovimientoCredito(cliente=self.cliente, tipo="COMPRA", monto=Decimal("1000.00")),
+                    MovimientoCredito(cliente=self.otro, tipo="ABONO", monto=Decimal("1.00")),
+                ]
+            )
+
+        self.assertFalse(MovimientoCredito.objects.exists())
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.saldo_actual, Decimal("20000.00"))
+
+    def test_usa_el_saldo_de_la_bd_y_no_el_del_objeto(self):
+        # Otra caja cargó al cliente después de que esta vista lo leyera
+        desactualizado = Cliente.objects.get(pk=self.cliente.pk)
+        self.cliente.registrar_movimiento_credito(tipo="COMPRA", monto=Decimal("5000.00"))
+
+        movimiento = desactualizado.registrar_movimiento_credito(
+            tipo="COMPRA", monto=Decimal("1000.00")
+        )
+
+        self.assertEqual(movimiento.saldo_despues, Decimal("26000.00"))
+        self.assertEqual(desactualizado.saldo_actual, Decimal("26000.00"))
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.saldo_actual, Decimal("26000.00"))
+
+    def test_un_movimiento_cuesta_tres_consultas(self):
+        # bloqueo/lectura del cliente + INSERT del movimiento + UPDATE del saldo
+        with CaptureQueriesContext(connection) as consultas:
+            self.cliente.registrar_movimiento_credito(tipo="ABONO", monto=Decimal("100.00"))
+
+        self.assertEqual(len(consultas), 3)
+
+    def test_crear_movimiento_directo_pasa_por_el_libro(self):
+        movimiento = MovimientoCredito.objects.create(
+            cliente=self.cliente, tipo="ABONO", monto=Decimal("2000.00")
+        )
+
+        self.assertEqual(movimiento.saldo_despues, Decimal("18000.00"))
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.saldo_actual, Decimal("18000.00"))
+        self.assertEqual(MovimientoCredito.objects.count(), 1)
+
+
+import datetime
+
+from django.utils import timezone
+
+from clientes.libro_credito import inicio_del_dia, reconstruir_cortes, saldo_al
+from clientes.models import SaldoCorte
+
+
+class CortesDeSaldoTests(BaseApiCreditoTestCase):
+    """
+    SaldoCorte: el libro cierra cada mes con movimientos y saldo_al parte
+    del corte más cercano.
+    """
+
+    def asentar_en(self, dia, tipo, monto):
+        momento = timezone.make_aware(datetime.datetime.combine(dia, datetime.time(12)))
+        return asentar(
+            [MovimientoCredito(cliente=self.cliente, tipo=tipo, monto=Decimal(monto), fecha=momento)]
+        )[0]
+
+    def setUp(self):
+        super().setUp()
+        # saldo inicial 20000, sin movimientos que lo expliquen
+        self.asentar_en(datetime.date(2025, 9, 10), "COMPRA", "1000")
+        self.asentar_en(datetime.date(2025, 9, 30), "ABONO", "500")  # 20500
+        self.asentar_en(datetime.date(2025, 10, 2), "COMPRA", "2000")  # 22500
+        self.asentar_en(datetime.date(2025, 12, 1), "ABONO", "2500")  # 20000
+        self.asentar_en(datetime.date(2025, 12, 15), "COMPRA", "300")  # 20300
+
+    def cortes(self):
+        return list(
+            SaldoCorte.objects.filter(cliente=self.cliente)
+            .order_by("fecha")
+            .values_list("fecha", "saldo")
+        )
+
+    def al_cierre(self, dia):
+        return saldo_al(self.cliente, inicio_del_dia(dia + datetime.timedelta(days=1)))
+
+    def test_el_primer_movimiento_del_mes_cierra_el_mes_anterior(self):
+        self.assertEqual(
+            self.cortes(),
+            [
+                (datetime.date(2025, 9, 30), Decimal("20500.00")),
+                (datetime.date(2025, 10, 31), Decimal("22500.00")),
+            ],
+        )
+
+    def test_saldo_al_cierre_de_cualquier_dia(self):
+        esperados = {
+            datetime.date(2025, 9, 1): Decimal("20000.00"),  # sin corte anterior
+            datetime.date(2025, 9, 10): Decimal("21000.00"),
+            datetime.date(2025, 9, 30): Decimal("20500.00"),
+            datetime.date(2025, 11, 15): Decimal("22500.00"),
+            datetime.date(2025, 12, 1): Decimal("20000.00"),
+            datetime.date(2026, 1, 1): Decimal("20300.00"),
+        }
+        for dia, saldo in esperados.items():
+            with self.subTest(dia=dia):
+                self.assertEqual(self.al_cierre(dia), saldo)
+
+    def test_saldo_al_lee_el_corte_y_la_cola(self):
+        # corte más cercano + suma de los movimientos posteriores
+        with CaptureQueriesContext(connection) as consultas:
+            self.al_cierre(datetime.date(2025, 12, 10))
+        self.assertEqual(len(consultas), 2)
+
+    def test_movimiento_con_fecha_atrasada_borra_los_cortes_siguientes(self):
+        self.asentar_en(datetime.date(2025, 10, 20), "COMPRA", "100")
+
+        self.assertEqual(self.cortes(), [(datetime.date(2025, 9, 30), Decimal("20500.00"))])
+        self.assertEqual(self.al_cierre(datetime.date(2025, 10, 31)), Decimal("22600.00"))
+
+        reconstruir_cortes([self.cliente.pk])
+        self.assertEqual(
+            self.cortes(),
+            [
+                (datetime.date(2025, 9, 30), Decimal("20500.00")),
+                (datetime.date(2025, 10, 31), Decimal("22600.00")),
+                (datetime.date(2025, 12, 31), Decimal("20400.00")),
+            ],
+        )
+
+    def test_reconstruir_cortes_coincide_con_el_libro(self):
+        antes = self.cortes()
+        SaldoCorte.objects.all().delete()
+
+        reconstruir_cortes()
+
+        # diciembre es un mes pasado; en el libro se cierra recién en enero
+        self.assertEqual(
+            self.cortes(), antes + [(datetime.date(2025, 12, 31), Decimal("20300.00"))]
+        )
+
+    def test_ver_saldo_con_fecha(self):
+        response = self.client.get(
+            "/api/creditos/saldo/", {"cliente_id": self.cliente.id, "fecha": "2025-11-15"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["saldo_al"], {"fecha": "2025-11-15", "saldo": "22500.00"}
+        )
+
+    def test_estado_de_cuenta(self):
+        response = self.client.get(
+            "/api/creditos/estado-cuenta/",
+            {
+                "cliente_id": self.cliente.id,
+                "fecha_desde": "2025-10-01",
+                "fecha_hasta": "2025-12-01",
+            },
+        )
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["saldo_inicial"], "20500.00")
+        self.assertEqual([m["tipo"] for m in data["movimientos"]], ["COMPRA", "ABONO"])
+        self.assertEqual(data["saldo_final"], "20000.00")
+
+    def test_estado_de_cuenta_fecha_invalida(self):
+        response = self.client.get(
+            "/api/creditos/estado-cuenta/",
+            {"cliente_id": self.cliente.id, "fecha_desde": "ayer"},
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+
+
+class ConciliarSaldosTests(BaseCreditoTestCase):
+    """
+    manage.py conciliar_saldos: saldo_actual contra la suma de movimientos.
+    """
+
+    def setUp(self):
+        super().setUp()
+        # self.cliente parte con 20000 sin movimientos que lo expliquen
+        self.cuadrado = Cliente.objects.create(
+            nombre="Cliente Cuadrado",
+            rut="33.333.333-3",
+            tiene_credito=True,
+            cupo_maximo=Decimal("50000.00"),
+        )
+        self.cuadrado.registrar_movimiento_credito(tipo="COMPRA", monto=Decimal("700.00"))
+        self.cuadrado.registrar_movimiento_credito(tipo="ABONO", monto=Decimal("200.00"))
+
+    def conciliar(self, *args):
+        salida, errores = StringIO(), StringIO()
+        call_command("conciliar_saldos", "--lote", "1", *args, stdout=salida, stderr=errores)
+        return salida.getvalue().splitlines(), errores.getvalue()
+
+    def test_informa_solo_los_descuadrados(self):
+        informe, resumen = self.conciliar()
+
+        self.assertEqual(len(informe), 2)  # encabezado + self.cliente
+        self.assertEqual(
+            informe[1].split(",")[-3:], ["20000.00", "0.00", "20000.00"]
+        )
+        self.assertIn("Descuadrados: 1", resumen)
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.saldo_actual, Decimal("20000.00"))
+
+    def test_reparar_registra_el_saldo_inicial_sin_tocar_el_saldo(self):
+        Cliente.objects.filter(pk=self.cuadrado.pk).update(saldo_actual=Decimal("999.00"))
+
+        _, resumen = self.conciliar("--reparar")
+
+        self.assertIn("registradas como saldo inicial", resumen)
+        self.cliente.refresh_from_db()
+        self.cuadrado.refresh_from_db()
+        self.assertEqual(self.cliente.saldo_actual, Decimal("20000.00"))
+        self.assertEqual(self.cuadrado.saldo_actual, Decimal("999.00"))
+
+        inicial = MovimientoCredito.objects.get(cliente=self.cliente)
+        self.assertEqual((inicial.tipo, inicial.monto), ("AJUSTE", Decimal("-20000.00")))
+        self.assertEqual(inicial.saldo_despues, Decimal("20000.00"))
+        # el saldo inicial del otro va antes de su primera compra
+        primero = MovimientoCredito.objects.filter(cliente=self.cuadrado).order_by("fecha", "id")[0]
+        self.assertEqual((primero.tipo, primero.monto), ("AJUSTE", Decimal("-499.00")))
+
+        informe, resumen = self.conciliar()
+        self.assertEqual(len(informe), 1)
+        self.assertIn("Descuadrados: 0", resumen)
+
+    def test_saldo_inicial_registrado_cuadra_con_los_saldos_pasados(self):
+        hace_40_dias = timezone.now() - datetime.timedelta(days=40)
+        Cliente.objects.filter(pk=self.cliente.pk).update(creado_en=hace_40_dias)
+        self.cliente.registrar_movimiento_credito(tipo="ABONO", monto=Decimal("5000.00"))
+
+        self.conciliar("--reparar")
+
+        self.assertEqual(saldo_al(self.cliente, timezone.now()), Decimal("15000.00"))
+        hace_un_dia = timezone.now() - datetime.timedelta(days=1)
+        self.assertEqual(saldo_al(self.cliente, hace_un_dia), Decimal("20000.00"))
+        self.assertEqual(saldo_al(self.cliente, hace_40_dias), Decimal("0.00"))
+
+    def test_reparar_forzado_deja_el_saldo_igual_a_los_movimientos(self):
+        Cliente.objects.filter(pk=self.cuadrado.pk).update(saldo_actual=Decimal("999.00"))
+
+        self.conciliar("--reparar", "--forzar")
+
+        self.cliente.refresh_from_db()
+        self.cuadrado.refresh_from_db()
+        self.assertEqual(self.cliente.saldo_actual, Decimal("0.00"))
+        self.assertEqual(self.cuadrado.saldo_actual, Decimal("500.00"))
+        self.assertFalse(MovimientoCredito.objects.filter(tipo="AJUSTE").exists())
+        informe, resumen = self.conciliar()
+        self.assertEqual(len(informe), 1)
+        self.assertIn("Descuadrados: 0", resumen)
+
+    def test_forzar_sin_reparar_es_error(self):
+        with self.assertRaises(CommandError):
+            self.conciliar("--forzar")
+
+    def test_reparar_recalcula_los_cortes(self):
+        cliente = Cliente.objects.create(
+            nombre="Cliente Cortes",
+            rut="66.666.666-6",
+            tiene_credito=True,
+            cupo_maximo=Decimal("50000.00"),
+        )
+        hace_40_dias = timezone.now() - datetime.timedelta(days=40)
+        asentar(
+            [
+                MovimientoCredito(
+                    cliente=cliente, tipo="COMPRA", monto=Decimal("100.00"), fecha=hace_40_dias
+                )
+            ]
+        )
+        Cliente.objects.filter(pk=cliente.pk).update(saldo_actual=Decimal("150.00"))
+        # cierra el mes anterior con el saldo descuadrado (150)
+        cliente.registrar_movimiento_credito(tipo="COMPRA", monto=Decimal("10.00"))
+        self.assertTrue(SaldoCorte.objects.filter(cliente=cliente).exists())
+
+        informe, _ = self.conciliar("--reparar", "--forzar")
+
+        self.assertIn(f"{cliente.pk},66.666.666-6,Cliente Cortes,160.00,110.00,50.00", informe)
+        cliente.refresh_from_db()
+        self.assertEqual(cliente.saldo_actual, Decimal("110.00"))
+        self.assertEqual(saldo_al(cliente, timezone.now()), Decimal("110.00"))
+        self.assertEqual(
+            list(SaldoCorte.objects.filter(cliente=cliente).values_list("saldo", flat=True)),
+            [Decimal("100.00")],
+        )
+
+
+from django.core.cache import cache
+
+
+class AntiguedadDeudaTests(BaseApiCreditoTestCase):
+    """
+    /api/creditos/antiguedad/: deuda por tramos de 30 días, paginada y en caché.
+    """
+
+    def comprar_hace(self, cliente, dias, monto):
+        asentar(
+            [
+                MovimientoCredito(
+                    cliente=cliente,
+                    tipo="COMPRA",
+                    monto=Decimal(monto),
+                    fecha=timezone.now() - datetime.timedelta(days=dias),
+                )
+            ]
+        )
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        # self.cliente: 20000 de saldo inicial (más de 90 días)
+        self.comprar_hace(self.cliente, 100, "1000")
+        self.comprar_hace(self.cliente, 45, "3000")
+        self.comprar_hace(self.cliente, 5, "2000")
+        # abono: paga primero lo más antiguo, quedan debiendo las compras recientes
+        self.cliente.registrar_movimiento_credito(tipo="ABONO", monto=Decimal("21500.00"))
+
+        self.otro = Cliente.objects.create(
+            nombre="Otro Deudor",
+            rut="44.444.444-4",
+            tiene_credito=True,
+            cupo_maximo=Decimal("50000.00"),
+        )
+        self.comprar_hace(self.otro, 70, "800")
+        Cliente.objects.create(nombre="Sin Deuda", rut="55.555.555-5")
+
+    def pedir(self, **params):
+        return self.client.get("/api/creditos/antiguedad/", params)
+
+    def test_reparte_la_deuda_en_tramos(self):
+        response = self.pedir()
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["count"], 2)
+        primero = data["results"][0]
+        self.assertEqual(primero["id"], self.cliente.id)
+        self.assertEqual(
+            {t: primero[t] for t in ("total", "dias_0_30", "dias_31_60", "dias_61_90", "mas_90")},
+            {
+                "total": "4500.00",
+                "dias_0_30": "2000.00",
+                "dias_31_60": "2500.00",
+                "dias_61_90": "0.00",
+                "mas_90": "0.00",
+            },
+        )
+        self.assertEqual(data["results"][1]["dias_61_90"], "800.00")
+        self.assertEqual(data["totales"]["total"], "5300.00")
+
+    def test_orden_y_paginas(self):
+        data = self.pedir(orden="-dias_61_90", limit=1).json()
+        self.assertEqual([c["id"] for c in data["results"]], [self.otro.id])
+
+        data = self.pedir(orden="-dias_61_90", limit=1, page=2).json()
+        self.assertEqual([c["id"] for c in data["results"]], [self.cliente.id])
+        self.assertEqual(data["count"], 2)
+
+    def test_orden_invalido(self):
+        self.assertEqual(self.pedir(orden="rut").status_code, 400)
+        self.assertEqual(self.pedir(page="0").status_code, 400)
+
+    def test_cache_se_invalida_con_un_movimiento(self):
+        self.assertEqual(self.pedir()["X-Cache"], "MISS")
+        self.assertEqual(self.pedir()["X-Cache"], "HIT")
+
+        self.otro.registrar_movimiento_credito(tipo="ABONO", monto=Decimal("800.00"))
+
+        response = self.pedir()
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["count"], 1)
+
+
+class MovimientosPorCursorTests(BaseApiCreditoTestCase):
+    """
+    /api/creditos/movimientos/: páginas por cursor sobre (fecha, id) y rango de fechas.
+    """
+
+    def setUp(self):
+        super().setUp()
+        base = timezone.make_aware(datetime.datetime(2025, 3, 1, 12))
+        # dos movimientos por día (misma fecha en el segundo de cada par)
+        self.movimientos = asentar(
+            [
+                MovimientoCredito(
+                    cliente=self.cliente,
+                    tipo="COMPRA",
+                    monto=Decimal("10.00"),
+                    fecha=base + datetime.timedelta(days=n // 2),
+                )
+                for n in range(7)
+            ]
+        )
+
+    def pedir(self, **params):
+        return self.client.get("/api/creditos/movimientos/", {"cliente_id": self.cliente.id, **params})
+
+    def test_recorre_todo_el_historial_sin_repetir(self):
+        ids, cursor = [], None
+        while True:
+            params = {"limit": 3}
+            if cursor:
+                params["cursor"] = cursor
+            data = self.pedir(**params).json()
+            ids += [m["id"] for m in data["movimientos"]]
+            cursor = data["next"]
+            if cursor is None:
+                break
+
+        esperados = sorted(self.movimientos, key=lambda m: (m.fecha, m.id), reverse=True)
+        self.assertEqual(ids, [m.id for m in esperados])
+
+    def test_rango_de_fechas(self):
+        data = self.pedir(fecha_desde="2025-03-02", fecha_hasta="2025-03-03").json()
+
+        self.assertEqual(len(data["movimientos"]), 4)
+        self.assertIsNone(data["next"])
+
+    def test_cursor_o_fecha_invalidos(self):
+        self.assertEqual(self.pedir(cursor="no-es-un-cursor").status_code, 400)
+        self.assertEqual(self.pedir(fecha_desde="marzo").status_code, 400)
@@ -23,8 +23,16 @@ urlpatterns = [
         api_credito.listar_movimientos,
         name="listar_movimientos_credito",
     ),
+    # Estado de cuenta (saldo inicial, movimientos y saldo final)
+    path(
+        "creditos/estado-cuenta/",
+        api_credito.estado_de_cuenta,
+        name="estado_de_cuenta_credito",
+    ),
     # Clientes con deuda
     path("creditos/deudas/", api_credito.clientes_con_deuda, name="clientes_con_deuda"),
+    # Antigüedad de la deuda (tramos de 30 días, paginado)
+    path("creditos/antiguedad/", api_credito.antiguedad_deuda, name="antiguedad_deuda"),
     
     # Clientes
     path(
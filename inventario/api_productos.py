@@ -1,10 +1,39 @@
-from django.http import JsonResponse
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.vary import vary_on_headers
 from django.views.decorators.http import require_GET, require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 
 from django.contrib.auth.decorators import login_required, user_passes_test
 
-from .models import Producto
+from django.db import transaction
+from django.db.models import Q
+
+from yuyitos.http import calcular_etag, condicional, etag_de_tablas
+from yuyitos.paginacion import (
+    CursorInvalido,
+    codificar_cursor,
+    decodificar_cursor,
+    leer_limite,
+)
+from yuyitos.streaming import iterar, quiere_streaming, respuesta_json_streaming
+
+from .busqueda import (
+    LIMITE_RESULTADOS,
+    MODO_DIFUSO,
+    buscar_pagina,
+    cursor_siguiente,
+    leer_cursor,
+    ordenar_por_relevancia,
+)
+from .cache import categorias as cache_categorias
+from .formatos import CODIFICADORES, TIPO_JSON, precio_entero, tipos_disponibles
+from .models import Categoria, Producto, TrigramaProducto
+from .texto import texto_busqueda
 from cuentas.permisos import es_cajero_o_admin, es_bodeguero_o_admin
 
 from django.views.decorators.http import require_POST
@@ -16,13 +45,14 @@ def _producto_a_dict(producto: Producto):
     """
     Serializa un producto a dict simple para JSON.
     """
+    categoria = producto.categoria
     return {
         "id": producto.id,
         "codigo_barras": producto.codigo_barras or "",
         "nombre": producto.nombre,
         "descripcion": producto.descripcion or "",
-        "categoria": producto.categoria.nombre if producto.categoria else "Sin categoría",
-        "categoria_id": producto.categoria.id if producto.categoria else None,
+        "categoria": categoria.nombre if categoria else "Sin categoría",
+        "categoria_id": producto.categoria_id,
         "precio_compra": str(producto.precio_compra),
         "precio_venta": str(producto.precio_venta),
         "stock_actual": producto.stock_actual,
@@ -34,34 +64,247 @@ def _producto_a_dict(producto: Producto):
     }
 
 
+# Campos del listado: nombre en el JSON -> columna de values().
+# La categoría sale del mismo SELECT (JOIN), sin consultas por fila.
+CAMPOS_PRODUCTO = {
+    "id": "id",
+    "codigo_barras": "codigo_barras",
+    "nombre": "nombre",
+    "descripcion": "descripcion",
+    "categoria": "categoria__nombre",
+    "categoria_id": "categoria_id",
+    "precio_compra": "precio_compra",
+    "precio_venta": "precio_venta",
+    "stock_actual": "stock_actual",
+    "stock_minimo": "stock_minimo",
+    "tiene_vencimiento": "tiene_vencimiento",
+    "fecha_vencimiento": "fecha_vencimiento",
+    "es_activo": "es_activo",
+    "activo": "es_activo",
+}
+
+# Mismo formato que _producto_a_dict para los campos que lo necesitan
+_FORMATO_CAMPO = {
+    "codigo_barras": lambda v: v or "",
+    "descripcion": lambda v: v or "",
+    "categoria": lambda v: v or "Sin categoría",
+    "precio_compra": str,
+    "precio_venta": str,
+    "fecha_vencimiento": lambda v: str(v) if v else None,
+}
+
+# Paginación por cursor de GET /api/productos/ (solo si se pide limit o cursor)
+LIMITE_PRODUCTOS = 100
+LIMITE_PRODUCTOS_MAXIMO = 500
+
+
+def _leer_campos(request):
+    """
+    ?fields=id,nombre,precio_venta -> lista de campos (todos si no viene).
+    Devuelve None si pide un campo que no existe.
+    """
+    texto = request.GET.get("fields", "").strip()
+    if not texto:
+        return list(CAMPOS_PRODUCTO)
+    campos = [c.strip() for c in texto.split(",") if c.strip()]
+    if not campos or any(c not in CAMPOS_PRODUCTO for c in campos):
+        return None
+    return campos
+
+
+def iterar_dicts(filas, campos):
+    """
+    Filas de values() (con las columnas de CAMPOS_PRODUCTO) -> dicts del
+    JSON, de a uno.
+    """
+    conversiones = [(campo, CAMPOS_PRODUCTO[campo], _FORMATO_CAMPO.get(campo)) for campo in campos]
+    for fila in filas:
+        yield {
+            campo: formato(fila[columna]) if formato else fila[columna]
+            for campo, columna, formato in conversiones
+        }
+
+
+def filas_a_dicts(filas, campos):
+    """
+    Filas de values() (con las columnas de CAMPOS_PRODUCTO) -> lista de
+    dicts del JSON.
+    """
+    return list(iterar_dicts(filas, campos))
+
+
+# Formatos compactos (inventario/formatos.py): precios enteros, resto igual
+_FORMATO_COMPACTO = {
+    **_FORMATO_CAMPO,
+    "precio_compra": precio_entero,
+    "precio_venta": precio_entero,
+}
+
+
+def columnas_compactas(campos):
+    """
+    Columnas para values_list() de esos campos, sin repetir ("activo" y
+    "es_activo" salen de la misma).
+    """
+    return list(dict.fromkeys(CAMPOS_PRODUCTO[c] for c in campos))
+
+
+def filas_compactas(filas, campos):
+    """
+    Tuplas de values_list(*columnas_compactas(campos)) -> una lista por
+    producto con los campos en orden y los precios enteros.
+    """
+    columnas = columnas_compactas(campos)
+    conversiones = [
+        (columnas.index(CAMPOS_PRODUCTO[c]), _FORMATO_COMPACTO.get(c)) for c in campos
+    ]
+    for fila in filas:
+        yield [formato(fila[i]) if formato else fila[i] for i, formato in conversiones]
+
+
+def _catalogo_compacto(tipo, campos):
+    """
+    Todo el catálogo en un formato compacto, leído y enviado por trozos.
+    """
+    filas = (
+        Producto.objects.order_by("nombre", "id")
+        .values_list(*columnas_compactas(campos))
+        .iterator(chunk_size=2000)
+    )
+    return StreamingHttpResponse(
+        CODIFICADORES[tipo](campos, filas_compactas(filas, campos)),
+        content_type=tipo,
+    )
+
+
+def _etag_producto(request, producto_id):
+    """
+    ETag del detalle de un producto: su actualizado_en y el de su categoría
+    (el nombre de la categoría va en la respuesta). None si no existe.
+    """
+    fila = (
+        Producto.objects.filter(pk=producto_id)
+        .values_list("actualizado_en", "categoria__actualizado_en")
+        .first()
+    )
+    if fila is None:
+        return None
+    return calcular_etag(request.path, producto_id, *fila)
+
+
 # =========================
 # LISTAR / CREAR PRODUCTOS
 # =========================
 @csrf_exempt
 @login_required
 @require_http_methods(["GET", "POST"])
+@cache_control(private=True, no_cache=True)
+@vary_on_headers("Accept")
+@condicional(etag_de_tablas(Producto, Categoria))
 def productos_collection(request):
     """
     GET  /api/productos/  -> lista productos
     POST /api/productos/  -> crea producto (solo bodeguero o admin)
+
+    Parámetros del GET:
+    - q: búsqueda por texto, por relevancia (de a 200 o limit resultados;
+      "next" trae el cursor de la página siguiente)
+    - modo=difuso: q tolera errores de tipeo ("fidios" encuentra "Fideos")
+    - limit / cursor: paginación por (nombre, id); "next" trae el cursor
+      de la página siguiente, o null si no hay más
+    - fields: campos a devolver, separados por coma (ej: id,nombre,precio_venta)
+    - stream=1: respuesta en streaming (ver yuyitos/streaming.py)
+
+    El listado completo (sin q, limit ni cursor) también se entrega en los
+    formatos compactos de inventario/formatos.py si se piden con Accept; con
+    filtros o paginación la respuesta es siempre JSON.
+
+    Con If-None-Match responde 304 si no cambió ningún producto ni categoría.
     """
     # ---------- GET: listar ----------
     if request.method == "GET":
         q = request.GET.get("q", "").strip()
 
-        productos = Producto.objects.all()
-
-        if q:
-            productos = productos.filter(nombre__icontains=q)
-
-        productos = productos.order_by("nombre")
-
-        data = [_producto_a_dict(p) for p in productos]
+        modo = request.GET.get("modo", "")
+        if modo not in ("", MODO_DIFUSO):
+            return JsonResponse({"error": "'modo' solo acepta: difuso."}, status=400)
+
+        campos = _leer_campos(request)
+        if campos is None:
+            return JsonResponse(
+                {"error": f"'fields' solo acepta: {', '.join(CAMPOS_PRODUCTO)}."},
+                status=400,
+            )
+
+        # id y nombre siempre se leen: son el orden y el cursor
+        columnas = {CAMPOS_PRODUCTO[c] for c in campos} | {"id", "nombre"}
+        productos = Producto.objects.values(*columnas)
+        siguiente = None
+
+        if q and modo == MODO_DIFUSO:
+            # Tolerante a errores de tipeo, del más al menos parecido
+            filas = ordenar_por_relevancia(productos, TrigramaProducto.objects.similares(q))
+
+        elif q:
+            # Índice de texto completo, por páginas en orden de relevancia;
+            # si la BD no lo tiene, se filtra por el texto sin acentos
+            try:
+                despues = leer_cursor(request)
+            except CursorInvalido:
+                return JsonResponse({"error": "El cursor no es válido."}, status=400)
+            limite = leer_limite(request, LIMITE_RESULTADOS, LIMITE_RESULTADOS)
+
+            pagina = buscar_pagina(q, limite, despues)
+            if pagina is None:
+                filas = productos.filter(
+                    texto_busqueda__contains=texto_busqueda(q)
+                ).order_by("nombre", "id")
+            else:
+                ids, ultimo = pagina
+                filas = ordenar_por_relevancia(productos, ids)
+                siguiente = cursor_siguiente(ultimo)
+
+        elif "limit" in request.GET or "cursor" in request.GET:
+            limite = leer_limite(request, LIMITE_PRODUCTOS, LIMITE_PRODUCTOS_MAXIMO)
+            productos = productos.order_by("nombre", "id")
+
+            cursor = request.GET.get("cursor")
+            if cursor:
+                try:
+                    ultimo = decodificar_cursor(cursor)
+                    nombre, ultimo_id = str(ultimo["nombre"]), int(ultimo["id"])
+                except (CursorInvalido, KeyError, TypeError, ValueError):
+                    return JsonResponse({"error": "El cursor no es válido."}, status=400)
+                productos = productos.filter(
+                    Q(nombre__gt=nombre) | Q(nombre=nombre, id__gt=ultimo_id)
+                )
+
+            # Se pide una fila de más para saber si hay otra página
+            filas = list(productos[: limite + 1])
+            if len(filas) > limite:
+                filas = filas[:limite]
+                siguiente = codificar_cursor(
+                    {"nombre": filas[-1]["nombre"], "id": filas[-1]["id"]}
+                )
+
+        else:
+            tipo = request.get_preferred_type(tipos_disponibles())
+            if tipo not in (None, TIPO_JSON):
+                return _catalogo_compacto(tipo, campos)
+            filas = productos.order_by("nombre", "id")
+
+        if quiere_streaming(request):
+            return respuesta_json_streaming(
+                iterar_dicts(iterar(filas), campos), {"next": siguiente}
+            )
+
+        data = filas_a_dicts(filas, campos)
 
         return JsonResponse(
             {
                 "count": len(data),
                 "results": data,
+                "next": siguiente,
             },
             status=200,
         )
@@ -130,30 +373,32 @@ def productos_collection(request):
         )
 
     # Manejar categoría por nombre (crear si no existe)
-    from inventario.models import Categoria
-
+    # (se busca en la BD y no en el caché de categorías: el caché es de cada
+    # proceso y puede tener un nombre o un id que otro worker ya cambió o
+    # borró; la fila queda bloqueada hasta insertar el producto)
     categoria_nombre = (data.get("categoria_nombre") or "").strip()
-    categoria = None
-    if categoria_nombre:
-        categoria, _ = Categoria.objects.get_or_create(
-            nombre=categoria_nombre,
-            defaults={"esta_activa": True},
+    with transaction.atomic():
+        categoria = None
+        if categoria_nombre:
+            categoria, _ = Categoria.objects.select_for_update().get_or_create(
+                nombre=categoria_nombre,
+                defaults={"esta_activa": True},
+            )
+
+        producto = Producto.objects.create(
+            codigo_barras=codigo_barras if codigo_barras else None,
+            nombre=nombre,
+            descripcion=data.get("descripcion", ""),
+            categoria=categoria,
+            precio_compra=precio_compra,
+            precio_venta=precio_venta,
+            stock_actual=stock_actual,
+            stock_minimo=stock_minimo,
+            tiene_vencimiento=bool(data.get("tiene_vencimiento", False)),
+            fecha_vencimiento=data.get("fecha_vencimiento") or None,
+            es_activo=True,  # siempre activo al crear
         )
 
-    producto = Producto.objects.create(
-        codigo_barras=codigo_barras if codigo_barras else None,
-        nombre=nombre,
-        descripcion=data.get("descripcion", ""),
-        categoria=categoria,
-        precio_compra=precio_compra,
-        precio_venta=precio_venta,
-        stock_actual=stock_actual,
-        stock_minimo=stock_minimo,
-        tiene_vencimiento=bool(data.get("tiene_vencimiento", False)),
-        fecha_vencimiento=data.get("fecha_vencimiento") or None,
-        es_activo=True,  # siempre activo al crear
-    )
-
     return JsonResponse(
         {
             "mensaje": "Producto creado correctamente.",
@@ -169,6 +414,8 @@ def productos_collection(request):
 @csrf_exempt
 @login_required
 @require_GET
+@cache_control(private=True, no_cache=True)
+@condicional(_etag_producto)
 def detalle_producto(request, producto_id: int):
     """
     Devuelve la info de un producto específico.
@@ -187,6 +434,8 @@ def detalle_producto(request, producto_id: int):
 @csrf_exempt
 @login_required
 @require_GET
+@cache_control(private=True, no_cache=True)
+@condicional(_etag_producto)
 def stock_producto(request, producto_id: int):
     """
     Devuelve solo info de stock (útil para el POS).
@@ -212,24 +461,18 @@ def stock_producto(request, producto_id: int):
 # =========================
 # CATEGORÍAS
 # =========================
+def _etag_categorias(request):
+    return calcular_etag(request.get_full_path(), cache_categorias.huella())
+
+
 @login_required
 @require_http_methods(["GET"])
+@cache_control(private=True, max_age=60)
+@condicional(_etag_categorias)
 def listar_categorias(request):
-    """Listar todas las categorías activas"""
+    """Listar todas las categorías activas (desde inventario/cache.py, sin ir a la BD)"""
     try:
-        from .models import Categoria
-
-        categorias = Categoria.objects.filter(esta_activa=True).order_by("nombre")
-
-        results = [
-            {
-                "id": cat.id,
-                "nombre": cat.nombre,
-                "descripcion": cat.descripcion,
-                "esta_activa": cat.esta_activa,
-            }
-            for cat in categorias
-        ]
+        results = cache_categorias.activas()
 
         return JsonResponse(
             {
@@ -243,3 +486,133 @@ def listar_categorias(request):
             {"error": f"Error al listar categorías: {str(e)}"},
             status=500,
         )
+
+
+# =========================
+# SINCRONIZACIÓN DEL CATÁLOGO
+# =========================
+
+# Filas por tabla en cada respuesta de /api/catalogo/
+LIMITE_CATALOGO = 500
+LIMITE_CATALOGO_MAXIMO = 2000
+
+# actualizado_en se fija al grabar, pero la fila se ve recién al confirmar la
+# transacción. Por eso, al quedar al día, el token no avanza más allá de
+# "ahora - MARGEN_CATALOGO": lo grabado en ese margen se vuelve a enviar en
+# la próxima llamada (el terminal simplemente lo reemplaza). El margen cubre
+# la transacción más larga más la espera por bloqueos (ver settings.py).
+MARGEN_CATALOGO = timedelta(seconds=settings.MARGEN_CONFIRMACION_SEGUNDOS)
+
+CAMPOS_CATEGORIA = ("id", "nombre", "descripcion", "esta_activa", "actualizado_en")
+
+
+def _posicion_desde_token(token, tabla):
+    """
+    Lee la posición de una tabla en el token: (actualizado_en, id) o None.
+    """
+    valor = token.get(tabla)
+    if valor is None:
+        return None
+    return datetime.fromisoformat(valor["ts"]), int(valor["id"])
+
+
+def _cambios_desde(qs, posicion, limite):
+    """
+    Filas de qs posteriores a posicion, ordenadas por (actualizado_en, id).
+    Devuelve (filas, posicion_nueva, hay_mas).
+    """
+    qs = qs.order_by("actualizado_en", "id")
+    if posicion is not None:
+        ts, ultimo_id = posicion
+        qs = qs.filter(Q(actualizado_en__gt=ts) | Q(actualizado_en=ts, id__gt=ultimo_id))
+
+    filas = list(qs[: limite + 1])
+    if len(filas) > limite:
+        # Página intermedia: se sigue exactamente desde la última fila
+        filas = filas[:limite]
+        return filas, (filas[-1]["actualizado_en"], filas[-1]["id"]), True
+
+    # Al día: se avanza hasta el margen, sin retroceder
+    marca = (timezone.now() - MARGEN_CATALOGO, 0)
+    if filas:
+        marca = min(marca, (filas[-1]["actualizado_en"], filas[-1]["id"]))
+    if posicion is not None:
+        marca = max(marca, posicion)
+    return filas, marca, False
+
+
+def _token_catalogo(posiciones):
+    return codificar_cursor(
+        {
+            tabla: {"ts": ts.isoformat(), "id": pk}
+            for tabla, (ts, pk) in posiciones.items()
+        }
+    )
+
+
+@csrf_exempt
+@login_required
+@require_GET
+def catalogo(request):
+    """
+    Cambios del catálogo para que cada terminal mantenga su copia local.
+
+    GET /api/catalogo/                -> todo el catálogo (por páginas)
+    GET /api/catalogo/?since=<token>  -> solo lo que cambió desde ese token
+
+    Respuesta:
+    - productos / categorias: filas nuevas o modificadas (incluye cambios de stock)
+    - eliminados: ids de productos y categorías desactivados (el terminal los borra)
+    - since: token para la próxima llamada
+    - hay_mas: true si quedan cambios; llamar de nuevo con el since recibido
+
+    Los productos o categorías borrados de la BD (en vez de desactivados) no
+    se informan: para sacarlos del catálogo hay que desactivarlos.
+    """
+    limite = leer_limite(request, LIMITE_CATALOGO, LIMITE_CATALOGO_MAXIMO)
+
+    since = request.GET.get("since")
+    if since:
+        try:
+            token = decodificar_cursor(since)
+            posiciones = {
+                "productos": _posicion_desde_token(token, "productos"),
+                "categorias": _posicion_desde_token(token, "categorias"),
+            }
+        except (CursorInvalido, KeyError, TypeError, ValueError):
+            return JsonResponse({"error": "El token 'since' no es válido."}, status=400)
+    else:
+        posiciones = {"productos": None, "categorias": None}
+
+    columnas = set(CAMPOS_PRODUCTO.values()) | {"actualizado_en"}
+    filas_productos, posiciones["productos"], mas_productos = _cambios_desde(
+        Producto.objects.values(*columnas), posiciones["productos"], limite
+    )
+    filas_categorias, posiciones["categorias"], mas_categorias = _cambios_desde(
+        Categoria.objects.values(*CAMPOS_CATEGORIA), posiciones["categorias"], limite
+    )
+
+    return JsonResponse(
+        {
+            "productos": filas_a_dicts(
+                [f for f in filas_productos if f["es_activo"]], list(CAMPOS_PRODUCTO)
+            ),
+            "categorias": [
+                {
+                    "id": f["id"],
+                    "nombre": f["nombre"],
+                    "descripcion": f["descripcion"],
+                    "esta_activa": f["esta_activa"],
+                }
+                for f in filas_categorias
+                if f["esta_activa"]
+            ],
+            "eliminados": {
+                "productos": [f["id"] for f in filas_productos if not f["es_activo"]],
+                "categorias": [f["id"] for f in filas_categorias if not f["esta_activa"]],
+            },
+            "since": _token_catalogo(posiciones),
+            "hay_mas": mas_productos or mas_categorias,
+        },
+        status=200,
+    )
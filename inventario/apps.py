@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class InventarioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventario'
+
+    def ready(self):
+        # Conecta los receivers que invalidan las cachés de productos
+        from . import signals  # noqa: F401
+        from .busqueda import asegurar_indice
+
+        post_migrate.connect(asegurar_indice, sender=self)
@@ -0,0 +1,312 @@
+"""
+Búsqueda de productos por texto (nombre, descripción y código de barras).
+
+Usa un índice de texto completo mantenido por la propia base de datos:
+
+- SQLite: tabla virtual FTS5 (inventario_producto_fts) con contenido externo
+  sobre inventario_producto, sin acentos (remove_diacritics) y con índices
+  de prefijo. Triggers AFTER INSERT/UPDATE/DELETE la mantienen al día en cada
+  Producto.save(), bulk_create o delete; los UPDATE de stock no la tocan.
+- MySQL: índice FULLTEXT (InnoDB lo mantiene solo).
+
+buscar_ids() devuelve los ids ordenados por relevancia, con coincidencia por
+prefijo en cada palabra ("coca co" encuentra "Coca Cola"); buscar_pagina()
+los entrega por páginas, con un cursor (relevancia, id). Si la base de
+datos no tiene índice (otro motor, o SQLite sin FTS5) devuelve None y la
+vista debe filtrar por Producto.texto_busqueda (sin acentos ni mayúsculas).
+
+Búsqueda difusa (?modo=difuso): TrigramaProducto.objects.similares() busca
+por trigramas del nombre, tolerando errores de tipeo ("fidios", "yogur").
+Los productos creados con bulk_create necesitan reindexar_difuso().
+"""
+
+import re
+
+from django.db import DatabaseError, connection, connections
+
+from yuyitos.paginacion import CursorInvalido, codificar_cursor, decodificar_cursor
+
+TABLA_FTS = "inventario_producto_fts"
+INDICE_MYSQL = "inventario_producto_fulltext"
+
+# ?modo= de las vistas de búsqueda para usar la búsqueda difusa
+MODO_DIFUSO = "difuso"
+
+# Resultados por página de una búsqueda (los más relevantes primero)
+LIMITE_RESULTADOS = 200
+
+# Peso de cada columna en el ranking bm25 de SQLite: nombre, descripción, código
+PESOS_SQLITE = (10.0, 1.0, 5.0)
+
+# InnoDB ignora palabras más cortas que innodb_ft_min_token_size (3 por defecto)
+LARGO_MINIMO_MYSQL = 3
+
+_COLUMNAS = "nombre, descripcion, codigo_barras"
+
+_TRIGGERS_SQLITE = {
+    f"{TABLA_FTS}_ai": f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ai
+        AFTER INSERT ON inventario_producto BEGIN
+            INSERT INTO {TABLA_FTS}(rowid, {_COLUMNAS})
+            VALUES (new.id, new.nombre, new.descripcion, new.codigo_barras);
+        END
+    """,
+    f"{TABLA_FTS}_ad": f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ad
+        AFTER DELETE ON inventario_producto BEGIN
+            INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, {_COLUMNAS})
+            VALUES ('delete', old.id, old.nombre, old.descripcion, old.codigo_barras);
+        END
+    """,
+    f"{TABLA_FTS}_au": f"""
+        CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_au
+        AFTER UPDATE OF {_COLUMNAS} ON inventario_producto BEGIN
+            INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, {_COLUMNAS})
+            VALUES ('delete', old.id, old.nombre, old.descripcion, old.codigo_barras);
+            INSERT INTO {TABLA_FTS}(rowid, {_COLUMNAS})
+            VALUES (new.id, new.nombre, new.descripcion, new.codigo_barras);
+        END
+    """,
+}
+
+# Conexiones (alias + nombre de BD) donde ya se verificó si hay índice
+_disponible = {}
+
+
+def _clave(conexion):
+    return (conexion.alias, str(conexion.settings_dict.get("NAME")))
+
+
+def instalar(conexion=connection):
+    """
+    Crea el índice si no existe. Se llama desde la migración y después de
+    cada migrate: en SQLite, las migraciones que reconstruyen la tabla
+    inventario_producto borran sus triggers, y aquí se vuelven a crear.
+    """
+    _disponible.pop(_clave(conexion), None)
+
+    if conexion.vendor == "sqlite":
+        with conexion.cursor() as cursor:
+            try:
+                cursor.execute(
+                    f"""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5(
+                        {_COLUMNAS},
+                        content='inventario_producto',
+                        content_rowid='id',
+                        tokenize='unicode61 remove_diacritics 2',
+                        prefix='2 3'
+                    )
+                    """
+                )
+            except DatabaseError:
+                # SQLite compilado sin FTS5: se sigue usando icontains
+                return False
+
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+                list(_TRIGGERS_SQLITE),
+            )
+            existentes = {fila[0] for fila in cursor.fetchall()}
+            if len(existentes) < len(_TRIGGERS_SQLITE):
+                for sql in _TRIGGERS_SQLITE.values():
+                    cursor.execute(sql)
+                # Pudo haber cambios sin trigger: se reindexa todo
+                cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')")
+        return True
+
+    if conexion.vendor == "mysql":
+        with conexion.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = 'inventario_producto' "
+                "AND index_name = %s",
+                [INDICE_MYSQL],
+            )
+            if not cursor.fetchone()[0]:
+                cursor.execute(
+                    f"ALTER TABLE inventario_producto "
+                    f"ADD FULLTEXT INDEX {INDICE_MYSQL} ({_COLUMNAS})"
+                )
+        return True
+
+    return False
+
+
+def desinstalar(conexion=connection):
+    _disponible.pop(_clave(conexion), None)
+
+    with conexion.cursor() as cursor:
+        if conexion.vendor == "sqlite":
+            for nombre in _TRIGGERS_SQLITE:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {nombre}")
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLA_FTS}")
+        elif conexion.vendor == "mysql":
+            cursor.execute(f"ALTER TABLE inventario_producto DROP INDEX {INDICE_MYSQL}")
+
+
+def disponible(conexion=connection):
+    """
+    True si la BD tiene el índice de texto completo (se consulta una vez).
+    """
+    clave = _clave(conexion)
+    if clave not in _disponible:
+        if conexion.vendor == "sqlite":
+            _disponible[clave] = TABLA_FTS in conexion.introspection.table_names()
+        elif conexion.vendor == "mysql":
+            with conexion.cursor() as cursor:
+                cursor.execute(
+                    "SELECT COUNT(*) FROM information_schema.statistics "
+                    "WHERE table_schema = DATABASE() AND table_name = 'inventario_producto' "
+                    "AND index_name = %s",
+                    [INDICE_MYSQL],
+                )
+                _disponible[clave] = bool(cursor.fetchone()[0])
+        else:
+            _disponible[clave] = False
+    return _disponible[clave]
+
+
+def palabras(q):
+    return re.findall(r"\w+", q.lower())
+
+
+def buscar_ids(q, limite=LIMITE_RESULTADOS, conexion=connection):
+    """
+    Ids de productos que contienen todas las palabras de q (como prefijo),
+    del más al menos relevante (los primeros limite). None si no hay índice
+    para esta búsqueda.
+    """
+    pagina = buscar_pagina(q, limite, conexion=conexion)
+    return None if pagina is None else pagina[0]
+
+
+def buscar_pagina(q, limite=LIMITE_RESULTADOS, despues=None, conexion=connection):
+    """
+    Una página de la búsqueda, ordenada por (relevancia, id): (ids, siguiente).
+    siguiente es el (rango, id) del último id entregado si quedan más
+    resultados, o None; pasado como despues trae la página que sigue (se
+    pagina por keyset, sin OFFSET). None si no hay índice para esta búsqueda.
+    """
+    if not disponible(conexion):
+        return None
+
+    terminos = palabras(q)
+    if not terminos:
+        return [], None
+
+    # Se pide una fila de más para saber si hay otra página
+    with conexion.cursor() as cursor:
+        if conexion.vendor == "sqlite":
+            # bm25: más negativo = más relevante
+            consulta = " ".join(f'"{t}"*' for t in terminos)
+            filtro, parametros = "", []
+            if despues is not None:
+                filtro = "WHERE rango > %s OR (rango = %s AND id > %s)"
+                parametros = [despues[0], despues[0], despues[1]]
+            cursor.execute(
+                f"SELECT id, rango FROM ("
+                f"SELECT rowid AS id, bm25({TABLA_FTS}, %s, %s, %s) AS rango "
+                f"FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s"
+                f") {filtro} ORDER BY rango, id LIMIT %s",
+                [*PESOS_SQLITE, consulta, *parametros, limite + 1],
+            )
+        else:
+            terminos = [t for t in terminos if len(t) >= LARGO_MINIMO_MYSQL]
+            if not terminos:
+                # Palabras demasiado cortas para el índice FULLTEXT
+                return None
+            # MATCH: más alto = más relevante
+            consulta = " ".join(f"+{t}*" for t in terminos)
+            filtro, parametros = "", []
+            if despues is not None:
+                filtro = "HAVING rango < %s OR (rango = %s AND id > %s)"
+                parametros = [despues[0], despues[0], despues[1]]
+            cursor.execute(
+                f"SELECT id, MATCH({_COLUMNAS}) AGAINST (%s IN BOOLEAN MODE) AS rango "
+                f"FROM inventario_producto "
+                f"WHERE MATCH({_COLUMNAS}) AGAINST (%s IN BOOLEAN MODE) "
+                f"{filtro} ORDER BY rango DESC, id LIMIT %s",
+                [consulta, consulta, *parametros, limite + 1],
+            )
+        filas = cursor.fetchall()
+
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = (filas[-1][1], filas[-1][0])
+    return [fila[0] for fila in filas], siguiente
+
+
+def leer_cursor(request):
+    """
+    ?cursor= de una búsqueda -> el despues de buscar_pagina (None si no
+    viene). Lanza CursorInvalido si no se puede leer.
+    """
+    texto = request.GET.get("cursor")
+    if not texto:
+        return None
+    ultimo = decodificar_cursor(texto)
+    try:
+        return float(ultimo["rango"]), int(ultimo["id"])
+    except (KeyError, TypeError, ValueError):
+        raise CursorInvalido("El cursor no es válido.")
+
+
+def cursor_siguiente(siguiente):
+    """
+    siguiente de buscar_pagina -> texto para devolver como "next" (o None).
+    """
+    if siguiente is None:
+        return None
+    return codificar_cursor({"rango": siguiente[0], "id": siguiente[1]})
+
+
+def ordenar_por_relevancia(qs, ids):
+    """
+    Trae de qs los productos con esos ids (un solo IN) y los devuelve en una
+    lista, en el orden de relevancia de ids. Ordenar en Python es más barato
+    que un ORDER BY CASE con cientos de ramas. qs puede ser de modelos o de
+    values() (con "id" entre las columnas).
+    """
+    if not ids:
+        return []
+    posicion = {pk: n for n, pk in enumerate(ids)}
+    filas = list(qs.filter(pk__in=ids))
+    if filas and isinstance(filas[0], dict):
+        return sorted(filas, key=lambda fila: posicion[fila["id"]])
+    return sorted(filas, key=lambda producto: posicion[producto.pk])
+
+
+def asegurar_indice(sender, using="default", **kwargs):
+    """
+    Receiver de post_migrate (ver InventarioConfig.ready): si la migración
+    del índice ya se aplicó, repone los triggers que falten.
+    """
+    conexion = connections[using]
+    if conexion.vendor == "sqlite" and TABLA_FTS in conexion.introspection.table_names():
+        instalar(conexion)
+
+
+def reindexar_difuso(productos=None, lote=1000):
+    """
+    Recalcula texto_busqueda y los trigramas de los productos dados (un
+    queryset; todos si es None). Para lo creado sin pasar por save().
+    """
+    from .models import Producto, TrigramaProducto
+    from .texto import texto_busqueda
+
+    if productos is None:
+        productos = Producto.objects.all()
+    productos = productos.only("id", "nombre", "descripcion").order_by("id")
+
+    ultimo_id = 0
+    while True:
+        filas = list(productos.filter(id__gt=ultimo_id)[:lote])
+        if not filas:
+            return
+        ultimo_id = filas[-1].id
+        for producto in filas:
+            producto.texto_busqueda = texto_busqueda(producto.nombre, producto.descripcion)
+        Producto.objects.bulk_update(filas, ["texto_busqueda"])
+        TrigramaProducto.objects.indexar(filas)
@@ -0,0 +1,168 @@
+"""
+Cachés en memoria del proceso para las consultas más calientes del POS.
+
+productos_por_codigo guarda, por código de barras, la respuesta JSON ya
+serializada de /api/pos/scan/<codigo>/. Es un LRU acotado (descarta el
+menos usado al llenarse) y cada entrada vence a los POS_CACHE_TTL segundos.
+
+categorias guarda todas las categorías (cambian pocas veces al año): el
+listado de /api/categorias/ sale de memoria. Vence a los
+POS_CATEGORIAS_TTL segundos. Crear un producto busca la categoría en la BD,
+porque otro worker pudo haberla renombrado o borrado.
+
+Se invalidan desde inventario/signals.py (post_save, post_delete y
+stock_actualizado). Con varios workers cada proceso tiene su propia copia:
+el TTL acota cuánto puede quedar desactualizado un worker que no vio el
+cambio. Los update() sobre la tabla no disparan señales.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from yuyitos.http import calcular_etag
+
+
+class CacheLRU:
+    """
+    Mapa clave -> valor con tope de entradas y vencimiento, seguro entre hilos.
+
+    Cada valor se asocia a un producto_id para poder invalidarlo cuando ese
+    producto cambia, aunque se conozca solo el id (ej: stock_actualizado).
+    """
+
+    def __init__(self, max_entradas, ttl):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos = OrderedDict()  # clave -> (vence, producto_id, valor)
+        self._claves_por_producto = {}
+        self._lock = threading.Lock()
+        # Sube con cada invalidación; ver generacion()/guardar()
+        self._generacion = 0
+
+    def __len__(self):
+        return len(self._datos)
+
+    def generacion(self):
+        return self._generacion
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            vence, producto_id, valor = entrada
+            if vence < time.monotonic():
+                self._quitar(clave)
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, producto_id, valor, generacion=None):
+        """
+        Guarda el valor. Si se pasa la generacion leída antes de ir a la BD
+        y hubo una invalidación entremedio, no se guarda (el valor podría
+        ser anterior al cambio).
+        """
+        with self._lock:
+            if generacion is not None and generacion != self._generacion:
+                return False
+            self._quitar(clave)
+            self._datos[clave] = (time.monotonic() + self.ttl, producto_id, valor)
+            self._claves_por_producto.setdefault(producto_id, set()).add(clave)
+            while len(self._datos) > self.max_entradas:
+                self._quitar(next(iter(self._datos)))
+            return True
+
+    def invalidar_productos(self, producto_ids):
+        with self._lock:
+            self._generacion += 1
+            for producto_id in producto_ids:
+                for clave in list(self._claves_por_producto.get(producto_id, ())):
+                    self._quitar(clave)
+
+    def limpiar(self):
+        with self._lock:
+            self._generacion += 1
+            self._datos.clear()
+            self._claves_por_producto.clear()
+
+    def _quitar(self, clave):
+        entrada = self._datos.pop(clave, None)
+        if entrada is None:
+            return
+        producto_id = entrada[1]
+        claves = self._claves_por_producto.get(producto_id)
+        if claves is not None:
+            claves.discard(clave)
+            if not claves:
+                del self._claves_por_producto[producto_id]
+
+
+class CacheCategorias:
+    """
+    Todas las categorías, leídas de una vez en la primera consulta.
+
+    Cada invalidación sube la versión y descarta los datos. Una lectura de
+    la BD que empezó antes de una invalidación no se guarda (podría traer
+    la categoría sin el cambio), igual que CacheLRU.guardar(generacion=...).
+    """
+
+    COLUMNAS = ("id", "nombre", "descripcion", "esta_activa")
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._version = 0
+        self._datos = None  # (vence, activas, huella)
+        self._lock = threading.Lock()
+
+    def version(self):
+        return self._version
+
+    def invalidar(self):
+        with self._lock:
+            self._version += 1
+            self._datos = None
+
+    def _vigentes(self):
+        datos = self._datos
+        if datos is not None and datos[0] >= time.monotonic():
+            return datos
+
+        from .models import Categoria  # models importa signals, que importa este módulo
+
+        version = self._version
+        filas = list(Categoria.objects.order_by("nombre").values(*self.COLUMNAS))
+        datos = (
+            time.monotonic() + self.ttl,
+            tuple(f for f in filas if f["esta_activa"]),
+            calcular_etag(*(valor for f in filas for valor in f.values())),
+        )
+        with self._lock:
+            if version == self._version:
+                self._datos = datos
+        return datos
+
+    def activas(self):
+        """
+        dicts con COLUMNAS de las categorías activas, por nombre. No se
+        deben modificar: son los mismos para todas las consultas.
+        """
+        return self._vigentes()[1]
+
+    def huella(self):
+        """
+        Hash del contenido: igual en todos los workers con los mismos datos
+        (sirve de ETag, a diferencia de la versión, que es del proceso).
+        """
+        return self._vigentes()[2]
+
+
+categorias = CacheCategorias(ttl=settings.POS_CATEGORIAS_TTL)
+
+productos_por_codigo = CacheLRU(
+    max_entradas=settings.POS_CACHE_MAX_ENTRADAS,
+    ttl=settings.POS_CACHE_TTL,
+)
@@ -0,0 +1,58 @@
+"""
+Formatos compactos del catálogo de productos para cajas con enlaces lentos.
+
+El JSON de /api/productos/ repite el nombre de cada campo en cada producto
+y manda los precios como strings ("1500.00"). Con Accept se puede pedir:
+
+- TIPO_FILAS: JSON con los nombres de campo una sola vez y una lista por
+  producto, en el mismo orden:
+      {"campos": ["id", "nombre", "precio_venta"], "escala_precios": 100,
+       "filas": [[1, "Coca Cola 1L", 150000], ...], "count": 1}
+
+Los precios van como enteros: precio * escala_precios.
+
+La respuesta se arma mientras se envía, sin tener todo el catálogo en
+memoria (ver codificar_filas).
+"""
+
+import json
+
+from yuyitos.streaming import json_por_trozos
+
+TIPO_JSON = "application/json"
+TIPO_FILAS = "application/vnd.yuyitos.filas+json"
+
+# Precio entero = precio * ESCALA_PRECIOS (los precios tienen 2 decimales)
+ESCALA_PRECIOS = 100
+
+# Productos por trozo de la respuesta
+FILAS_POR_TROZO = 1000
+
+
+def tipos_disponibles():
+    """
+    Tipos que se pueden pedir con Accept, en orden de preferencia ante */*.
+    """
+    return [TIPO_JSON, TIPO_FILAS]
+
+
+def precio_entero(valor):
+    return int(valor * ESCALA_PRECIOS)
+
+
+def codificar_filas(campos, filas):
+    """
+    Cuerpo TIPO_FILAS, en trozos de bytes, a partir de un iterable de listas.
+    """
+    return json_por_trozos(
+        {"campos": list(campos), "escala_precios": ESCALA_PRECIOS},
+        "filas",
+        filas,
+        encoder=json.JSONEncoder(ensure_ascii=False, separators=(",", ":")),
+        por_trozo=FILAS_POR_TROZO,
+    )
+
+
+CODIFICADORES = {
+    TIPO_FILAS: codificar_filas,
+}
@@ -0,0 +1,225 @@
+import json
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from inventario.busqueda import buscar_ids, ordenar_por_relevancia, reindexar_difuso
+from inventario.models import Producto, TrigramaProducto
+from inventario.sugerencias import indice_sugerencias
+from yuyitos.bench import commit_actual, resumen_latencias
+
+
+# Los productos sembrados llevan este prefijo en el código de barras
+PREFIJO = "BCAT"
+TAMANO_LOTE = 1000
+
+TIPOS = [
+    "Galletas", "Bebida", "Jugo", "Leche", "Yogurt", "Arroz", "Fideos", "Aceite",
+    "Azúcar", "Café", "Té", "Detergente", "Shampoo", "Jabón", "Papas fritas",
+    "Chocolate", "Cerveza", "Agua mineral", "Harina", "Atún", "Mermelada",
+]
+MARCAS = [
+    "Costa", "McKay", "Coca Cola", "Watts", "Soprole", "Colún", "Tucapel",
+    "Carozzi", "Chef", "Iansa", "Nescafé", "Supremo", "Omo", "Sedal", "Dove",
+    "Lays", "Sahne Nuss", "Cristal", "Cachantun", "Selecta", "Van Camps",
+]
+VARIANTES = [
+    "Original", "Light", "Zero", "Limón", "Frutilla", "Vainilla", "Integral",
+    "Naranja", "Durazno", "Natural", "Extra", "Clásico", "Premium", "Familiar",
+]
+TAMANOS = ["100g", "250g", "500g", "1kg", "350ml", "500ml", "1L", "1.5L", "2L", "3L"]
+
+
+def _nombre(azar):
+    return (
+        f"{azar.choice(TIPOS)} {azar.choice(MARCAS)} "
+        f"{azar.choice(VARIANTES)} {azar.choice(TAMANOS)}"
+    )
+
+
+def sembrar_catalogo(cantidad, azar, stdout):
+    """
+    Deja exactamente `cantidad` productos sembrados (con prefijo PREFIJO),
+    reutilizando los de una corrida anterior con --conservar.
+    """
+    existentes = Producto.objects.filter(codigo_barras__startswith=PREFIJO).count()
+    if existentes == cantidad:
+        stdout.write(f"Reutilizando {existentes} productos sembrados.")
+        return
+    limpiar_catalogo()
+
+    inicio = time.perf_counter()
+    for desde in range(0, cantidad, TAMANO_LOTE):
+        Producto.objects.bulk_create(
+            [
+                Producto(
+                    codigo_barras=f"{PREFIJO}{i:09d}",
+                    nombre=_nombre(azar),
+                    descripcion="Producto de prueba de catálogo",
+                    precio_compra=Decimal("100.00"),
+                    precio_venta=Decimal("150.00"),
+                    stock_actual=10,
+                )
+                for i in range(desde, min(desde + TAMANO_LOTE, cantidad))
+            ]
+        )
+    # bulk_create no pasa por save(): texto sin acentos y trigramas
+    reindexar_difuso(Producto.objects.filter(codigo_barras__startswith=PREFIJO))
+    stdout.write(f"Sembrados {cantidad} productos en {time.perf_counter() - inicio:.1f} s.")
+
+
+def limpiar_catalogo():
+    Producto.objects.filter(codigo_barras__startswith=PREFIJO).delete()
+
+
+# =========================
+# ESCENARIOS
+# =========================
+# Cada escenario recibe el texto buscado y devuelve la lista de resultados,
+# como lo haría la vista correspondiente.
+
+ESCENARIOS = {}
+
+
+def escenario(nombre):
+    def registrar(funcion):
+        ESCENARIOS[nombre] = funcion
+        return funcion
+    return registrar
+
+
+@escenario("icontains")
+def _buscar_icontains(q):
+    """
+    Filtro anterior de /api/pos/productos/ (recorre toda la tabla).
+    """
+    qs = Producto.objects.filter(es_activo=True).filter(
+        Q(nombre__icontains=q) | Q(descripcion__icontains=q)
+    )
+    return list(qs.order_by("nombre"))
+
+
+@escenario("indice")
+def _buscar_indice(q):
+    """
+    Índice de texto completo de inventario/busqueda.py.
+    """
+    ids = buscar_ids(q)
+    if ids is None:
+        raise CommandError("Esta base de datos no tiene el índice de texto completo.")
+    return ordenar_por_relevancia(Producto.objects.filter(es_activo=True), ids)
+
+
+@escenario("difuso")
+def _buscar_difuso(q):
+    """
+    Trigramas de TrigramaProducto (?modo=difuso).
+    """
+    ids = TrigramaProducto.objects.similares(q)
+    return ordenar_por_relevancia(Producto.objects.filter(es_activo=True), ids)
+
+
+@escenario("sugerencias")
+def _sugerir(q):
+    """
+    Índice en memoria de inventario/sugerencias.py (las 10 primeras).
+    La primera llamada (calentamiento) lo construye.
+    """
+    return indice_sugerencias.sugerir(q)
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de rendimiento de la búsqueda de productos: siembra un "
+        "catálogo grande y mide la latencia de búsquedas tecla a tecla en "
+        "cada escenario. El resultado se guarda en JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--productos", type=int, default=100000)
+        parser.add_argument(
+            "--consultas",
+            type=int,
+            default=300,
+            help="Búsquedas por escenario.",
+        )
+        parser.add_argument(
+            "--escenarios",
+            nargs="+",
+            choices=sorted(ESCENARIOS),
+            default=sorted(ESCENARIOS),
+        )
+        parser.add_argument("--semilla", type=int, default=1)
+        parser.add_argument("--salida", default=None)
+        parser.add_argument(
+            "--conservar",
+            action="store_true",
+            help="No borrar el catálogo sembrado (la próxima corrida lo reutiliza).",
+        )
+
+    def _consultas(self, azar, cantidad):
+        """
+        Lo que escribe un cajero: prefijos crecientes de un nombre real
+        ("ga", "gal", "gall", ..., "galletas co", ...).
+        """
+        consultas = []
+        while len(consultas) < cantidad:
+            nombre = _nombre(azar).lower()
+            for largo in range(2, len(nombre) + 1):
+                texto = nombre[:largo]
+                if not texto.endswith(" "):
+                    consultas.append(texto)
+        return consultas[:cantidad]
+
+    def handle(self, *args, **options):
+        azar = random.Random(options["semilla"])
+        sembrar_catalogo(options["productos"], azar, self.stdout)
+        consultas = self._consultas(azar, options["consultas"])
+
+        escenarios = {}
+        for nombre in options["escenarios"]:
+            buscar = ESCENARIOS[nombre]
+            buscar(consultas[0])  # calienta cachés de la BD
+
+            latencias = []
+            resultados = 0
+            for q in consultas:
+                inicio = time.perf_counter()
+                encontrados = buscar(q)
+                latencias.append(time.perf_counter() - inicio)
+                resultados += len(encontrados)
+
+            escenarios[nombre] = {
+                "latencia_ms": resumen_latencias(latencias),
+                "resultados_promedio": round(resultados / len(consultas), 1),
+            }
+            self.stdout.write(
+                f"{nombre:<12} p50 {escenarios[nombre]['latencia_ms']['p50']} ms  "
+                f"p95 {escenarios[nombre]['latencia_ms']['p95']} ms"
+            )
+
+        resultado = {
+            "fecha": timezone.now().isoformat(),
+            "commit": commit_actual(),
+            "base_de_datos": connection.vendor,
+            "productos": options["productos"],
+            "consultas": len(consultas),
+            "escenarios": escenarios,
+        }
+        if "sugerencias" in escenarios:
+            resultado["indice_sugerencias"] = indice_sugerencias.estadisticas()
+
+        if not options["conservar"]:
+            limpiar_catalogo()
+
+        texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if options["salida"]:
+            with open(options["salida"], "w", encoding="utf-8") as archivo:
+                archivo.write(texto + "\n")
+            self.stdout.write(f"Resultado guardado en {options['salida']}")
+        self.stdout.write(texto)
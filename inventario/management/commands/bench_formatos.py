@@ -0,0 +1,134 @@
+import gzip
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.utils import timezone
+
+from inventario import formatos
+from inventario.api_productos import (
+    CAMPOS_PRODUCTO,
+    columnas_compactas,
+    filas_a_dicts,
+    filas_compactas,
+)
+from inventario.models import Producto
+from yuyitos.bench import commit_actual, resumen_latencias
+
+from .bench_catalogo import limpiar_catalogo, sembrar_catalogo
+
+
+# =========================
+# FORMATOS
+# =========================
+# Cada formato recibe las filas ya leídas de la BD y devuelve el cuerpo
+# completo en bytes, como lo arma GET /api/productos/.
+
+def _json(filas, campos):
+    """
+    JSON actual (dict por producto, precios como string).
+    """
+    data = filas_a_dicts(filas["dicts"], campos)
+    cuerpo = {"count": len(data), "results": data, "next": None}
+    return json.dumps(cuerpo, cls=DjangoJSONEncoder).encode("utf-8")
+
+
+def _compacto(tipo):
+    def codificar(filas, campos):
+        compactas = filas_compactas(filas["tuplas"], campos)
+        return b"".join(formatos.CODIFICADORES[tipo](campos, compactas))
+    codificar.__doc__ = f"{tipo} (inventario/formatos.py)."
+    return codificar
+
+
+FORMATOS = {
+    "json": _json,
+    "filas": _compacto(formatos.TIPO_FILAS),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el tamaño y el tiempo de codificación del catálogo completo "
+        "de /api/productos/ en JSON y en los formatos compactos (Accept). "
+        "El resultado se guarda en JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--productos", type=int, default=50000)
+        parser.add_argument(
+            "--repeticiones",
+            type=int,
+            default=5,
+            help="Codificaciones por formato.",
+        )
+        parser.add_argument(
+            "--formatos",
+            nargs="+",
+            choices=sorted(FORMATOS),
+            default=sorted(FORMATOS),
+        )
+        parser.add_argument("--semilla", type=int, default=1)
+        parser.add_argument("--salida", default=None)
+        parser.add_argument(
+            "--conservar",
+            action="store_true",
+            help="No borrar el catálogo sembrado (la próxima corrida lo reutiliza).",
+        )
+
+    def handle(self, *args, **options):
+        sembrar_catalogo(options["productos"], random.Random(options["semilla"]), self.stdout)
+
+        # Se mide solo la codificación: las filas se leen una vez
+        campos = list(CAMPOS_PRODUCTO)
+        productos = Producto.objects.order_by("nombre", "id")
+        filas = {
+            "dicts": list(productos.values(*set(CAMPOS_PRODUCTO.values()))),
+            "tuplas": list(productos.values_list(*columnas_compactas(campos))),
+        }
+
+        resultados = {}
+        for nombre in options["formatos"]:
+            codificar = FORMATOS[nombre]
+
+            duraciones = []
+            for _ in range(options["repeticiones"]):
+                inicio = time.perf_counter()
+                cuerpo = codificar(filas, campos)
+                duraciones.append(time.perf_counter() - inicio)
+
+            resultados[nombre] = {
+                "bytes": len(cuerpo),
+                "bytes_gzip": len(gzip.compress(cuerpo, compresslevel=6)),
+                "codificacion_ms": resumen_latencias(duraciones),
+            }
+            self.stdout.write(
+                f"{nombre:<9} {resultados[nombre]['bytes'] / 1024:>9.0f} KiB  "
+                f"gzip {resultados[nombre]['bytes_gzip'] / 1024:>7.0f} KiB  "
+                f"p50 {resultados[nombre]['codificacion_ms']['p50']} ms"
+            )
+
+        if "json" in resultados:
+            for nombre, datos in resultados.items():
+                datos["relativo_a_json"] = round(datos["bytes"] / resultados["json"]["bytes"], 3)
+
+        resultado = {
+            "fecha": timezone.now().isoformat(),
+            "commit": commit_actual(),
+            "base_de_datos": connection.vendor,
+            "productos": len(filas["tuplas"]),
+            "formatos": resultados,
+        }
+
+        if not options["conservar"]:
+            limpiar_catalogo()
+
+        texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if options["salida"]:
+            with open(options["salida"], "w", encoding="utf-8") as archivo:
+                archivo.write(texto + "\n")
+            self.stdout.write(f"Resultado guardado en {options['salida']}")
+        self.stdout.write(texto)
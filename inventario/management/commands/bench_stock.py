@@ -0,0 +1,125 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection
+
+from inventario.models import Producto
+
+
+def _descuento_atomico(producto_id, cantidad):
+    return Producto.objects.descontar_stock(producto_id, cantidad)
+
+
+def _descuento_leer_y_grabar(producto_id, cantidad):
+    """
+    Forma antigua (lectura + escritura desde la instancia), para comparar.
+    Bajo concurrencia pierde actualizaciones.
+    """
+    producto = Producto.objects.get(pk=producto_id)
+    if producto.stock_actual < cantidad:
+        return False
+    producto.stock_actual -= cantidad
+    producto.save(update_fields=["stock_actual"])
+    return True
+
+
+MODOS = {
+    "atomico": _descuento_atomico,
+    "leer-grabar": _descuento_leer_y_grabar,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de estrés del descuento de stock: varios hilos descuentan "
+        "del mismo producto y se verifica que no se pierdan actualizaciones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hilos", type=int, default=8)
+        parser.add_argument(
+            "--operaciones",
+            type=int,
+            default=200,
+            help="Descuentos por hilo.",
+        )
+        parser.add_argument("--cantidad", type=int, default=1)
+        parser.add_argument(
+            "--stock-inicial",
+            type=int,
+            default=None,
+            help="Por defecto alcanza justo para todas las operaciones.",
+        )
+        parser.add_argument("--modo", choices=sorted(MODOS), default="atomico")
+
+    def handle(self, *args, **options):
+        hilos = options["hilos"]
+        operaciones = options["operaciones"]
+        cantidad = options["cantidad"]
+        stock_inicial = options["stock_inicial"]
+        if stock_inicial is None:
+            stock_inicial = hilos * operaciones * cantidad
+        descontar = MODOS[options["modo"]]
+
+        producto = Producto.objects.create(
+            nombre="BENCH stock (producto caliente)",
+            precio_compra=Decimal("1.00"),
+            precio_venta=Decimal("1.00"),
+            stock_actual=stock_inicial,
+        )
+
+        exitos = [0] * hilos
+        rechazos = [0] * hilos
+        errores_bloqueo = [0] * hilos
+        partida = threading.Barrier(hilos)
+
+        def trabajar(n):
+            try:
+                partida.wait()
+                for _ in range(operaciones):
+                    try:
+                        if descontar(producto.pk, cantidad):
+                            exitos[n] += 1
+                        else:
+                            rechazos[n] += 1
+                    except OperationalError:
+                        # p.ej. "database is locked" en SQLite
+                        errores_bloqueo[n] += 1
+            finally:
+                connection.close()
+
+        close_old_connections()
+        inicio = time.perf_counter()
+        threads = [threading.Thread(target=trabajar, args=(n,)) for n in range(hilos)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        duracion = time.perf_counter() - inicio
+
+        producto.refresh_from_db()
+        total_exitos = sum(exitos)
+        esperado = stock_inicial - total_exitos * cantidad
+        perdidas = producto.stock_actual - esperado
+        intentos = hilos * operaciones
+
+        producto.delete()
+
+        self.stdout.write(f"Base de datos:         {connection.vendor}")
+        self.stdout.write(f"Modo:                  {options['modo']}")
+        self.stdout.write(f"Hilos x operaciones:   {hilos} x {operaciones}")
+        self.stdout.write(f"Descuentos exitosos:   {total_exitos}")
+        self.stdout.write(f"Rechazos sin stock:    {sum(rechazos)}")
+        self.stdout.write(f"Errores de bloqueo:    {sum(errores_bloqueo)}")
+        self.stdout.write(f"Stock final:           {producto.stock_actual} (esperado {esperado})")
+        self.stdout.write(f"Duración:              {duracion:.3f} s")
+        self.stdout.write(f"Throughput:            {intentos / duracion:.1f} op/s")
+
+        if perdidas:
+            self.stdout.write(
+                self.style.ERROR(f"Actualizaciones perdidas: {perdidas}")
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS("Actualizaciones perdidas: 0"))
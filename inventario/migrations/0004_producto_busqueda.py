@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def crear_indice(apps, schema_editor):
+    from inventario.busqueda import instalar
+
+    instalar(schema_editor.connection)
+
+
+def borrar_indice(apps, schema_editor):
+    from inventario.busqueda import desinstalar
+
+    desinstalar(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """
+    Índice de texto completo de productos (FTS5 en SQLite, FULLTEXT en MySQL).
+    Ver inventario/busqueda.py.
+    """
+
+    dependencies = [
+        ('inventario', '0003_alter_producto_stock_actual_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
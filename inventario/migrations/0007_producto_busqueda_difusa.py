@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from inventario.texto import texto_busqueda, trigramas
+
+LOTE = 1000
+
+
+def llenar_busqueda(apps, schema_editor):
+    """
+    texto_busqueda y trigramas de los productos existentes, por lotes.
+    """
+    Producto = apps.get_model("inventario", "Producto")
+    TrigramaProducto = apps.get_model("inventario", "TrigramaProducto")
+
+    productos = Producto.objects.only("id", "nombre", "descripcion").order_by("id")
+    ultimo_id = 0
+    while True:
+        lote = list(productos.filter(id__gt=ultimo_id)[:LOTE])
+        if not lote:
+            break
+        ultimo_id = lote[-1].id
+        for p in lote:
+            p.texto_busqueda = texto_busqueda(p.nombre, p.descripcion)
+        Producto.objects.bulk_update(lote, ["texto_busqueda"])
+        TrigramaProducto.objects.bulk_create(
+            [
+                TrigramaProducto(producto_id=p.id, trigrama=t)
+                for p in lote
+                for t in trigramas(p.nombre)
+            ]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0006_catalogo_actualizado_en'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='texto_busqueda',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.CreateModel(
+            name='TrigramaProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigrama', models.CharField(max_length=3)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigramas', to='inventario.producto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('trigrama', 'producto'), name='trigrama_producto_unico')],
+            },
+        ),
+        migrations.RunPython(llenar_busqueda, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,11 @@
-from django.db import models
+import math
+
+from django.db import models, transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .signals import stock_actualizado
+from .texto import texto_busqueda, trigramas
 
 
 class Categoria(models.Model):
@@ -6,6 +13,9 @@ class Categoria(models.Model):
     descripcion = models.TextField(blank=True)
     esta_activa = models.BooleanField(default=True)
 
+    # Para la sincronización incremental de /api/catalogo/
+    actualizado_en = models.DateTimeField(auto_now=True)
+
     class Meta:
         verbose_name = "Categoría"
         verbose_name_plural = "Categorías"
@@ -15,6 +25,125 @@ class Categoria(models.Model):
         return self.nombre
 
 
+def _cantidad_por_producto(cantidades):
+    """
+    CASE id WHEN <id> THEN <cantidad> ... END, para actualizar varios
+    productos con un solo UPDATE.
+    """
+    return Case(
+        *[When(pk=pid, then=Value(cant)) for pid, cant in cantidades.items()],
+        output_field=IntegerField(),
+    )
+
+
+class StockInsuficiente(Exception):
+    """
+    Algún producto de descontar_stock_lote no tiene stock suficiente (o no
+    existe / está inactivo).
+    """
+
+
+def _validar_cantidades(cantidades):
+    for cantidad in cantidades.values():
+        if cantidad < 0:
+            raise ValueError("La cantidad no puede ser negativa.")
+
+
+class ProductoManager(models.Manager):
+    """
+    Operaciones de stock atómicas: cada una es un único UPDATE en la BD,
+    sin leer el producto antes. Así dos cajas vendiendo el mismo producto
+    a la vez no se pisan el stock.
+    """
+
+    def descontar_stock(self, producto_id, cantidad: int) -> bool:
+        """
+        UPDATE ... SET stock_actual = stock_actual - n
+         WHERE id = ? AND stock_actual >= n AND es_activo
+
+        Devuelve True si se descontó (una fila afectada) y False si no
+        había stock suficiente (o el producto no existe / está inactivo).
+        """
+        try:
+            return self.descontar_stock_lote({producto_id: cantidad})
+        except StockInsuficiente:
+            # un solo producto: el UPDATE no tocó nada, no hay que deshacer
+            return False
+
+    def aumentar_stock(self, producto_id, cantidad: int) -> bool:
+        """
+        UPDATE ... SET stock_actual = stock_actual + n WHERE id = ?
+        Devuelve True si el producto existe.
+        """
+        return self.aumentar_stock_lote({producto_id: cantidad})
+
+    def descontar_stock_lote(self, cantidades) -> bool:
+        """
+        Descuenta el stock de varios productos con un solo UPDATE condicional.
+        cantidades: dict {producto_id: cantidad}
+
+        Es todo o nada: si algún producto no tiene stock suficiente lanza
+        StockInsuficiente y la BD deshace el UPDATE. No usa savepoint (la
+        venta hace las mismas consultas con 1 o 20 detalles): dentro de una
+        transacción de quien llama, la excepción la deja marcada para
+        rollback, así que hay que dejarla salir de ese atomic (ver
+        confirmar_venta en ventas/registro.py).
+        """
+        cantidades = {pid: cant for pid, cant in cantidades.items() if cant}
+        if not cantidades:
+            return True
+        _validar_cantidades(cantidades)
+
+        cantidad_por_id = _cantidad_por_producto(cantidades)
+        productos = self.filter(pk__in=list(cantidades), es_activo=True).filter(
+            stock_actual__gte=cantidad_por_id
+        )
+
+        def descontar():
+            filas = productos.update(
+                stock_actual=F("stock_actual") - cantidad_por_id,
+                actualizado_en=timezone.now(),
+            )
+            if filas != len(cantidades):
+                raise StockInsuficiente(
+                    "No hay stock suficiente para todos los productos."
+                )
+
+        if len(cantidades) == 1:
+            # Un solo producto: si no alcanza, el UPDATE no tocó nada y la
+            # transacción de quien llama sigue usable
+            descontar()
+        else:
+            with transaction.atomic(using=self.db, savepoint=False):
+                descontar()
+
+        stock_actualizado.send(
+            sender=Producto,
+            cambios={pid: -cant for pid, cant in cantidades.items()},
+        )
+        return True
+
+    def aumentar_stock_lote(self, cantidades) -> int:
+        """
+        Aumenta el stock de varios productos con un solo UPDATE.
+        cantidades: dict {producto_id: cantidad}
+        Devuelve la cantidad de productos actualizados.
+        """
+        cantidades = {pid: cant for pid, cant in cantidades.items() if cant}
+        if not cantidades:
+            return 0
+        _validar_cantidades(cantidades)
+
+        filas = self.filter(pk__in=list(cantidades)).update(
+            stock_actual=F("stock_actual") + _cantidad_por_producto(cantidades),
+            actualizado_en=timezone.now(),
+        )
+
+        if filas:
+            stock_actualizado.send(sender=Producto, cambios=dict(cantidades))
+        return filas
+
+
 class Producto(models.Model):
     codigo_barras = models.CharField(
         max_length=50,
@@ -51,33 +180,139 @@ class Producto(models.Model):
 
     es_activo = models.BooleanField(default=True)
 
+    # Nombre y descripción sin acentos y en minúsculas (ver inventario/texto.py).
+    # Lo mantiene save(); los bulk_create deben llamar a busqueda.reindexar_difuso()
+    texto_busqueda = models.TextField(blank=True, default="", editable=False)
+
     creado_en = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
+    objects = ProductoManager()
+
     class Meta:
         ordering = ["nombre"]
+        indexes = [
+            # Orden y cursor del listado paginado de /api/productos/
+            models.Index(fields=["nombre", "id"], name="producto_nombre_id_idx"),
+            # Cambios desde un punto dado, para /api/catalogo/?since=
+            models.Index(fields=["actualizado_en", "id"], name="producto_actualizado_id_idx"),
+        ]
 
     def __str__(self):
         return self.nombre
 
+    def save(self, *args, **kwargs):
+        """
+        Mantiene texto_busqueda y, si cambió, los trigramas del nombre.
+        Un save con update_fields que no incluye nombre ni descripción
+        (ej: solo stock) no los toca.
+        """
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not {"nombre", "descripcion"} & set(update_fields):
+            return super().save(*args, **kwargs)
+
+        texto = texto_busqueda(self.nombre, self.descripcion)
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "texto_busqueda"}
+        if not self._state.adding and texto == self.texto_busqueda:
+            return super().save(*args, **kwargs)
+
+        self.texto_busqueda = texto
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            TrigramaProducto.objects.indexar([self])
+
     def hay_stock(self, cantidad: int) -> bool:
         return self.es_activo and self.stock_actual >= cantidad
 
     def descontar_stock(self, cantidad: int):
+        """
+        Descuenta stock con un UPDATE condicional en la BD (no pisa ventas
+        hechas en paralelo). stock_actual en memoria se ajusta con el mismo
+        delta, sin volver a leer el producto.
+        """
         if cantidad < 0:
             raise ValueError("La cantidad a descontar no puede ser negativa.")
 
-        if not self.hay_stock(cantidad):
+        if not Producto.objects.descontar_stock(self.pk, cantidad):
             raise ValueError("No hay stock suficiente para este producto.")
 
         self.stock_actual -= cantidad
-        self.save(update_fields=["stock_actual"])
 
     def aumentar_stock(self, cantidad: int):
         if cantidad < 0:
             raise ValueError("La cantidad a aumentar no puede ser negativa.")
 
+        Producto.objects.aumentar_stock(self.pk, cantidad)
         self.stock_actual += cantidad
-        self.save(update_fields=["stock_actual"])
-    
-    
\ No newline at end of file
+
+
+# Búsqueda difusa: fracción mínima de los trigramas buscados que debe
+# tener el nombre de un producto ("fidios" comparte 3 de 6 con "fideos")
+UMBRAL_SIMILITUD = 0.3
+LIMITE_SIMILARES = 200
+
+
+class TrigramaProductoManager(models.Manager):
+    def indexar(self, productos):
+        """
+        Reemplaza los trigramas de esos productos (ya guardados) por los de
+        su nombre actual.
+        """
+        productos = list(productos)
+        self.filter(producto_id__in=[p.pk for p in productos]).delete()
+        self.bulk_create(
+            [
+                self.model(producto_id=p.pk, trigrama=trigrama)
+                for p in productos
+                for trigrama in trigramas(p.nombre)
+            ],
+            batch_size=2000,
+        )
+
+    def similares(self, q, limite=LIMITE_SIMILARES, umbral=UMBRAL_SIMILITUD):
+        """
+        Ids de productos cuyo nombre tiene al menos umbral de los trigramas
+        de q, del más al menos parecido. Un solo GROUP BY sobre el índice
+        (trigrama, producto): solo se leen las filas de esos trigramas.
+        """
+        buscados = trigramas(q)
+        if not buscados:
+            return []
+        minimo = max(1, math.ceil(umbral * len(buscados)))
+        filas = (
+            self.filter(trigrama__in=buscados)
+            .values("producto_id")
+            .annotate(comunes=Count("*"))
+            .filter(comunes__gte=minimo)
+            .order_by("-comunes", "producto_id")
+        )
+        return [fila["producto_id"] for fila in filas[:limite]]
+
+
+class TrigramaProducto(models.Model):
+    """
+    Trigramas de las palabras del nombre de cada producto, para la búsqueda
+    tolerante a errores de tipeo ("fidios" -> "Fideos"). Los mantiene
+    Producto.save().
+    """
+
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name="trigramas",
+    )
+    trigrama = models.CharField(max_length=3)
+
+    objects = TrigramaProductoManager()
+
+    class Meta:
+        constraints = [
+            # Su índice (trigrama primero) es el que usa similares()
+            models.UniqueConstraint(
+                fields=["trigrama", "producto"], name="trigrama_producto_unico"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.trigrama!r} ({self.producto_id})"
@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .cache import categorias, productos_por_codigo
+from .sugerencias import COLUMNAS, indice_sugerencias
+
+# Se envía cada vez que el stock cambia con un UPDATE directo
+# (Producto.objects.descontar_stock / aumentar_stock y sus variantes de lote),
+# que no disparan post_save.
+#
+# Argumentos:
+#   cambios: dict {producto_id: delta} (delta negativo = descuento)
+stock_actualizado = Signal()
+
+
+# =========================
+# INVALIDACIÓN DE CACHÉS
+# =========================
+# Se conectan al importar este módulo (ver InventarioConfig.ready).
+# Se invalida ya (para esta transacción) y al confirmar: otro hilo pudo
+# leer la BD entremedio, sin ver el cambio todavía, y guardar esa versión.
+
+def _invalidar_productos(producto_ids):
+    ids = list(producto_ids)  # copia: el dict de cambios es de quien llama
+    productos_por_codigo.invalidar_productos(ids)
+    transaction.on_commit(lambda: productos_por_codigo.invalidar_productos(ids))
+
+
+@receiver(post_save, sender="inventario.Producto")
+@receiver(post_delete, sender="inventario.Producto")
+def invalidar_producto(sender, instance, **kwargs):
+    _invalidar_productos([instance.pk])
+
+
+@receiver(stock_actualizado)
+def invalidar_stock(sender, cambios, **kwargs):
+    _invalidar_productos(cambios.keys())
+
+
+@receiver(post_save, sender="inventario.Categoria")
+@receiver(post_delete, sender="inventario.Categoria")
+def invalidar_categorias(sender, **kwargs):
+    categorias.invalidar()
+    transaction.on_commit(categorias.invalidar)
+    # el escaneo incluye el nombre de la categoría: se vacía completo
+    # (cambian pocas veces al año)
+    productos_por_codigo.limpiar()
+    transaction.on_commit(productos_por_codigo.limpiar)
+
+
+# =========================
+# ÍNDICE DE SUGERENCIAS
+# =========================
+# Se aplica al confirmar la transacción: si se revierte, el índice no cambia.
+
+@receiver(post_save, sender="inventario.Producto")
+def actualizar_sugerencias(sender, instance, **kwargs):
+    fila = {columna: getattr(instance, columna) for columna in COLUMNAS}
+    transaction.on_commit(lambda: indice_sugerencias.actualizar([fila]))
+
+
+@receiver(post_delete, sender="inventario.Producto")
+def quitar_de_sugerencias(sender, instance, **kwargs):
+    producto_id = instance.pk
+    transaction.on_commit(lambda: indice_sugerencias.quitar([producto_id]))
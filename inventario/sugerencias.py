@@ -0,0 +1,373 @@
+"""
+Sugerencias de productos mientras el cajero escribe (typeahead).
+
+Índice en memoria del proceso con los productos activos, para responder
+"coca", "pan hall" o "azu" sin ir a la BD:
+
+- Cada producto tiene un rango: su posición en el orden alfabético del
+  nombre normalizado (sin acentos, en minúsculas; ver inventario/texto.py).
+- Por cada palabra de los nombres se guarda la lista ordenada de rangos de
+  los productos que la contienen. Todas las listas van seguidas en un solo
+  array de enteros, y un segundo array marca dónde empieza cada palabra.
+- Un prefijo ("co") corresponde a un tramo contiguo de palabras ordenadas
+  (bisect); se mezclan sus listas en orden y se corta a las k primeras que
+  contengan también las demás palabras buscadas.
+
+Los cambios no reconstruyen el índice: se acumulan aparte (post_save y
+post_delete de este proceso, ver inventario/signals.py) y se combinan en
+cada consulta. Al pasar de MAX_CAMBIOS se reconstruye en memoria.
+
+Con varios workers cada proceso tiene su índice. Para ver lo que cambió en
+otro proceso, cada POS_SUGERENCIAS_REFRESCO segundos se releen de la BD los
+productos con actualizado_en reciente (una consulta por índice). Un
+producto borrado de la BD en otro proceso sigue sugiriéndose hasta que el
+worker se reinicie: para sacarlo de la venta hay que desactivarlo.
+"""
+
+import bisect
+import heapq
+import sys
+import threading
+import time
+from array import array
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .texto import palabras
+
+# Sugerencias por consulta
+LIMITE_SUGERENCIAS = 10
+LIMITE_SUGERENCIAS_MAXIMO = 50
+
+# Con hasta estos candidatos, una búsqueda de varias palabras se verifica de
+# a uno; con más se usan las máscaras (ver _Base.rangos_con)
+VERIFICAR_TEXTO = 1000
+
+# Palabras con máscara de bits: las que aparecen en 1 de cada FRECUENTE
+# productos o más (la máscara ocupa 1 bit por producto; la lista, 32 por
+# aparición)
+FRECUENTE = 32
+
+# Cambios acumulados antes de reconstruir el índice
+MAX_CAMBIOS = 1000
+
+# Al revisar la BD se relee también lo grabado en este margen (la fila se
+# ve recién al confirmar la transacción, después de fijar actualizado_en)
+MARGEN_REVISION = timedelta(seconds=settings.MARGEN_CONFIRMACION_SEGUNDOS)
+
+COLUMNAS = ("id", "nombre", "codigo_barras", "precio_venta", "es_activo")
+
+
+def _entrada(fila):
+    """
+    dict con COLUMNAS -> (texto, id, nombre, codigo_barras, precio_venta),
+    o None si el producto no se sugiere. texto es el nombre normalizado con
+    un espacio antes de cada palabra: " p" in texto equivale a "alguna
+    palabra empieza con p".
+    """
+    if not fila["es_activo"]:
+        return None
+    return (
+        " " + " ".join(palabras(fila["nombre"])),
+        fila["id"],
+        fila["nombre"],
+        fila["codigo_barras"] or "",
+        sys.intern(str(fila["precio_venta"])),
+    )
+
+
+def _sin_repetir(ordenados):
+    anterior = -1
+    for valor in ordenados:
+        if valor != anterior:
+            yield valor
+            anterior = valor
+
+
+def _bits(mascara):
+    """
+    Posiciones de los bits en 1 de un entero, de menor a mayor.
+    """
+    while mascara:
+        bajo = mascara & -mascara
+        yield bajo.bit_length() - 1
+        mascara ^= bajo
+
+
+def _mascara(rangos, largo):
+    bits = bytearray((largo + 7) // 8)
+    for rango in rangos:
+        bits[rango >> 3] |= 1 << (rango & 7)
+    return int.from_bytes(bits, "little")
+
+
+class _Base:
+    """
+    Parte inmutable del índice (ver el docstring del módulo).
+
+    Las palabras frecuentes (en 1 de cada FRECUENTE productos o más) tienen
+    además una máscara de bits por rango, que ocupa menos que su lista:
+    con ellas "papas f" o "leche so" se resuelven con AND/OR de enteros
+    en vez de recorrer miles de candidatos.
+    """
+
+    def __init__(self, entradas):
+        entradas = sorted(entradas)
+        self.textos = [e[0] for e in entradas]
+        self.ids = array("q", [e[1] for e in entradas])
+        self.nombres = [e[2] for e in entradas]
+        self.codigos = [e[3] for e in entradas]
+        self.precios = [e[4] for e in entradas]
+
+        por_palabra = {}
+        for rango, texto in enumerate(self.textos):
+            for palabra in set(texto.split()):
+                por_palabra.setdefault(palabra, []).append(rango)
+
+        # rangos de la palabra i: rangos[inicios[i]:inicios[i + 1]]
+        self.palabras = sorted(por_palabra)
+        self.inicios = array("i", [0])
+        self.rangos = array("i")
+        for palabra in self.palabras:
+            self.rangos.extend(por_palabra[palabra])
+            self.inicios.append(len(self.rangos))
+
+        minimo = max(len(self.ids) // FRECUENTE, 1)
+        self.mascaras = {
+            i: _mascara(por_palabra[palabra], len(self.ids))
+            for i, palabra in enumerate(self.palabras)
+            if len(por_palabra[palabra]) >= minimo
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def entradas(self):
+        return zip(self.textos, self.ids, self.nombres, self.codigos, self.precios)
+
+    def entrada(self, rango):
+        return (
+            self.textos[rango],
+            self.ids[rango],
+            self.nombres[rango],
+            self.codigos[rango],
+            self.precios[rango],
+        )
+
+    def _palabras_con_prefijo(self, prefijo):
+        desde = bisect.bisect_left(self.palabras, prefijo)
+        hasta = bisect.bisect_left(self.palabras, prefijo + "\U0010ffff", desde)
+        return desde, hasta
+
+    def cantidad(self, prefijo):
+        """
+        Rangos en las listas de las palabras con ese prefijo (con repetidos).
+        """
+        desde, hasta = self._palabras_con_prefijo(prefijo)
+        return self.inicios[hasta] - self.inicios[desde]
+
+    def _listas(self, indices):
+        """
+        Listas de rangos (vistas, sin copiar) de esas palabras.
+        """
+        vista = memoryview(self.rangos)
+        return [vista[self.inicios[i]:self.inicios[i + 1]] for i in indices]
+
+    def rangos_con(self, terminos):
+        """
+        Rangos, en orden, de los productos que tienen una palabra que empieza
+        con cada término (quien llama corta al juntar las k primeras).
+
+        Si el término con menos candidatos tiene pocos (o es el único), se
+        recorren sus listas mezcladas en orden verificando los demás en el
+        texto. Si no, los productos con palabras frecuentes salen del AND de
+        las máscaras; solo los que entran por palabras poco frecuentes se
+        verifican de a uno.
+        """
+        terminos = sorted(set(terminos), key=self.cantidad)
+        prefijos = [" " + t for t in terminos]
+
+        if len(terminos) == 1 or self.cantidad(terminos[0]) <= VERIFICAR_TEXTO:
+            guia = range(*self._palabras_con_prefijo(terminos[0]))
+            for rango in _sin_repetir(heapq.merge(*self._listas(guia))):
+                texto = self.textos[rango]
+                if all(p in texto for p in prefijos[1:]):
+                    yield rango
+            return
+
+        todas = None
+        sueltas = []
+        for termino in terminos:
+            mascara = 0
+            for i in range(*self._palabras_con_prefijo(termino)):
+                if i in self.mascaras:
+                    mascara |= self.mascaras[i]
+                else:
+                    sueltas.append(i)
+            todas = mascara if todas is None else todas & mascara
+
+        otros = {
+            rango
+            for lista in self._listas(sueltas)
+            for rango in lista
+            if all(p in self.textos[rango] for p in prefijos)
+        }
+        yield from _sin_repetir(heapq.merge(_bits(todas), sorted(otros)))
+
+    def memoria(self):
+        """
+        Bytes aproximados: arrays, máscaras, listas y cada string (una vez
+        cada uno).
+        """
+        contenedores = [
+            self.ids, self.inicios, self.rangos,
+            self.textos, self.nombres, self.codigos, self.precios, self.palabras,
+        ]
+        total = sum(sys.getsizeof(c) for c in contenedores)
+        total += sys.getsizeof(self.mascaras)
+        total += sum(sys.getsizeof(m) for m in self.mascaras.values())
+        vistos = set()
+        for lista in contenedores[3:]:
+            for texto in lista:
+                if id(texto) not in vistos:
+                    vistos.add(id(texto))
+                    total += sys.getsizeof(texto)
+        return total
+
+
+class IndiceSugerencias:
+    """
+    Índice de sugerencias de un proceso. Se construye en la primera consulta.
+
+    Las consultas no toman el lock: leen la base y el dict de cambios
+    vigentes, que nunca se modifican (cada cambio los reemplaza).
+    """
+
+    def __init__(self, refresco):
+        self.refresco = refresco
+        self._base = None
+        self._cambios = {}  # id -> entrada nueva, o None si ya no se sugiere
+        self._marca = None  # desde qué actualizado_en releer la BD
+        self._revisar_en = 0.0
+        self._lock = threading.Lock()
+        self._construyendo = threading.Lock()
+        self.segundos_construccion = None
+
+    def limpiar(self):
+        with self._lock:
+            self._base = None
+            self._cambios = {}
+            self._marca = None
+            self._revisar_en = 0.0
+
+    def _construir(self):
+        from .models import Producto  # models importa signals, que importa este módulo
+
+        inicio = time.perf_counter()
+        marca = timezone.now() - MARGEN_REVISION
+        filas = Producto.objects.filter(es_activo=True).values(*COLUMNAS)
+        base = _Base(filter(None, map(_entrada, filas.iterator(chunk_size=2000))))
+        with self._lock:
+            self._base = base
+            self._cambios = {}
+            self._marca = marca
+            self._revisar_en = time.monotonic() + self.refresco
+        self.segundos_construccion = time.perf_counter() - inicio
+
+    def _revisar(self):
+        if self._base is None:
+            with self._construyendo:
+                if self._base is None:
+                    self._construir()
+            return
+
+        if time.monotonic() < self._revisar_en:
+            return
+        with self._lock:
+            if time.monotonic() < self._revisar_en:
+                return  # otro hilo ya está revisando
+            self._revisar_en = time.monotonic() + self.refresco
+            desde = self._marca
+
+        from .models import Producto
+
+        marca = timezone.now() - MARGEN_REVISION
+        filas = Producto.objects.filter(actualizado_en__gte=desde).values(*COLUMNAS)
+        self._aplicar({fila["id"]: _entrada(fila) for fila in filas})
+        self._marca = max(marca, desde)
+
+    def _aplicar(self, cambios):
+        if not cambios:
+            return
+        with self._lock:
+            if self._base is None:
+                return  # se construirá con los datos nuevos
+            nuevos = {**self._cambios, **cambios}
+            if len(nuevos) <= MAX_CAMBIOS:
+                self._cambios = nuevos
+                return
+            entradas = [e for e in self._base.entradas() if e[1] not in nuevos]
+            entradas.extend(e for e in nuevos.values() if e is not None)
+            self._base = _Base(entradas)
+            self._cambios = {}
+
+    def actualizar(self, filas):
+        """
+        Productos guardados (dicts con COLUMNAS).
+        """
+        self._aplicar({fila["id"]: _entrada(fila) for fila in filas})
+
+    def quitar(self, producto_ids):
+        self._aplicar({pk: None for pk in producto_ids})
+
+    def sugerir(self, q, limite=LIMITE_SUGERENCIAS):
+        """
+        Hasta limite productos activos con palabras que empiecen con cada
+        palabra de q, en orden alfabético. Lista de dicts.
+        """
+        terminos = palabras(q)
+        if not terminos:
+            return []
+        self._revisar()
+        base, cambios = self._base, self._cambios
+
+        encontrados = []
+        for rango in base.rangos_con(terminos):
+            if base.ids[rango] in cambios:
+                continue  # su versión vigente está en cambios
+            encontrados.append(base.entrada(rango))
+            if len(encontrados) == limite:
+                break
+
+        prefijos = [" " + t for t in terminos]
+        for entrada in cambios.values():
+            if entrada is not None and all(p in entrada[0] for p in prefijos):
+                encontrados.append(entrada)
+        encontrados.sort()
+
+        return [
+            {
+                "id": pk,
+                "nombre": nombre,
+                "codigo_barras": codigo,
+                "precio_venta": precio,
+            }
+            for _, pk, nombre, codigo, precio in encontrados[:limite]
+        ]
+
+    def estadisticas(self):
+        self._revisar()
+        base = self._base
+        return {
+            "productos": len(base),
+            "palabras": len(base.palabras),
+            "entradas": len(base.rangos),
+            "cambios_pendientes": len(self._cambios),
+            "memoria_bytes": base.memoria(),
+            "construccion_s": round(self.segundos_construccion or 0, 3),
+        }
+
+
+indice_sugerencias = IndiceSugerencias(refresco=settings.POS_SUGERENCIAS_REFRESCO)
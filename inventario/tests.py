@@ -4,7 +4,7 @@ import json
 from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
 
-from inventario.models import Producto, Categoria
+from inventario.models import Producto, Categoria, StockInsuficiente
 
 
 class BaseApiProductosTestCase(TestCase):
@@ -329,3 +329,1056 @@ class ApiProductosActualizarTests(BaseApiProductosTestCase):
         )
 
         self.assertEqual(response.status_code, 404)
+
+
+# ============================================================
+# STOCK ATÓMICO (Producto.objects.descontar_stock / aumentar_stock)
+# ============================================================
+
+from inventario.signals import stock_actualizado
+
+
+from django.db import transaction
+
+
+class StockAtomicoTests(TestCase):
+    def setUp(self):
+        self.pan = Producto.objects.create(
+            nombre="Pan Hallulla",
+            precio_compra=Decimal("100.00"),
+            precio_venta=Decimal("150.00"),
+            stock_actual=10,
+        )
+        self.bebida = Producto.objects.create(
+            nombre="Bebida 3L",
+            precio_compra=Decimal("1500.00"),
+            precio_venta=Decimal("2200.00"),
+            stock_actual=2,
+        )
+
+    def test_descontar_stock_con_stock_suficiente_devuelve_true(self):
+        with self.assertNumQueries(1):
+            ok = Producto.objects.descontar_stock(self.pan.id, 4)
+
+        self.assertTrue(ok)
+        self.pan.refresh_from_db()
+        self.assertEqual(self.pan.stock_actual, 6)
+
+    def test_descontar_stock_sin_stock_devuelve_false_y_no_cambia_nada(self):
+        ok = Producto.objects.descontar_stock(self.bebida.id, 3)
+
+        self.assertFalse(ok)
+        self.bebida.refresh_from_db()
+        self.assertEqual(self.bebida.stock_actual, 2)
+
+    def test_descontar_stock_de_producto_inactivo_devuelve_false(self):
+        self.pan.es_activo = False
+        self.pan.save()
+
+        self.assertFalse(Producto.objects.descontar_stock(self.pan.id, 1))
+
+    def test_descontar_stock_lote_es_todo_o_nada(self):
+        """
+        Si un producto del lote no alcanza, no se descuenta ninguno.
+        """
+        with self.assertRaises(StockInsuficiente):
+            with transaction.atomic():
+                Producto.objects.descontar_stock_lote({self.pan.id: 1, self.bebida.id: 5})
+
+        self.pan.refresh_from_db()
+        self.bebida.refresh_from_db()
+        self.assertEqual(self.pan.stock_actual, 10)
+        self.assertEqual(self.bebida.stock_actual, 2)
+
+        ok = Producto.objects.descontar_stock_lote({self.pan.id: 1, self.bebida.id: 2})
+
+        self.assertTrue(ok)
+        self.pan.refresh_from_db()
+        self.bebida.refresh_from_db()
+        self.assertEqual(self.pan.stock_actual, 9)
+        self.assertEqual(self.bebida.stock_actual, 0)
+
+    def test_descontar_stock_lote_no_deja_actualizado_en_movido(self):
+        antes = Producto.objects.get(pk=self.pan.id).actualizado_en
+
+        with self.assertRaises(StockInsuficiente):
+            with transaction.atomic():
+                Producto.objects.descontar_stock_lote({self.pan.id: 1, self.bebida.id: 5})
+
+        self.assertEqual(Producto.objects.get(pk=self.pan.id).actualizado_en, antes)
+
+    def test_descontar_stock_lote_es_un_solo_update_sin_savepoint(self):
+        with transaction.atomic():
+            with self.assertNumQueries(1):
+                ok = Producto.objects.descontar_stock_lote({self.pan.id: 1, self.bebida.id: 2})
+
+        self.assertTrue(ok)
+
+    def test_aumentar_stock_lote_y_senal_stock_actualizado(self):
+        recibidos = []
+
+        def receptor(sender, cambios, **kwargs):
+            recibidos.append(cambios)
+
+        stock_actualizado.connect(receptor)
+        try:
+            filas = Producto.objects.aumentar_stock_lote({self.pan.id: 5, self.bebida.id: 1})
+        finally:
+            stock_actualizado.disconnect(receptor)
+
+        self.assertEqual(filas, 2)
+        self.assertEqual(recibidos, [{self.pan.id: 5, self.bebida.id: 1}])
+        self.pan.refresh_from_db()
+        self.assertEqual(self.pan.stock_actual, 15)
+
+    def test_metodo_de_instancia_descontar_stock_usa_update_atomico(self):
+        """
+        La instancia queda con el stock ajustado sin volver a leerse,
+        y falla con ValueError si no alcanza.
+        """
+        self.pan.descontar_stock(3)
+        self.assertEqual(self.pan.stock_actual, 7)
+
+        with self.assertRaises(ValueError):
+            self.bebida.descontar_stock(5)
+
+
+from django.test import override_settings
+
+from yuyitos.pruebas import PresupuestoConsultasMixin
+
+
+class PresupuestoSQLProductosTests(PresupuestoConsultasMixin, BaseApiProductosTestCase):
+    """
+    Presupuesto de consultas de /api/productos/ y cabeceras del middleware.
+    """
+
+    def test_listar_productos_no_hace_una_consulta_por_producto(self):
+        for i in range(20):
+            Producto.objects.create(
+                nombre=f"Producto Presupuesto {i}",
+                categoria=self.categoria,
+                precio_compra=Decimal("100.00"),
+                precio_venta=Decimal("150.00"),
+            )
+
+        # sesión + usuario + huellas del ETag + productos (con su categoría)
+        with self.assertMaxConsultas(5):
+            response = self.client.get("/api/productos/")
+
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(SQL_CABECERAS=True)
+    def test_middleware_agrega_cabeceras_de_bd(self):
+        response = self.client.get("/api/productos/")
+
+        self.assertEqual(response["X-DB-Queries"], "5")
+        self.assertTrue(response["X-DB-Time"].endswith("ms"))
+
+    @override_settings(SQL_CABECERAS=False)
+    def test_middleware_sin_cabeceras_si_estan_desactivadas(self):
+        response = self.client.get("/api/productos/")
+
+        self.assertNotIn("X-DB-Queries", response)
+
+    @override_settings(SQL_PRESUPUESTO_CONSULTAS=1)
+    def test_middleware_registra_requests_que_exceden_el_presupuesto(self):
+        with self.assertLogs("yuyitos.sql", level="WARNING") as logs:
+            self.client.get("/api/productos/")
+
+        self.assertIn("/api/productos/", logs.output[0])
+
+
+from inventario.cache import CacheLRU
+
+
+class CacheLRUTests(TestCase):
+    def test_descarta_el_menos_usado_al_llenarse(self):
+        cache = CacheLRU(max_entradas=2, ttl=60)
+        cache.guardar("a", 1, "A")
+        cache.guardar("b", 2, "B")
+        cache.obtener("a")  # "b" queda como el menos usado
+        cache.guardar("c", 3, "C")
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.obtener("b"))
+        self.assertEqual(cache.obtener("a"), "A")
+
+    def test_entrada_vencida_no_se_devuelve(self):
+        cache = CacheLRU(max_entradas=10, ttl=0)
+        cache.guardar("a", 1, "A")
+
+        self.assertIsNone(cache.obtener("a"))
+
+    def test_invalidar_por_producto(self):
+        cache = CacheLRU(max_entradas=10, ttl=60)
+        cache.guardar("a", 1, "A")
+        cache.guardar("b", 2, "B")
+
+        cache.invalidar_productos([1])
+
+        self.assertIsNone(cache.obtener("a"))
+        self.assertEqual(cache.obtener("b"), "B")
+
+    def test_no_guarda_lo_leido_antes_de_una_invalidacion(self):
+        cache = CacheLRU(max_entradas=10, ttl=60)
+        generacion = cache.generacion()
+        cache.invalidar_productos([1])
+
+        self.assertFalse(cache.guardar("a", 1, "A", generacion))
+        self.assertIsNone(cache.obtener("a"))
+
+
+from inventario import busqueda
+
+
+class BusquedaProductosTests(BaseApiProductosTestCase):
+    """
+    Búsqueda con el índice de texto completo (FTS5 en la BD de tests SQLite).
+    """
+
+    def setUp(self):
+        super().setUp()
+        if not busqueda.disponible():
+            self.skipTest("La BD de tests no tiene índice de texto completo.")
+
+        self.coca_zero = Producto.objects.create(
+            nombre="Coca Cola Zero 1.5L",
+            categoria=self.categoria,
+            precio_compra=Decimal("900.00"),
+            precio_venta=Decimal("1600.00"),
+        )
+        self.galletas = Producto.objects.create(
+            nombre="Galletas de limón",
+            descripcion="Ideal con coca cola",
+            precio_compra=Decimal("500.00"),
+            precio_venta=Decimal("800.00"),
+        )
+
+    def test_busca_por_prefijo_de_cada_palabra(self):
+        ids = busqueda.buscar_ids("coca ze")
+        self.assertEqual(ids, [self.coca_zero.id])
+
+    def test_nombre_pesa_mas_que_descripcion(self):
+        ids = busqueda.buscar_ids("coca")
+        self.assertEqual(ids[-1], self.galletas.id)
+        self.assertIn(self.producto.id, ids)
+
+    def test_ignora_acentos(self):
+        self.assertEqual(busqueda.buscar_ids("limon"), [self.galletas.id])
+
+    def test_indice_se_actualiza_al_guardar_y_borrar(self):
+        self.galletas.nombre = "Galletas de naranja"
+        self.galletas.save()
+        self.assertEqual(busqueda.buscar_ids("naranja"), [self.galletas.id])
+        self.assertEqual(busqueda.buscar_ids("galletas limon"), [])
+
+        self.galletas.delete()
+        self.assertEqual(busqueda.buscar_ids("naranja"), [])
+
+    def test_busqueda_por_codigo_de_barras(self):
+        self.coca_zero.codigo_barras = "7801610000571"
+        self.coca_zero.save()
+        self.assertEqual(busqueda.buscar_ids("780161"), [self.coca_zero.id])
+
+    def test_api_productos_usa_el_indice(self):
+        response = self.client.get("/api/productos/", {"q": "coca ze"})
+
+        self.assertEqual(response.status_code, 200)
+        nombres = [p["nombre"] for p in response.json()["results"]]
+        self.assertEqual(nombres, ["Coca Cola Zero 1.5L"])
+
+    def _recorrer(self, url, params):
+        ids, paginas = [], 0
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            ids.extend(p["id"] for p in data["results"])
+            paginas += 1
+            if data["next"] is None:
+                return ids, paginas
+            params = {**params, "cursor": data["next"]}
+
+    def test_busqueda_con_mas_de_200_resultados_se_pagina(self):
+        arroces = Producto.objects.bulk_create(
+            [
+                Producto(
+                    nombre=f"Arroz grado {i}",
+                    precio_compra=Decimal("100.00"),
+                    precio_venta=Decimal("150.00"),
+                )
+                for i in range(250)
+            ]
+        )
+        esperados = sorted(p.id for p in arroces)
+
+        primera = self.client.get("/api/productos/", {"q": "arroz"}).json()
+        self.assertEqual(primera["count"], busqueda.LIMITE_RESULTADOS)
+        self.assertIsNotNone(primera["next"])
+
+        for url in ("/api/productos/", "/api/pos/productos/"):
+            ids, paginas = self._recorrer(url, {"q": "arroz"})
+            self.assertEqual(paginas, 2)
+            self.assertEqual(sorted(ids), esperados)
+
+        # con el mismo rango se desempata por id, sin repetir ni saltar
+        ids, _ = self._recorrer("/api/productos/", {"q": "arroz", "limit": 30})
+        self.assertEqual(ids, esperados)
+
+    def test_cursor_de_busqueda_invalido_es_400(self):
+        response = self.client.get("/api/productos/", {"q": "coca", "cursor": "xyz"})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class ApiProductosPaginacionTests(PresupuestoConsultasMixin, BaseApiProductosTestCase):
+    """
+    GET /api/productos/ con limit/cursor (keyset por nombre, id) y fields.
+    """
+
+    def setUp(self):
+        super().setUp()
+        # Nombres repetidos a propósito: el cursor desempata por id
+        for i in range(7):
+            Producto.objects.create(
+                nombre=f"Producto {i // 2}",
+                categoria=self.categoria if i % 2 else None,
+                precio_compra=Decimal("100.00"),
+                precio_venta=Decimal("150.00"),
+            )
+
+    def test_recorrer_paginas_entrega_todo_en_orden_sin_repetir(self):
+        vistos = []
+        params = {"limit": 3}
+        while True:
+            with self.assertMaxConsultas(5):
+                response = self.client.get("/api/productos/", params)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertLessEqual(data["count"], 3)
+            vistos.extend((p["nombre"], p["id"]) for p in data["results"])
+            if data["next"] is None:
+                break
+            params = {"limit": 3, "cursor": data["next"]}
+
+        esperado = list(Producto.objects.order_by("nombre", "id").values_list("nombre", "id"))
+        self.assertEqual(vistos, esperado)
+
+    def test_sin_limit_ni_cursor_devuelve_todo(self):
+        data = self.client.get("/api/productos/").json()
+
+        self.assertEqual(data["count"], Producto.objects.count())
+        self.assertIsNone(data["next"])
+
+    def test_fields_devuelve_solo_los_campos_pedidos(self):
+        response = self.client.get(
+            "/api/productos/", {"fields": "id,nombre,categoria", "limit": 2}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        for producto in response.json()["results"]:
+            self.assertEqual(set(producto), {"id", "nombre", "categoria"})
+
+    def test_formato_igual_al_detalle(self):
+        listado = self.client.get("/api/productos/", {"limit": 1}).json()["results"][0]
+        detalle = self.client.get(f"/api/productos/{listado['id']}/").json()
+
+        self.assertEqual(listado, detalle)
+
+    def test_fields_desconocido_devuelve_400(self):
+        response = self.client.get("/api/productos/", {"fields": "id,clave"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_invalido_devuelve_400(self):
+        response = self.client.get("/api/productos/", {"cursor": "no-es-un-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+
+from datetime import timedelta
+
+from django.utils import timezone
+
+
+class ApiCatalogoSyncTests(BaseApiProductosTestCase):
+    """
+    GET /api/catalogo/?since=<token>: solo lo que cambió desde el token.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.otro = Producto.objects.create(
+            nombre="Pan Molde",
+            precio_compra=Decimal("900.00"),
+            precio_venta=Decimal("1300.00"),
+            stock_actual=5,
+        )
+        # Todo lo sembrado "cambió" hace una hora (fuera del margen del sync)
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+        Producto.objects.update(actualizado_en=hace_una_hora)
+        Categoria.objects.update(actualizado_en=hace_una_hora)
+
+    def _sync(self, since=None, **params):
+        if since:
+            params["since"] = since
+        response = self.client.get("/api/catalogo/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_primera_sincronizacion_trae_todo(self):
+        data = self._sync()
+
+        self.assertEqual(
+            {p["id"] for p in data["productos"]}, {self.producto.id, self.otro.id}
+        )
+        self.assertEqual([c["id"] for c in data["categorias"]], [self.categoria.id])
+        self.assertFalse(data["hay_mas"])
+
+    def test_sin_cambios_no_trae_nada(self):
+        token = self._sync()["since"]
+
+        data = self._sync(token)
+
+        self.assertEqual(data["productos"], [])
+        self.assertEqual(data["categorias"], [])
+
+    def test_trae_solo_los_productos_con_cambios_de_stock(self):
+        token = self._sync()["since"]
+        Producto.objects.descontar_stock(self.otro.id, 2)
+
+        data = self._sync(token)
+
+        self.assertEqual([p["id"] for p in data["productos"]], [self.otro.id])
+        self.assertEqual(data["productos"][0]["stock_actual"], 3)
+
+    def test_producto_desactivado_llega_como_eliminado(self):
+        token = self._sync()["since"]
+        self.otro.es_activo = False
+        self.otro.save()
+
+        data = self._sync(token)
+
+        self.assertEqual(data["productos"], [])
+        self.assertEqual(data["eliminados"]["productos"], [self.otro.id])
+
+    def test_paginas_con_limit_recorren_todo(self):
+        for i in range(3):
+            Producto.objects.create(
+                nombre=f"Extra {i}",
+                precio_compra=Decimal("1.00"),
+                precio_venta=Decimal("2.00"),
+            )
+
+        vistos = set()
+        data = self._sync(limit=2)
+        vistos.update(p["id"] for p in data["productos"])
+        while data["hay_mas"]:
+            data = self._sync(data["since"], limit=2)
+            vistos.update(p["id"] for p in data["productos"])
+
+        self.assertEqual(vistos, set(Producto.objects.values_list("id", flat=True)))
+
+    def test_token_invalido_devuelve_400(self):
+        response = self.client.get("/api/catalogo/", {"since": "???"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cambio_confirmado_tarde_llega_en_la_proxima_sincronizacion(self):
+        """
+        Una transacción larga (ej: un lote de ventas) fija actualizado_en un
+        minuto antes de confirmar: la fila no puede quedar detrás del token.
+        """
+        token = self._sync()["since"]
+        hace_un_minuto = timezone.now() - timedelta(minutes=1)
+        Producto.objects.filter(pk=self.otro.pk).update(
+            stock_actual=1, actualizado_en=hace_un_minuto
+        )
+
+        data = self._sync(token)
+
+        self.assertEqual([p["id"] for p in data["productos"]], [self.otro.id])
+        self.assertEqual(data["productos"][0]["stock_actual"], 1)
+
+
+class GetCondicionalProductosTests(PresupuestoConsultasMixin, BaseApiProductosTestCase):
+    """
+    ETag / 304 Not Modified en los listados y el detalle de productos.
+    """
+
+    def _get(self, url, etag=None, **params):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(url, params, **headers)
+
+    def test_listado_sin_cambios_responde_304(self):
+        response = self._get("/api/productos/")
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertIn("private", response["Cache-Control"])
+
+        # sesión + usuario + huellas de productos y categorías; nada más
+        with self.assertMaxConsultas(4):
+            response = self._get("/api/productos/", etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_cambio_de_stock_cambia_el_etag(self):
+        etag = self._get("/api/productos/")["ETag"]
+        Producto.objects.descontar_stock(self.producto.id, 1)
+
+        response = self._get("/api/productos/", etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_producto_borrado_cambia_el_etag(self):
+        otro = Producto.objects.create(
+            nombre="Pan Molde",
+            precio_compra=Decimal("900.00"),
+            precio_venta=Decimal("1300.00"),
+        )
+        etag = self._get("/api/productos/")["ETag"]
+        otro.delete()
+
+        self.assertEqual(self._get("/api/productos/", etag).status_code, 200)
+
+    def test_categoria_renombrada_cambia_el_etag_de_productos(self):
+        etag = self._get("/api/productos/")["ETag"]
+        self.categoria.nombre = "Bebestibles"
+        self.categoria.save()
+
+        response = self._get("/api/productos/", etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["categoria"], "Bebestibles")
+
+    def test_parametros_distintos_tienen_etag_distinto(self):
+        etag = self._get("/api/productos/")["ETag"]
+
+        response = self._get("/api/productos/", etag, fields="id,nombre")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_error_no_lleva_etag(self):
+        response = self._get("/api/productos/", fields="inventado")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.has_header("ETag"))
+
+    def test_detalle_y_stock_responden_304(self):
+        for url in (
+            f"/api/productos/{self.producto.id}/",
+            f"/api/productos/{self.producto.id}/stock/",
+        ):
+            etag = self._get(url)["ETag"]
+            self.assertEqual(self._get(url, etag).status_code, 304)
+
+            Producto.objects.aumentar_stock(self.producto.id, 1)
+            self.assertEqual(self._get(url, etag).status_code, 200)
+
+    def test_detalle_inexistente_es_404_sin_etag(self):
+        response = self._get("/api/productos/999999/")
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header("ETag"))
+
+    def test_categorias_se_cachean_un_minuto(self):
+        response = self._get("/api/categorias/")
+        self.assertIn("max-age=60", response["Cache-Control"])
+
+        self.assertEqual(self._get("/api/categorias/", response["ETag"]).status_code, 304)
+
+
+from inventario import sugerencias
+from inventario.sugerencias import IndiceSugerencias
+from inventario.texto import normalizar
+
+
+class SugerenciasTests(TestCase):
+    """
+    Índice en memoria de inventario/sugerencias.py (typeahead de la caja).
+    """
+
+    def setUp(self):
+        self.indice = IndiceSugerencias(refresco=60)
+        for nombre in [
+            "Coca Cola 1L",
+            "Coca Cola Zero 2L",
+            "Azúcar Iansa 1kg",
+            "Pan Hallulla",
+            "Panqueque Hallulla",
+        ]:
+            Producto.objects.create(
+                nombre=nombre,
+                precio_compra=Decimal("100.00"),
+                precio_venta=Decimal("150.00"),
+            )
+        Producto.objects.create(
+            nombre="Coca Cola Retornable",
+            precio_compra=Decimal("100.00"),
+            precio_venta=Decimal("150.00"),
+            es_activo=False,
+        )
+
+    def _nombres(self, q, limite=10):
+        return [p["nombre"] for p in self.indice.sugerir(q, limite)]
+
+    def test_normalizar_quita_acentos_y_mayusculas(self):
+        self.assertEqual(normalizar("Azúcar ÑANDÚ"), "azucar nandu")
+
+    def test_prefijo_trae_solo_activos_en_orden(self):
+        self.assertEqual(self._nombres("coca"), ["Coca Cola 1L", "Coca Cola Zero 2L"])
+
+    def test_cada_palabra_es_prefijo_de_alguna_palabra(self):
+        self.assertEqual(self._nombres("pan hall"), ["Pan Hallulla", "Panqueque Hallulla"])
+        self.assertEqual(self._nombres("hall panq"), ["Panqueque Hallulla"])
+        self.assertEqual(self._nombres("cola ze"), ["Coca Cola Zero 2L"])
+        self.assertEqual(self._nombres("ola"), [])
+
+    def test_sin_acentos(self):
+        self.assertEqual(self._nombres("azu"), ["Azúcar Iansa 1kg"])
+
+    def test_limite(self):
+        self.assertEqual(len(self._nombres("c", limite=1)), 1)
+
+    def test_no_consulta_la_bd_despues_de_construirse(self):
+        self._nombres("coca")
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self._nombres("pan"), ["Pan Hallulla", "Panqueque Hallulla"])
+
+    def test_cambios_del_proceso_se_aplican_al_confirmar(self):
+        indice = sugerencias.indice_sugerencias
+        indice.limpiar()
+        self.addCleanup(indice.limpiar)
+        indice.sugerir("coca")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            zero = Producto.objects.get(nombre="Coca Cola Zero 2L")
+            zero.es_activo = False
+            zero.save()
+            Producto.objects.get(nombre="Coca Cola 1L").delete()
+            Producto.objects.create(
+                nombre="Coca Cola Light",
+                precio_compra=Decimal("100.00"),
+                precio_venta=Decimal("150.00"),
+            )
+
+        with self.assertNumQueries(0):
+            nombres = [p["nombre"] for p in indice.sugerir("coca")]
+        self.assertEqual(nombres, ["Coca Cola Light"])
+
+    def test_revision_periodica_ve_cambios_de_otros_procesos(self):
+        indice = IndiceSugerencias(refresco=0)
+        indice.sugerir("pan")
+        # UPDATE directo: no pasa por las señales de este proceso
+        Producto.objects.filter(nombre="Pan Hallulla").update(
+            nombre="Pan Amasado", actualizado_en=timezone.now()
+        )
+
+        self.assertEqual(
+            [p["nombre"] for p in indice.sugerir("pan")],
+            ["Pan Amasado", "Panqueque Hallulla"],
+        )
+
+    def test_muchos_cambios_reconstruyen_la_base(self):
+        self._nombres("coca")
+        ids = list(Producto.objects.filter(es_activo=True).values_list("id", flat=True))
+        anterior = sugerencias.MAX_CAMBIOS
+        sugerencias.MAX_CAMBIOS = 2
+        try:
+            self.indice.quitar(ids[:3])
+        finally:
+            sugerencias.MAX_CAMBIOS = anterior
+
+        self.assertEqual(self.indice.estadisticas()["cambios_pendientes"], 0)
+        self.assertEqual(self.indice.estadisticas()["productos"], 2)
+
+    def test_palabras_frecuentes_usan_mascaras(self):
+        # Catálogo con palabras repetidas: "papas f" sale por el AND de máscaras
+        Producto.objects.bulk_create(
+            [
+                Producto(
+                    nombre=f"Papas {'Fritas' if i % 2 else 'Duquesas'} {i:04d}",
+                    precio_compra=Decimal("100.00"),
+                    precio_venta=Decimal("150.00"),
+                )
+                for i in range(1200)
+            ]
+        )
+
+        self.assertGreater(self.indice.estadisticas()["productos"], 1000)
+        self.assertEqual(
+            self._nombres("papas f", limite=3),
+            ["Papas Fritas 0001", "Papas Fritas 0003", "Papas Fritas 0005"],
+        )
+        self.assertEqual(self._nombres("fritas 0007 pap"), ["Papas Fritas 0007"])
+
+
+from unittest.mock import patch
+
+from inventario.busqueda import reindexar_difuso
+from inventario.models import TrigramaProducto
+from inventario.texto import trigramas
+
+
+class BusquedaDifusaTests(BaseApiProductosTestCase):
+    """
+    texto_busqueda sin acentos, trigramas del nombre y ?modo=difuso.
+    """
+
+    def setUp(self):
+        super().setUp()
+        for nombre in ["Azúcar Iansa 1kg", "Yoghurt Soprole Frutilla", "Fideos Carozzi Spaghetti"]:
+            Producto.objects.create(
+                nombre=nombre,
+                precio_compra=Decimal("100.00"),
+                precio_venta=Decimal("150.00"),
+            )
+
+    def _nombres(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return [p["nombre"] for p in response.json()["results"]]
+
+    def test_save_mantiene_texto_y_trigramas(self):
+        producto = Producto.objects.get(nombre="Azúcar Iansa 1kg")
+        self.assertEqual(producto.texto_busqueda, "azucar iansa 1kg")
+        self.assertIn("zuc", set(producto.trigramas.values_list("trigrama", flat=True)))
+
+        producto.nombre = "Azúcar Flor"
+        producto.save()
+
+        trigramas = set(producto.trigramas.values_list("trigrama", flat=True))
+        self.assertIn("flo", trigramas)
+        self.assertNotIn("ans", trigramas)
+
+    def test_save_de_stock_no_toca_los_trigramas(self):
+        with self.assertNumQueries(1):
+            self.producto.stock_actual = 3
+            self.producto.save(update_fields=["stock_actual"])
+
+    def test_difuso_tolera_errores_de_tipeo(self):
+        for q, esperado in [
+            ("fidios", "Fideos Carozzi Spaghetti"),
+            ("yogur", "Yoghurt Soprole Frutilla"),
+            ("azucar", "Azúcar Iansa 1kg"),
+        ]:
+            self.assertEqual(
+                self._nombres("/api/productos/", q=q, modo="difuso")[:1], [esperado]
+            )
+            self.assertEqual(
+                self._nombres("/api/pos/productos/", q=q, modo="difuso")[:1], [esperado]
+            )
+
+    def test_difuso_no_trae_lo_que_no_se_parece(self):
+        self.assertEqual(self._nombres("/api/productos/", q="detergente", modo="difuso"), [])
+
+    def test_modo_desconocido_es_400(self):
+        response = self.client.get("/api/productos/", {"q": "x", "modo": "exacto"})
+
+        self.assertEqual(response.status_code, 400)
+
+    @patch("inventario.api_productos.buscar_pagina", return_value=None)
+    def test_sin_indice_filtra_sin_acentos(self, _buscar_pagina):
+        self.assertEqual(self._nombres("/api/productos/", q="AZUCAR"), ["Azúcar Iansa 1kg"])
+
+    def test_reindexar_productos_creados_con_bulk_create(self):
+        Producto.objects.bulk_create(
+            [
+                Producto(
+                    nombre="Café Nescafé Fina Selección",
+                    precio_compra=Decimal("100.00"),
+                    precio_venta=Decimal("150.00"),
+                )
+            ]
+        )
+        self.assertEqual(self._nombres("/api/productos/", q="nescafe", modo="difuso"), [])
+
+        reindexar_difuso()
+
+        self.assertEqual(
+            self._nombres("/api/productos/", q="nescafe", modo="difuso"),
+            ["Café Nescafé Fina Selección"],
+        )
+        self.assertEqual(
+            Producto.objects.get(nombre__startswith="Café").texto_busqueda,
+            "cafe nescafe fina seleccion",
+        )
+        self.assertEqual(
+            TrigramaProducto.objects.filter(producto__nombre__startswith="Café").count(),
+            len(trigramas("Café Nescafé Fina Selección")),
+        )
+
+
+from inventario import formatos
+from inventario.formatos import TIPO_FILAS
+
+
+class FormatosCompactosTests(BaseApiProductosTestCase):
+    """
+    Catálogo en formatos compactos pedidos con Accept (inventario/formatos.py).
+    """
+
+    def _get(self, tipo, **params):
+        return self.client.get("/api/productos/", params, HTTP_ACCEPT=tipo)
+
+    def _cuerpo(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_sin_accept_responde_json(self):
+        response = self.client.get("/api/productos/")
+
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.json()["results"][0]["precio_venta"], "1500.00")
+
+    def test_filas_con_precios_enteros(self):
+        Producto.objects.create(
+            nombre="Agua Cachantun 1.5L",
+            codigo_barras="7801620000011",
+            precio_compra=Decimal("450.50"),
+            precio_venta=Decimal("790.00"),
+            stock_actual=3,
+        )
+
+        response = self._get(TIPO_FILAS, fields="id,nombre,categoria,precio_venta,activo")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], TIPO_FILAS)
+        self.assertIn("Accept", response["Vary"])
+        datos = json.loads(self._cuerpo(response))
+        self.assertEqual(datos["campos"], ["id", "nombre", "categoria", "precio_venta", "activo"])
+        self.assertEqual(datos["escala_precios"], 100)
+        self.assertEqual(datos["count"], 2)
+        self.assertEqual(datos["filas"][0][1:], ["Agua Cachantun 1.5L", "Sin categoría", 79000, True])
+        self.assertEqual(datos["filas"][1][1:], ["Coca Cola 1L", "Bebidas", 150000, True])
+
+    def test_filas_en_varios_trozos(self):
+        for i in range(4):
+            Producto.objects.create(
+                nombre=f"Galletas {i}",
+                precio_compra=Decimal("1.00"),
+                precio_venta=Decimal("2.00"),
+            )
+
+        with patch.object(formatos, "FILAS_POR_TROZO", 2):
+            response = self._get(TIPO_FILAS, fields="id,precio_compra")
+            datos = json.loads(self._cuerpo(response))
+
+        self.assertEqual(datos["count"], 5)
+        self.assertEqual([f[1] for f in datos["filas"]], [100000, 100, 100, 100, 100])
+
+    def test_catalogo_vacio(self):
+        Producto.objects.all().delete()
+
+        datos = json.loads(self._cuerpo(self._get(TIPO_FILAS)))
+
+        self.assertEqual(datos["filas"], [])
+        self.assertEqual(datos["count"], 0)
+
+    def test_busqueda_y_paginacion_siguen_en_json(self):
+        for params in ({"q": "coca"}, {"limit": 10}):
+            response = self._get(TIPO_FILAS, **params)
+            self.assertEqual(response["Content-Type"], "application/json")
+            self.assertEqual(response.json()["count"], 1)
+
+    def test_etag_distinto_por_formato(self):
+        etag = self.client.get("/api/productos/")["ETag"]
+
+        response = self.client.get("/api/productos/", HTTP_ACCEPT=TIPO_FILAS, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_tipo_no_ofrecido_responde_json(self):
+        response = self._get("application/x-msgpack")
+
+        self.assertEqual(response["Content-Type"], "application/json")
+
+
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from inventario.cache import categorias
+
+
+class CacheCategoriasTests(PresupuestoConsultasMixin, BaseApiProductosTestCase):
+    """
+    Categorías en memoria del proceso (inventario/cache.py).
+    """
+
+    def setUp(self):
+        super().setUp()
+        # crear productos requiere el grupo Bodeguero o Admin
+        self.user.groups.add(Group.objects.get_or_create(name="Bodeguero")[0])
+
+    def _consultas_a_categorias(self, funcion):
+        with CaptureQueriesContext(connection) as consultas:
+            resultado = funcion()
+        tabla = Categoria._meta.db_table
+        return resultado, [c["sql"] for c in consultas if tabla in c["sql"]]
+
+    def test_listado_sale_de_memoria(self):
+        self.client.get("/api/categorias/")
+
+        response, consultas = self._consultas_a_categorias(
+            lambda: self.client.get("/api/categorias/")
+        )
+
+        self.assertEqual(consultas, [])
+        self.assertEqual([c["nombre"] for c in response.json()["results"]], ["Bebidas"])
+
+    def test_304_sin_ir_a_la_bd(self):
+        etag = self.client.get("/api/categorias/")["ETag"]
+
+        # sesión + usuario
+        with self.assertMaxConsultas(2):
+            response = self.client.get("/api/categorias/", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_guardar_o_borrar_sube_la_version(self):
+        version = categorias.version()
+        otra = Categoria.objects.create(nombre="Lácteos")
+        self.assertGreater(categorias.version(), version)
+
+        version = categorias.version()
+        otra.delete()
+        self.assertGreater(categorias.version(), version)
+
+    def test_cambio_de_categoria_se_ve_en_el_listado(self):
+        etag = self.client.get("/api/categorias/")["ETag"]
+        self.categoria.esta_activa = False
+        self.categoria.save()
+        Categoria.objects.create(nombre="Abarrotes")
+
+        response = self.client.get("/api/categorias/", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c["nombre"] for c in response.json()["results"]], ["Abarrotes"])
+
+    def test_crear_producto_con_categoria_existente_no_la_vuelve_a_crear(self):
+        response, consultas = self._consultas_a_categorias(
+            lambda: self.client.post(
+                "/api/productos/",
+                data=json.dumps(
+                    {"nombre": "Sprite 1L", "precio_venta": "1400", "categoria_nombre": "Bebidas"}
+                ),
+                content_type="application/json",
+            )
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["producto"]["categoria"], "Bebidas")
+        self.assertEqual(len(consultas), 1)
+        self.assertTrue(consultas[0].startswith("SELECT"))
+        self.assertEqual(Producto.objects.get(nombre="Sprite 1L").categoria_id, self.categoria.id)
+
+    def _crear_con_categoria(self, nombre, categoria_nombre):
+        return self.client.post(
+            "/api/productos/",
+            data=json.dumps(
+                {"nombre": nombre, "precio_venta": "1000", "categoria_nombre": categoria_nombre}
+            ),
+            content_type="application/json",
+        )
+
+    def test_crear_producto_con_categoria_renombrada_en_otro_worker(self):
+        categorias.activas()  # carga el caché
+        # update() no manda señales: el caché de este proceso queda viejo
+        Categoria.objects.filter(pk=self.categoria.pk).update(nombre="Gaseosas")
+
+        response = self._crear_con_categoria("Sprite 1L", "Bebidas")
+
+        self.assertEqual(response.status_code, 201)
+        producto = Producto.objects.get(nombre="Sprite 1L")
+        self.assertEqual(producto.categoria.nombre, "Bebidas")
+        self.assertNotEqual(producto.categoria_id, self.categoria.id)
+
+    def test_crear_producto_con_categoria_borrada_en_otro_worker(self):
+        lacteos = Categoria.objects.create(nombre="Lácteos")
+        categorias.activas()  # carga el caché
+        # _raw_delete no manda señales: el caché de este proceso queda viejo
+        Categoria.objects.filter(pk=lacteos.pk)._raw_delete(using="default")
+
+        response = self._crear_con_categoria("Leche 1L", "Lácteos")
+
+        self.assertEqual(response.status_code, 201)
+        producto = Producto.objects.get(nombre="Leche 1L")
+        self.assertEqual(producto.categoria.nombre, "Lácteos")
+        self.assertNotEqual(producto.categoria_id, lacteos.pk)
+
+    def test_crear_producto_con_categoria_nueva_la_crea(self):
+        response = self.client.post(
+            "/api/productos/",
+            data=json.dumps(
+                {"nombre": "Pan Hallulla", "precio_venta": "200", "categoria_nombre": "Panadería"}
+            ),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertIn("Panadería", [c["nombre"] for c in categorias.activas()])
+        self.assertEqual(Categoria.objects.filter(nombre="Panadería").count(), 1)
+
+
+from yuyitos import streaming
+from yuyitos.streaming import json_por_trozos
+
+
+class StreamingJSONTests(BaseApiProductosTestCase):
+    """
+    ?stream=1 en /api/productos/ y el armado por trozos de yuyitos/streaming.py.
+    """
+
+    def _cuerpo(self, response):
+        self.assertTrue(response.streaming)
+        return json.loads(b"".join(response.streaming_content))
+
+    def test_json_por_trozos_arma_el_mismo_json(self):
+        for cantidad in (0, 1, 2, 5):
+            elementos = [{"n": n, "precio": Decimal("1.50")} for n in range(cantidad)]
+
+            cuerpo = b"".join(
+                json_por_trozos({"rango": {"desde": "[2025]"}}, "results", iter(elementos), por_trozo=2)
+            )
+
+            self.assertEqual(
+                json.loads(cuerpo),
+                {
+                    "rango": {"desde": "[2025]"},
+                    "results": [{"n": n, "precio": "1.50"} for n in range(cantidad)],
+                    "count": cantidad,
+                },
+            )
+
+    def test_sin_contar(self):
+        cuerpo = b"".join(json_por_trozos({}, "dias", iter([1, 2]), contar=None))
+
+        self.assertEqual(json.loads(cuerpo), {"dias": [1, 2]})
+
+    def test_listado_en_streaming_igual_al_normal(self):
+        Producto.objects.create(
+            nombre="Azúcar Iansa 1kg",
+            precio_compra=Decimal("900.00"),
+            precio_venta=Decimal("1290.00"),
+        )
+        normal = self.client.get("/api/productos/").json()
+
+        with patch.object(streaming, "FILAS_POR_TROZO", 1):
+            response = self.client.get("/api/productos/", {"stream": "1"})
+            datos = self._cuerpo(response)
+
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertTrue(response.has_header("ETag"))
+        self.assertEqual(datos, normal)
+
+    def test_busqueda_y_paginas_en_streaming(self):
+        datos = self._cuerpo(self.client.get("/api/productos/", {"q": "coca", "stream": "1"}))
+        self.assertEqual([p["nombre"] for p in datos["results"]], ["Coca Cola 1L"])
+
+        datos = self._cuerpo(self.client.get("/api/productos/", {"limit": 1, "stream": "1"}))
+        self.assertEqual(datos["count"], 1)
+        self.assertIsNone(datos["next"])
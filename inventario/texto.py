@@ -0,0 +1,40 @@
+"""
+Normalización de texto para buscar productos: minúsculas y sin acentos
+("Azúcar Iansa" -> "azucar iansa"), igual que el tokenizador del índice
+de texto completo (unicode61 remove_diacritics).
+"""
+
+import re
+import unicodedata
+
+
+def normalizar(texto):
+    descompuesto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).lower()
+
+
+def palabras(texto):
+    """
+    Palabras normalizadas del texto, en orden.
+    """
+    return re.findall(r"\w+", normalizar(texto))
+
+
+def texto_busqueda(*partes):
+    """
+    Valor de Producto.texto_busqueda: las palabras normalizadas de las
+    partes, separadas por un espacio ("Coca-Cola Zero" -> "coca cola zero").
+    """
+    return " ".join(palabras(" ".join(p or "" for p in partes)))
+
+
+def trigramas(texto):
+    """
+    Trigramas (sin repetir) de cada palabra, con un espacio antes y después:
+    "fideos" -> " fi", "fid", "ide", "deo", "eos", "os ".
+    """
+    resultado = set()
+    for palabra in palabras(texto):
+        relleno = f" {palabra} "
+        resultado.update(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return resultado
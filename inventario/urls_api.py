@@ -33,6 +33,13 @@ urlpatterns = [
         name="api_productos_stock",
     ),
 
+    # Sincronización incremental del catálogo (?since=<token>)
+    path(
+        "catalogo/",
+        api_productos.catalogo,
+        name="api_catalogo",
+    ),
+
     # Listar categorías
     path(
         "categorias/",
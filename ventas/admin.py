@@ -1,6 +1,7 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.forms.models import BaseInlineFormSet
 from django.core.exceptions import ValidationError
+from django.db.models import Q, Sum
 
 from .models import Venta, DetalleVenta
 
@@ -38,14 +39,34 @@ class DetalleVentaInline(admin.TabularInline):
     extra = 1
     formset = DetalleVentaInlineFormSet
 
+    # Una venta anulada ya devolvió su stock: sus detalles no se tocan más
+    def has_add_permission(self, request, obj=None):
+        if obj is not None and obj.anulada:
+            return False
+        return super().has_add_permission(request, obj)
+
+    def has_change_permission(self, request, obj=None):
+        if obj is not None and obj.anulada:
+            return False
+        return super().has_change_permission(request, obj)
+
+    def has_delete_permission(self, request, obj=None):
+        if obj is not None and obj.anulada:
+            return False
+        return super().has_delete_permission(request, obj)
+
 
 # 3) Admin de Venta (ÚNICA definición)
 @admin.register(Venta)
 class VentaAdmin(admin.ModelAdmin):
-    list_display = ("id", "fecha", "cliente", "total", "es_credito")
-    list_filter = ("es_credito", "fecha", "cliente")
+    list_display = ("id", "fecha", "cliente", "total", "es_credito", "anulada")
+    list_filter = ("es_credito", "anulada", "fecha", "cliente")
     search_fields = ("id", "cliente__nombre", "cliente__rut")
     inlines = [DetalleVentaInline]
+    actions = ["anular_ventas_seleccionadas"]
+    # El total lo mantienen los detalles (DetalleVenta.save/delete)
+    # y la anulación solo se hace con la acción del listado
+    readonly_fields = ("total", "anulada", "anulada_en", "motivo_anulacion")
 
     def get_readonly_fields(self, request, obj=None):
         """
@@ -53,10 +74,33 @@ class VentaAdmin(admin.ModelAdmin):
         bloqueamos editar cliente y es_credito desde el admin.
         """
         readonly = list(super().get_readonly_fields(request, obj))
-        if obj is not None and obj.movimientos_credito.exists():
+        if obj is not None and (obj.anulada or obj.movimientos_credito.exists()):
             readonly.extend(["cliente", "es_credito"])
         return readonly
 
+    @admin.action(description="Anular ventas seleccionadas")
+    def anular_ventas_seleccionadas(self, request, queryset):
+        from .registro import anular_ventas
+
+        seleccionadas = list(queryset.values_list("id", flat=True))
+        anuladas = anular_ventas(
+            seleccionadas,
+            motivo=f"Anulada desde el admin por {request.user.get_username()}",
+        )
+        if anuladas:
+            self.message_user(
+                request,
+                f"{len(anuladas)} venta(s) anulada(s).",
+                messages.SUCCESS,
+            )
+        omitidas = len(seleccionadas) - len(anuladas)
+        if omitidas:
+            self.message_user(
+                request,
+                f"{omitidas} venta(s) ya estaban anuladas.",
+                messages.WARNING,
+            )
+
     def save_related(self, request, form, formsets, change):
         """
         Se ejecuta DESPUÉS de guardar la Venta y los DetalleVenta.
@@ -64,37 +108,39 @@ class VentaAdmin(admin.ModelAdmin):
         """
         super().save_related(request, form, formsets, change)
 
+        from clientes.libro_credito import asentar
         from clientes.models import MovimientoCredito
 
         venta = form.instance
-        venta.actualizar_total()
-
-        if venta.es_credito and venta.cliente:
-            # Buscar si ya existe un movimiento COMPRA para esta venta
-            mov_existente = MovimientoCredito.objects.filter(
-                venta=venta,
-                tipo="COMPRA",
-            ).order_by("id").first()
-
-            if mov_existente is None:
-                # No existe → creamos uno nuevo
-                venta.cliente.registrar_movimiento_credito(
-                    tipo="COMPRA",
-                    monto=venta.total,
+        # Los detalles ya aplicaron sus diferencias al total en la BD
+        venta.refresh_from_db(fields=["total"])
+
+        if venta.es_credito and venta.cliente and not venta.anulada:
+            # Lo ya cargado al cliente por esta venta (COMPRA menos AJUSTE).
+            # Si el total cambió, se asienta solo la diferencia: los
+            # movimientos anteriores y su saldo_despues no se reescriben.
+            cargado = MovimientoCredito.objects.filter(venta=venta).aggregate(
+                compras=Sum("monto", filter=Q(tipo="COMPRA")),
+                ajustes=Sum("monto", filter=Q(tipo="AJUSTE")),
+            )
+            diferencia = venta.total - (cargado["compras"] or 0) + (cargado["ajustes"] or 0)
+
+            if diferencia > 0:
+                tipo, observaciones = "COMPRA", f"Compra a crédito (Venta #{venta.id})"
+            elif diferencia < 0:
+                tipo, observaciones = "AJUSTE", f"Ajuste por modificación de Venta #{venta.id}"
+            else:
+                return
+
+            asentar([
+                MovimientoCredito(
+                    cliente=venta.cliente,
                     venta=venta,
-                    observaciones=f"Compra a crédito (Venta #{venta.id})",
+                    tipo=tipo,
+                    monto=abs(diferencia),
+                    observaciones=observaciones,
                 )
-            else:
-                # Sí existe → actualizamos el monto y el saldo
-                saldo_antes = mov_existente.saldo_despues - mov_existente.monto
-                mov_existente.monto = venta.total
-                nuevo_saldo = saldo_antes + venta.total
-                mov_existente.saldo_despues = nuevo_saldo
-                mov_existente.save()
-
-                cliente = venta.cliente
-                cliente.saldo_actual = nuevo_saldo
-                cliente.save(update_fields=["saldo_actual"])
+            ])
 
 
 # 4) Admin de DetalleVenta
@@ -0,0 +1,110 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
+
+from clientes.models import Cliente
+from inventario.api_productos import CAMPOS_PRODUCTO, filas_a_dicts
+from inventario.cache import categorias
+from inventario.models import Producto
+
+from .api_ventas import resumen_de_hoy
+
+
+# Campos de producto que recibe cada rol (el cajero no ve el precio de compra)
+CAMPOS_POR_ROL = {
+    "admin": list(CAMPOS_PRODUCTO),
+    "cajero": [c for c in CAMPOS_PRODUCTO if c != "precio_compra"],
+}
+
+CAMPOS_CLIENTE = (
+    "id", "nombre", "rut", "telefono", "tiene_credito", "cupo_maximo", "saldo_actual", "es_activo",
+)
+
+
+def _rol(user):
+    """
+    "admin", "cajero" o None, con una sola consulta de grupos.
+    """
+    grupos = set(user.groups.values_list("name", flat=True))
+    if "Admin" in grupos:
+        return "admin"
+    if "Cajero" in grupos:
+        return "cajero"
+    return None
+
+
+def _armar_bootstrap(rol):
+    """
+    Todo lo que la caja carga al iniciar, con una consulta por sección
+    (las categorías salen de inventario/cache.py).
+    """
+    campos = CAMPOS_POR_ROL[rol]
+    columnas = {CAMPOS_PRODUCTO[c] for c in campos}
+    productos = (
+        Producto.objects.filter(es_activo=True)
+        .values(*columnas)
+        .order_by("nombre", "id")
+    )
+
+    clientes = [
+        {
+            **c,
+            "cupo_maximo": str(c["cupo_maximo"]),
+            "saldo_actual": str(c["saldo_actual"]),
+        }
+        for c in Cliente.objects.filter(es_activo=True)
+        .values(*CAMPOS_CLIENTE)
+        .order_by("nombre", "id")
+    ]
+
+    return {
+        "rol": rol,
+        "productos": filas_a_dicts(productos, campos),
+        "clientes": clientes,
+        "categorias": categorias.activas(),
+        "estadisticas_hoy": resumen_de_hoy(),
+    }
+
+
+@csrf_exempt
+@login_required
+@require_GET
+def bootstrap(request):
+    """
+    Datos iniciales de la caja en una sola respuesta:
+    GET /api/pos/bootstrap/
+
+    - productos activos (mismo formato que /api/productos/)
+    - clientes activos (mismo formato que /api/clientes/)
+    - categorías activas
+    - estadisticas_hoy (mismo formato que /api/ventas/estadisticas/hoy/)
+
+    La respuesta depende solo del rol, así que se guarda ya serializada en
+    el caché por rol durante POS_BOOTSTRAP_TTL segundos (cabecera X-Cache).
+    Stock y saldos pueden venir con ese atraso; la venta los valida igual.
+    """
+    rol = _rol(request.user)
+    if rol is None:
+        return JsonResponse(
+            {"error": "Solo cajeros o administradores pueden usar la caja."},
+            status=403,
+        )
+
+    clave = f"pos_bootstrap:{rol}"
+    contenido = cache.get(clave)
+    estado = "HIT"
+    if contenido is None:
+        contenido = json.dumps(_armar_bootstrap(rol)).encode("utf-8")
+        cache.set(clave, contenido, settings.POS_BOOTSTRAP_TTL)
+        estado = "MISS"
+
+    response = HttpResponse(contenido, content_type="application/json")
+    response["X-Cache"] = estado
+    patch_cache_control(response, private=True, max_age=settings.POS_BOOTSTRAP_TTL)
+    return response
@@ -1,9 +1,28 @@
-from django.http import JsonResponse
+import json
+
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.http import require_GET
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Q
 
-from inventario.models import Producto
+from inventario.busqueda import (
+    LIMITE_RESULTADOS,
+    MODO_DIFUSO,
+    buscar_pagina,
+    cursor_siguiente,
+    leer_cursor,
+    ordenar_por_relevancia,
+)
+from inventario.cache import productos_por_codigo
+from inventario.models import Producto, TrigramaProducto
+from inventario.texto import texto_busqueda
+from inventario.sugerencias import (
+    LIMITE_SUGERENCIAS,
+    LIMITE_SUGERENCIAS_MAXIMO,
+    indice_sugerencias,
+)
+from yuyitos.paginacion import CursorInvalido, leer_limite
+from yuyitos.streaming import iterar, quiere_streaming, respuesta_json_streaming
 
 
 def _producto_to_dict(prod: Producto):
@@ -21,26 +40,53 @@ def _producto_to_dict(prod: Producto):
 @require_GET
 def lista_productos(request):
     """
-    Lista productos activos, con filtro opcional por nombre o descripción.
-    GET /api/pos/productos/?q=...
+    Lista productos activos, con búsqueda opcional por nombre, descripción
+    o código de barras (ver inventario/busqueda.py).
+    GET /api/pos/productos/?q=...               (de a 200; "next" = ?cursor= de la siguiente)
+    GET /api/pos/productos/?q=...&modo=difuso   (tolera errores de tipeo)
+    GET /api/pos/productos/?stream=1            (streaming, ver yuyitos/streaming.py)
     (ruta exacta depende de tus urls.py)
     """
     q = request.GET.get("q", "").strip()
 
+    modo = request.GET.get("modo", "")
+    if modo not in ("", MODO_DIFUSO):
+        return JsonResponse({"error": "'modo' solo acepta: difuso."}, status=400)
+
     qs = Producto.objects.filter(es_activo=True)
+    siguiente = None
+
+    if q and modo == MODO_DIFUSO:
+        qs = ordenar_por_relevancia(qs, TrigramaProducto.objects.similares(q))
+    elif q:
+        try:
+            despues = leer_cursor(request)
+        except CursorInvalido:
+            return JsonResponse({"error": "El cursor no es válido."}, status=400)
+        limite = leer_limite(request, LIMITE_RESULTADOS, LIMITE_RESULTADOS)
 
-    if q:
-        qs = qs.filter(
-            Q(nombre__icontains=q) |
-            Q(descripcion__icontains=q)
+        pagina = buscar_pagina(q, limite, despues)
+        if pagina is None:
+            qs = qs.filter(texto_busqueda__contains=texto_busqueda(q)).order_by("nombre")
+        else:
+            ids, ultimo = pagina
+            qs = ordenar_por_relevancia(qs, ids)
+            siguiente = cursor_siguiente(ultimo)
+    else:
+        qs = qs.order_by("nombre")
+
+    if quiere_streaming(request):
+        return respuesta_json_streaming(
+            map(_producto_to_dict, iterar(qs)), {"next": siguiente}
         )
 
-    results = [_producto_to_dict(p) for p in qs.order_by("nombre")]
+    results = [_producto_to_dict(p) for p in qs]
 
     return JsonResponse(
         {
             "count": len(results),
             "results": results,
+            "next": siguiente,
         },
         status=200,
     )
@@ -87,3 +133,75 @@ def stock_producto(request, producto_id: int):
         },
         status=200,
     )
+
+
+@csrf_exempt
+@login_required
+@require_GET
+def scan_producto(request, codigo: str):
+    """
+    Busca un producto activo por código de barras (lector de la caja).
+    GET /api/pos/scan/<codigo>/
+
+    Responde desde productos_por_codigo (inventario/cache.py) si está;
+    si no, lo busca por el índice único de codigo_barras y lo guarda.
+    La cabecera X-Cache indica HIT o MISS.
+    """
+    codigo = codigo.strip()
+
+    contenido = productos_por_codigo.obtener(codigo)
+    if contenido is not None:
+        response = HttpResponse(contenido, content_type="application/json")
+        response["X-Cache"] = "HIT"
+        return response
+
+    # Se toma antes de leer la BD: si el producto cambia mientras tanto,
+    # guardar() descarta esta versión.
+    generacion = productos_por_codigo.generacion()
+
+    prod = (
+        Producto.objects.select_related("categoria")
+        .filter(codigo_barras=codigo, es_activo=True)
+        .first()
+    )
+    if prod is None:
+        return JsonResponse(
+            {"error": "No hay un producto activo con ese código de barras."},
+            status=404,
+        )
+
+    data = _producto_to_dict(prod)
+    data["codigo_barras"] = prod.codigo_barras
+    data["categoria"] = prod.categoria.nombre if prod.categoria else "Sin categoría"
+    contenido = json.dumps(data).encode("utf-8")
+    productos_por_codigo.guardar(codigo, prod.id, contenido, generacion)
+
+    response = HttpResponse(contenido, content_type="application/json")
+    response["X-Cache"] = "MISS"
+    return response
+
+
+@csrf_exempt
+@login_required
+@require_GET
+def sugerencias_productos(request):
+    """
+    Sugerencias mientras el cajero escribe un nombre.
+    GET /api/pos/sugerencias/?q=pan hall&limit=10
+
+    Cada palabra de q es prefijo de alguna palabra del nombre, sin importar
+    acentos ni mayúsculas. Responde desde el índice en memoria de
+    inventario/sugerencias.py, sin consultar productos en la BD.
+    """
+    q = request.GET.get("q", "").strip()
+    limite = leer_limite(request, LIMITE_SUGERENCIAS, LIMITE_SUGERENCIAS_MAXIMO)
+
+    results = indice_sugerencias.sugerir(q, limite)
+
+    return JsonResponse(
+        {
+            "count": len(results),
+            "results": results,
+        },
+        status=200,
+    )
@@ -9,6 +9,8 @@ from django.utils.dateparse import parse_date
 from django.views.decorators.http import require_GET, require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 
+from yuyitos.streaming import iterar, quiere_streaming, respuesta_json_streaming
+
 from .models import Venta, DetalleVenta
 
 from django.contrib.auth.decorators import login_required, user_passes_test
@@ -67,7 +69,8 @@ def ventas_resumen(request):
     """
     inicio_dt, fin_dt, fecha_desde, fecha_hasta = _rango_fechas(request)
 
-    qs = Venta.objects.filter(fecha__range=(inicio_dt, fin_dt))
+    # Las ventas anuladas no cuentan en los reportes
+    qs = Venta.objects.filter(fecha__range=(inicio_dt, fin_dt), anulada=False)
 
     agregados = qs.aggregate(
         cantidad_ventas=Count("id"),
@@ -112,11 +115,13 @@ def ventas_por_dia(request):
     - total_monto
     - total_contado
     - total_credito
+
+    Con ?stream=1 la lista se envía en streaming (ver yuyitos/streaming.py).
     """
     inicio_dt, fin_dt, fecha_desde, fecha_hasta = _rango_fechas(request)
 
     qs = (
-        Venta.objects.filter(fecha__range=(inicio_dt, fin_dt))
+        Venta.objects.filter(fecha__range=(inicio_dt, fin_dt), anulada=False)
         .annotate(dia=TruncDate("fecha"))
         .values("dia")
         .annotate(
@@ -135,24 +140,28 @@ def ventas_por_dia(request):
             return str(v)
         return str(v)
 
-    resultados = []
-    for fila in qs:
-        resultados.append(
-            {
-                "fecha": fila["dia"].isoformat() if fila["dia"] else None,
-                "cantidad_ventas": fila["cantidad_ventas"] or 0,
-                "total_monto": _str_dec(fila["total_monto"]),
-                "total_contado": _str_dec(fila["total_contado"]),
-                "total_credito": _str_dec(fila["total_credito"]),
-            }
+    def _dia_a_dict(fila):
+        return {
+            "fecha": fila["dia"].isoformat() if fila["dia"] else None,
+            "cantidad_ventas": fila["cantidad_ventas"] or 0,
+            "total_monto": _str_dec(fila["total_monto"]),
+            "total_contado": _str_dec(fila["total_contado"]),
+            "total_credito": _str_dec(fila["total_credito"]),
+        }
+
+    rango = {
+        "fecha_desde": fecha_desde.isoformat(),
+        "fecha_hasta": fecha_hasta.isoformat(),
+    }
+
+    if quiere_streaming(request):
+        return respuesta_json_streaming(
+            map(_dia_a_dict, iterar(qs)), {"rango": rango}, clave="dias", contar=None
         )
 
     data = {
-        "rango": {
-            "fecha_desde": fecha_desde.isoformat(),
-            "fecha_hasta": fecha_hasta.isoformat(),
-        },
-        "dias": resultados,
+        "rango": rango,
+        "dias": [_dia_a_dict(fila) for fila in qs],
     }
     return JsonResponse(data, status=200)
 
@@ -165,6 +174,9 @@ def productos_mas_vendidos(request):
     """
     Devuelve top N productos por cantidad vendida en el rango.
     GET /api/reportes/productos-mas-vendidos/?limit=10
+
+    Con ?stream=1, o un limit mayor que UMBRAL_STREAMING, la lista se envía
+    en streaming (ver yuyitos/streaming.py).
     """
     inicio_dt, fin_dt, fecha_desde, fecha_hasta = _rango_fechas(request)
 
@@ -174,7 +186,10 @@ def productos_mas_vendidos(request):
         limit = 10
 
     qs = (
-        DetalleVenta.objects.filter(venta__fecha__range=(inicio_dt, fin_dt))
+        DetalleVenta.objects.filter(
+            venta__fecha__range=(inicio_dt, fin_dt),
+            venta__anulada=False,
+        )
         .values(
             "producto_id",
             "producto__nombre",
@@ -196,24 +211,28 @@ def productos_mas_vendidos(request):
             return str(v)
         return str(v)
 
-    resultados = []
-    for fila in qs:
-        resultados.append(
-            {
-                "producto_id": fila["producto_id"],
-                "nombre": fila["producto__nombre"],
-                "codigo_barras": fila["producto__codigo_barras"],
-                "total_cantidad": fila["total_cantidad"] or 0,
-                "total_monto": _str_dec(fila["total_monto"]),
-            }
+    def _producto_a_dict(fila):
+        return {
+            "producto_id": fila["producto_id"],
+            "nombre": fila["producto__nombre"],
+            "codigo_barras": fila["producto__codigo_barras"],
+            "total_cantidad": fila["total_cantidad"] or 0,
+            "total_monto": _str_dec(fila["total_monto"]),
+        }
+
+    rango = {
+        "fecha_desde": fecha_desde.isoformat(),
+        "fecha_hasta": fecha_hasta.isoformat(),
+    }
+
+    if quiere_streaming(request, limit):
+        return respuesta_json_streaming(
+            map(_producto_a_dict, iterar(qs)), {"rango": rango}, clave="productos", contar=None
         )
 
     data = {
-        "rango": {
-            "fecha_desde": fecha_desde.isoformat(),
-            "fecha_hasta": fecha_hasta.isoformat(),
-        },
-        "productos": resultados,
+        "rango": rango,
+        "productos": [_producto_a_dict(fila) for fila in qs],
     }
     return JsonResponse(data, status=200)
 
@@ -229,6 +248,8 @@ def ventas_por_categoria(request):
     """
     ventas_categoria = DetalleVenta.objects.select_related(
         'producto', 'producto__categoria'
+    ).filter(
+        venta__anulada=False
     ).values(
         categoria_nombre=F('producto__categoria__nombre')
     ).annotate(
@@ -254,6 +275,8 @@ def productos_mas_vendidos_mejorado(request):
     """
     productos_top = DetalleVenta.objects.select_related(
         'producto'
+    ).filter(
+        venta__anulada=False
     ).values(
         'producto__id', 'producto__nombre'
     ).annotate(
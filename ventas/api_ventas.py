@@ -1,19 +1,54 @@
 import json
-from decimal import Decimal, InvalidOperation
 
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST, require_GET
 from django.views.decorators.csrf import csrf_exempt
-from django.core.exceptions import ValidationError
 
 from clientes.models import Cliente
-from inventario.models import Producto
-from .models import Venta, DetalleVenta
-
-from django.contrib.auth.decorators import login_required
+from .models import Venta
+from .registro import (
+    VentaInvalida,
+    anular_ventas,
+    cargar_clientes,
+    cargar_productos,
+    confirmar_venta,
+    ids_productos,
+    preparar_venta,
+    resolver_cliente,
+)
+
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.db import transaction
 from django.db.models import Sum, Count
 from django.utils import timezone
 
+from cuentas.permisos import es_admin
+from yuyitos.idempotencia import idempotente
+
+
+# Máximo de ventas aceptadas en un solo POST /api/ventas/lote/
+MAX_VENTAS_LOTE = 500
+
+# Cuántas ventas se confirman por transacción dentro de un lote
+VENTAS_POR_TRANSACCION = 50
+
+# Máximo de ventas que se pueden anular en un solo POST /api/ventas/anular/
+MAX_VENTAS_ANULACION = 1000
+
+
+def _leer_json(request):
+    """
+    Lee el cuerpo JSON respetando el encoding del request
+    (con respaldo latin-1, igual que crear_venta).
+    """
+    raw_body = request.body
+    encoding = request.encoding or "utf-8"
+    try:
+        body_str = raw_body.decode(encoding)
+    except UnicodeDecodeError:
+        body_str = raw_body.decode("latin-1")
+    return json.loads(body_str)
+
 
 def _obtener_cliente(data):
     """
@@ -40,6 +75,7 @@ def _obtener_cliente(data):
 @csrf_exempt
 @login_required
 @require_POST
+@idempotente
 def crear_venta(request):
     """
     Crea una venta (contado o crédito) con sus detalles.
@@ -60,193 +96,30 @@ def crear_venta(request):
             ...
         ]
     }
+
+    Si se envía la cabecera Idempotency-Key, un reintento con la misma
+    clave devuelve la venta ya creada en vez de crear otra.
     """
     # 1) Parsear JSON
     try:
-        raw_body = request.body
-        encoding = request.encoding or "utf-8"
-        try:
-            body_str = raw_body.decode(encoding)
-        except UnicodeDecodeError:
-            body_str = raw_body.decode("latin-1")
-
-        data = json.loads(body_str)
+        data = _leer_json(request)
     except json.JSONDecodeError:
         return JsonResponse({"error": "JSON inválido."}, status=400)
 
     # 2) Cliente (opcional, pero obligatorio si es crédito)
     cliente = _obtener_cliente(data)
-    nombre_cliente_libre = (data.get("nombre_cliente_libre") or "").strip()
-
-    es_credito = bool(data.get("es_credito", False))
-    observaciones = (data.get("observaciones") or "").strip()
-
-    if es_credito:
-        # Para venta a crédito, el cliente es obligatorio
-        if cliente is None:
-            return JsonResponse(
-                {
-                    "error": (
-                        "Para una venta a crédito debes indicar un cliente "
-                        "(cliente_id o rut)."
-                    )
-                },
-                status=400,
-            )
-        if not cliente.tiene_credito or not cliente.es_activo:
-            return JsonResponse(
-                {"error": "El cliente no tiene crédito habilitado o está inactivo."},
-                status=400,
-            )
-
-    # 3) Detalles
-    detalles_data = data.get("detalles")
-    if not isinstance(detalles_data, list) or len(detalles_data) == 0:
-        return JsonResponse(
-            {"error": "La venta debe incluir al menos un detalle de producto."},
-            status=400,
-        )
-
-    detalles_preparados = []
-    total_estimado = Decimal("0.00")
-
-    # 4) Validar y preparar cada detalle
-    for idx, det in enumerate(detalles_data, start=1):
-        producto_id = det.get("producto_id")
-        cantidad_raw = det.get("cantidad", 1)
-        precio_unit_raw = det.get("precio_unitario")
-
-        if producto_id is None:
-            return JsonResponse(
-                {"error": f"En el detalle #{idx} falta 'producto_id'."},
-                status=400,
-            )
-
-        try:
-            producto = Producto.objects.get(pk=producto_id)
-        except Producto.DoesNotExist:
-            return JsonResponse(
-                {"error": f"Producto con id {producto_id} no existe (detalle #{idx})."},
-                status=404,
-            )
-
-        # cantidad
-        try:
-            cantidad = int(cantidad_raw)
-        except (TypeError, ValueError):
-            return JsonResponse(
-                {"error": f"La 'cantidad' debe ser un entero válido (detalle #{idx})."},
-                status=400,
-            )
-
-        if cantidad <= 0:
-            return JsonResponse(
-                {"error": f"La 'cantidad' debe ser mayor que 0 (detalle #{idx})."},
-                status=400,
-            )
-
-        # precio_unitario
-        if precio_unit_raw is not None:
-            try:
-                precio_unitario = Decimal(str(precio_unit_raw))
-            except (InvalidOperation, TypeError):
-                return JsonResponse(
-                    {
-                        "error": (
-                            f"El 'precio_unitario' debe ser un número válido "
-                            f"(detalle #{idx})."
-                        )
-                    },
-                    status=400,
-                )
-        else:
-            # usamos el precio_venta del producto
-            precio_unitario = producto.precio_venta
-
-        if precio_unitario <= 0:
-            return JsonResponse(
-                {"error": f"El precio_unitario debe ser mayor que 0 (detalle #{idx})."},
-                status=400,
-            )
-
-        # Verificar stock disponible
-        if not producto.hay_stock(cantidad):
-            return JsonResponse(
-                {
-                    "error": (
-                        f"No hay stock suficiente de '{producto.nombre}' "
-                        f"para vender {cantidad} unidades (detalle #{idx})."
-                    )
-                },
-                status=400,
-            )
-
-        subtotal = precio_unitario * cantidad
-        total_estimado += subtotal
-
-        detalles_preparados.append(
-            {
-                "producto": producto,
-                "cantidad": cantidad,
-                "precio_unitario": precio_unitario,
-            }
-        )
 
-    # 5) Si es crédito, validar cupo antes de grabar nada
-    if es_credito and cliente:
-        if not cliente.puede_comprar_a_credito(total_estimado):
-            return JsonResponse(
-                {
-                    "error": (
-                        "El total de la venta excede el cupo de crédito disponible "
-                        "para este cliente."
-                    )
-                },
-                status=400,
-            )
-
-    # 6) Crear la Venta
-    venta = Venta.objects.create(
-        cliente=cliente,
-        nombre_cliente_libre=nombre_cliente_libre if cliente is None else "",
-        es_credito=es_credito,
-        observaciones=observaciones,
-        total=Decimal("0.00"),  # se recalcula luego con los detalles
-    )
+    # 3) Productos de todos los detalles en una sola consulta
+    productos = cargar_productos(ids_productos(data.get("detalles")))
 
-    # 7) Crear detalles y ajustar stock/total
+    # 4) Validar y grabar (stock, detalles, total y crédito en una transacción)
     try:
-        for det in detalles_preparados:
-            DetalleVenta.objects.create(
-                venta=venta,
-                producto=det["producto"],
-                cantidad=det["cantidad"],
-                precio_unitario=det["precio_unitario"],
-            )
-
-        # Recalcular total de la venta
-        venta.refresh_from_db()
-        venta.actualizar_total()
-
-    except ValidationError as e:
-        # Si algo falla (ej: stock), borramos la venta y devolvemos error
-        venta.delete()
-        return JsonResponse(
-            {"error": e.messages},
-            status=400,
-        )
+        preparada = preparar_venta(data, cliente, productos)
+        venta, movimiento = confirmar_venta(preparada)
+    except VentaInvalida as e:
+        return JsonResponse({"error": e.mensaje}, status=e.status)
 
-    # 8) Si es crédito, registrar movimiento COMPRA
-    movimiento = None
-    if es_credito and cliente:
-        movimiento = cliente.registrar_movimiento_credito(
-            tipo="COMPRA",
-            monto=venta.total,
-            venta=venta,
-            observaciones=f"Compra a crédito (API) Venta #{venta.id}",
-        )
-
-    # 9) Armar respuesta
+    # 5) Armar respuesta
     detalles_resp = []
     for det in venta.detalles.select_related("producto"):
         detalles_resp.append(
@@ -293,25 +166,204 @@ def crear_venta(request):
 
 @csrf_exempt
 @login_required
-@require_GET
-def estadisticas_hoy(request):
+@require_POST
+@idempotente
+def crear_ventas_lote(request):
     """
-    Retorna estadísticas de ventas del día actual:
-    - Total de ventas en dinero
-    - Cantidad de transacciones
-    (para cualquier usuario autenticado)
+    Registra muchas ventas en una sola llamada (sincronización de cajas
+    que estuvieron sin conexión).
+
+    POST /api/ventas/lote/
+
+    JSON esperado:
+
+    {
+        "ventas": [
+            {
+                "referencia": "caja2-000123",   // opcional, se devuelve tal cual
+                "cliente_id": 1,
+                "es_credito": false,
+                "detalles": [{"producto_id": 3, "cantidad": 2}]
+            },
+            ...
+        ]
+    }
+
+    Cada venta usa las mismas reglas que /api/ventas/crear/. Los productos
+    y clientes de todo el lote se cargan una sola vez, y las ventas se
+    confirman en bloques de VENTAS_POR_TRANSACCION. Una venta rechazada
+    no afecta a las demás.
+
+    Respuesta: un resultado por venta, en el mismo orden del lote.
+    """
+    try:
+        data = _leer_json(request)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "JSON inválido."}, status=400)
+
+    ventas_data = data.get("ventas") if isinstance(data, dict) else None
+    if not isinstance(ventas_data, list) or len(ventas_data) == 0:
+        return JsonResponse(
+            {"error": "El lote debe incluir una lista 'ventas' con al menos una venta."},
+            status=400,
+        )
+
+    if len(ventas_data) > MAX_VENTAS_LOTE:
+        return JsonResponse(
+            {"error": f"El lote no puede tener más de {MAX_VENTAS_LOTE} ventas."},
+            status=400,
+        )
+
+    # Una sola carga de productos y clientes para todo el lote
+    producto_ids = []
+    for venta_data in ventas_data:
+        if isinstance(venta_data, dict):
+            producto_ids.extend(ids_productos(venta_data.get("detalles")))
+    productos = cargar_productos(producto_ids)
+    clientes_por_id, clientes_por_rut = cargar_clientes(ventas_data)
+
+    resultados = []
+    for inicio in range(0, len(ventas_data), VENTAS_POR_TRANSACCION):
+        bloque = ventas_data[inicio:inicio + VENTAS_POR_TRANSACCION]
+
+        with transaction.atomic():
+            for idx, venta_data in enumerate(bloque, start=inicio):
+                resultado = {"indice": idx}
+
+                if not isinstance(venta_data, dict):
+                    resultado.update(
+                        {"ok": False, "status": 400, "error": "La venta no es un objeto JSON."}
+                    )
+                    resultados.append(resultado)
+                    continue
+
+                resultado["referencia"] = venta_data.get("referencia")
+                cliente = resolver_cliente(venta_data, clientes_por_id, clientes_por_rut)
+
+                try:
+                    preparada = preparar_venta(venta_data, cliente, productos)
+                    venta, movimiento = confirmar_venta(preparada, origen="API lote")
+                except VentaInvalida as e:
+                    resultado.update({"ok": False, "status": e.status, "error": e.mensaje})
+                    resultados.append(resultado)
+                    continue
+
+                resultado.update(
+                    {
+                        "ok": True,
+                        "status": 201,
+                        "venta_id": venta.id,
+                        "fecha": venta.fecha.isoformat(),
+                        "total": str(venta.total),
+                        "movimiento_credito_id": movimiento.id if movimiento else None,
+                    }
+                )
+                resultados.append(resultado)
+
+    creadas = sum(1 for r in resultados if r["ok"])
+
+    return JsonResponse(
+        {
+            "mensaje": "Lote procesado.",
+            "creadas": creadas,
+            "rechazadas": len(resultados) - creadas,
+            "resultados": resultados,
+        },
+        status=200,
+    )
+
+
+@csrf_exempt
+@login_required
+@user_passes_test(es_admin)
+@require_POST
+@idempotente
+def anular_ventas_api(request):
+    """
+    Anula varias ventas en una sola transacción (correcciones de cierre de caja).
+
+    POST /api/ventas/anular/
+
+    JSON esperado:
+
+    {
+        "venta_ids": [10, 11, 12],
+        "motivo": "Ventas duplicadas por la caja 2"   // opcional
+    }
+
+    Devuelve el stock de los productos, revierte con un AJUSTE lo cargado
+    al crédito de los clientes y deja las ventas marcadas como anuladas.
+    Los ids que no existen o que ya estaban anulados se informan aparte.
+    """
+    try:
+        data = _leer_json(request)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "JSON inválido."}, status=400)
+
+    venta_ids = data.get("venta_ids") if isinstance(data, dict) else None
+    if not isinstance(venta_ids, list) or len(venta_ids) == 0:
+        return JsonResponse(
+            {"error": "Debes indicar una lista 'venta_ids' con al menos una venta."},
+            status=400,
+        )
+
+    if len(venta_ids) > MAX_VENTAS_ANULACION:
+        return JsonResponse(
+            {"error": f"No se pueden anular más de {MAX_VENTAS_ANULACION} ventas a la vez."},
+            status=400,
+        )
+
+    try:
+        pedidas = {int(vid) for vid in venta_ids}
+    except (TypeError, ValueError):
+        return JsonResponse(
+            {"error": "Los ids de 'venta_ids' deben ser enteros."},
+            status=400,
+        )
+
+    motivo = (data.get("motivo") or "").strip()
+    anuladas = anular_ventas(pedidas, motivo=motivo)
+
+    return JsonResponse(
+        {
+            "mensaje": "Ventas anuladas correctamente.",
+            "anuladas": anuladas,
+            "no_anuladas": sorted(pedidas - set(anuladas)),
+        },
+        status=200,
+    )
+
+
+def resumen_de_hoy():
+    """
+    Total y cantidad de ventas (no anuladas) de hoy. Lo usan
+    /api/ventas/estadisticas/hoy/ y /api/pos/bootstrap/.
     """
     hoy = timezone.now().date()
 
     ventas_hoy = Venta.objects.filter(
-        fecha__date=hoy
+        fecha__date=hoy,
+        anulada=False,
     ).aggregate(
         total_ventas=Sum('total'),
         cantidad_ventas=Count('id')
     )
 
-    return JsonResponse({
+    return {
         'total_ventas': float(ventas_hoy['total_ventas'] or 0),
         'cantidad_ventas': ventas_hoy['cantidad_ventas'] or 0,
         'fecha': hoy.isoformat()
-    })
+    }
+
+
+@csrf_exempt
+@login_required
+@require_GET
+def estadisticas_hoy(request):
+    """
+    Retorna estadísticas de ventas del día actual:
+    - Total de ventas en dinero
+    - Cantidad de transacciones
+    (para cualquier usuario autenticado)
+    """
+    return JsonResponse(resumen_de_hoy())
@@ -0,0 +1,322 @@
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from decimal import Decimal
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection
+from django.test import Client
+from django.utils import timezone
+
+from clientes.models import Cliente
+from inventario.models import Categoria, Producto
+from ventas.models import Venta
+from yuyitos.bench import commit_actual, resumen_latencias
+
+
+# Todo lo que crea el benchmark lleva este prefijo, para poder borrarlo
+PREFIJO = "BENCH"
+USUARIO_BENCH = "bench_cajero"
+RUTA_VENTA = "/api/ventas/crear/"
+
+
+class ContadorConsultas:
+    """
+    execute_wrapper que cuenta las consultas de la conexión del hilo actual.
+    """
+
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        return execute(sql, params, many, context)
+
+
+class CajeroLocal:
+    """
+    Cajero que postea las ventas con el Client de Django, en el mismo proceso.
+    Permite medir las consultas por venta.
+    """
+
+    mide_consultas = True
+
+    def __init__(self, usuario):
+        self.client = Client(HTTP_HOST="localhost")
+        self.client.force_login(usuario)
+
+    def postear(self, payload, contador):
+        with connection.execute_wrapper(contador):
+            response = self.client.post(
+                RUTA_VENTA,
+                data=json.dumps(payload),
+                content_type="application/json",
+            )
+        return response.status_code
+
+
+class CajeroHttp:
+    """
+    Cajero que postea contra un servidor real (runserver, gunicorn, Render).
+    La sesión se crea directamente en la BD, que debe ser la misma del servidor.
+    """
+
+    mide_consultas = False
+
+    def __init__(self, usuario, url_base):
+        self.url = url_base.rstrip("/") + RUTA_VENTA
+        sesion = import_module(settings.SESSION_ENGINE).SessionStore()
+        sesion[SESSION_KEY] = str(usuario.pk)
+        sesion[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        sesion[HASH_SESSION_KEY] = usuario.get_session_auth_hash()
+        sesion.save()
+        self.cookie = f"{settings.SESSION_COOKIE_NAME}={sesion.session_key}"
+
+    def postear(self, payload, contador):
+        peticion = urllib.request.Request(
+            self.url,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json", "Cookie": self.cookie},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(peticion, timeout=30) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga del registro de ventas: varios cajeros simultáneos "
+        "postean ventas al contado y a crédito a /api/ventas/crear/ y se "
+        "reporta throughput, latencias p50/p95/p99, consultas por venta "
+        "y errores de bloqueo. El resultado se guarda en JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cajeros", type=int, default=4, help="Hilos simultáneos.")
+        parser.add_argument("--ventas", type=int, default=50, help="Ventas por cajero.")
+        parser.add_argument("--productos", type=int, default=200)
+        parser.add_argument("--clientes", type=int, default=50)
+        parser.add_argument(
+            "--max-detalles",
+            type=int,
+            default=6,
+            help="Cantidad máxima de productos distintos por venta.",
+        )
+        parser.add_argument(
+            "--credito",
+            type=float,
+            default=0.3,
+            help="Fracción de ventas a crédito (0 a 1).",
+        )
+        parser.add_argument(
+            "--url",
+            default=None,
+            help="URL base de un servidor en marcha (ej: http://127.0.0.1:8000). "
+            "Sin esta opción se usa el Client de Django en el mismo proceso.",
+        )
+        parser.add_argument("--semilla", type=int, default=1)
+        parser.add_argument(
+            "--salida",
+            default=None,
+            help="Archivo donde guardar el resultado JSON (por defecto solo se imprime).",
+        )
+        parser.add_argument(
+            "--conservar",
+            action="store_true",
+            help="No borrar los datos sembrados al terminar.",
+        )
+
+    # ------------------------------------------------------------------
+    # Datos de prueba
+    # ------------------------------------------------------------------
+
+    def _sembrar(self, n_productos, n_clientes, stock):
+        categorias = [
+            Categoria.objects.get_or_create(nombre=f"{PREFIJO} {nombre}")[0]
+            for nombre in ("Abarrotes", "Lácteos", "Bebidas", "Limpieza", "Snacks")
+        ]
+
+        Producto.objects.bulk_create(
+            [
+                Producto(
+                    codigo_barras=f"{PREFIJO}{i:08d}",
+                    nombre=f"{PREFIJO} Producto {i:05d}",
+                    categoria=categorias[i % len(categorias)],
+                    precio_compra=Decimal(100 + (i * 37) % 900),
+                    precio_venta=Decimal(150 + (i * 37) % 900),
+                    stock_actual=stock,
+                )
+                for i in range(n_productos)
+            ]
+        )
+
+        Cliente.objects.bulk_create(
+            [
+                Cliente(
+                    nombre=f"{PREFIJO} Cliente {i:04d}",
+                    rut=f"{PREFIJO}-{i:05d}",
+                    tiene_credito=True,
+                    cupo_maximo=Decimal("100000000.00"),
+                )
+                for i in range(n_clientes)
+            ]
+        )
+
+        usuario, creado = User.objects.get_or_create(username=USUARIO_BENCH)
+        if creado:
+            usuario.set_unusable_password()
+            usuario.save()
+        usuario.groups.add(Group.objects.get_or_create(name="Cajero")[0])
+
+        # MySQL no devuelve los pk en bulk_create: los releemos
+        productos = list(Producto.objects.filter(codigo_barras__startswith=PREFIJO))
+        clientes = list(Cliente.objects.filter(rut__startswith=f"{PREFIJO}-"))
+        return productos, clientes, usuario
+
+    def _limpiar(self):
+        Venta.objects.filter(cliente__rut__startswith=f"{PREFIJO}-").delete()
+        Venta.objects.filter(nombre_cliente_libre__startswith=PREFIJO).delete()
+        Cliente.objects.filter(rut__startswith=f"{PREFIJO}-").delete()
+        Producto.objects.filter(codigo_barras__startswith=PREFIJO).delete()
+        Categoria.objects.filter(nombre__startswith=f"{PREFIJO} ").delete()
+        User.objects.filter(username=USUARIO_BENCH).delete()
+
+    def _canastas(self, azar, productos, clientes, cantidad, max_detalles, fraccion_credito):
+        canastas = []
+        for n in range(cantidad):
+            elegidos = azar.sample(productos, azar.randint(1, min(max_detalles, len(productos))))
+            payload = {
+                "detalles": [
+                    {"producto_id": p.id, "cantidad": azar.randint(1, 3)} for p in elegidos
+                ],
+            }
+            if azar.random() < fraccion_credito:
+                payload.update({"es_credito": True, "cliente_id": azar.choice(clientes).id})
+            else:
+                payload.update({"es_credito": False, "nombre_cliente_libre": f"{PREFIJO} mesón {n}"})
+            canastas.append(payload)
+        return canastas
+
+    # ------------------------------------------------------------------
+
+    def handle(self, *args, **options):
+        cajeros = options["cajeros"]
+        ventas_por_cajero = options["ventas"]
+        azar = random.Random(options["semilla"])
+
+        self._limpiar()
+        # Stock suficiente para que ninguna venta se rechace por falta de stock
+        stock = cajeros * ventas_por_cajero * 3
+        productos, clientes, usuario = self._sembrar(
+            options["productos"], options["clientes"], stock
+        )
+
+        canastas = [
+            self._canastas(
+                azar,
+                productos,
+                clientes,
+                ventas_por_cajero,
+                options["max_detalles"],
+                options["credito"],
+            )
+            for _ in range(cajeros)
+        ]
+
+        def crear_cajero():
+            if options["url"]:
+                return CajeroHttp(usuario, options["url"])
+            return CajeroLocal(usuario)
+
+        latencias = [[] for _ in range(cajeros)]
+        consultas = [[] for _ in range(cajeros)]
+        estados = [{} for _ in range(cajeros)]
+        errores_bloqueo = [0] * cajeros
+        partida = threading.Barrier(cajeros)
+
+        def trabajar(n):
+            try:
+                cajero = crear_cajero()
+                partida.wait()
+                for payload in canastas[n]:
+                    contador = ContadorConsultas()
+                    inicio = time.perf_counter()
+                    try:
+                        status = cajero.postear(payload, contador)
+                    except OperationalError:
+                        # p.ej. "database is locked" en SQLite o lock wait timeout en MySQL
+                        errores_bloqueo[n] += 1
+                        continue
+                    latencias[n].append(time.perf_counter() - inicio)
+                    estados[n][status] = estados[n].get(status, 0) + 1
+                    if status == 201 and cajero.mide_consultas:
+                        consultas[n].append(contador.total)
+            finally:
+                connection.close()
+
+        close_old_connections()
+        inicio = time.perf_counter()
+        threads = [threading.Thread(target=trabajar, args=(n,)) for n in range(cajeros)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        duracion = time.perf_counter() - inicio
+
+        todas = [lat for por_cajero in latencias for lat in por_cajero]
+        todas_consultas = [c for por_cajero in consultas for c in por_cajero]
+        por_estado = {}
+        for por_cajero in estados:
+            for status, cuenta in por_cajero.items():
+                por_estado[str(status)] = por_estado.get(str(status), 0) + cuenta
+        creadas = por_estado.get("201", 0)
+
+        resultado = {
+            "fecha": timezone.now().isoformat(),
+            "commit": commit_actual(),
+            "base_de_datos": connection.vendor,
+            "modo": "http" if options["url"] else "local",
+            "parametros": {
+                "cajeros": cajeros,
+                "ventas_por_cajero": ventas_por_cajero,
+                "productos": options["productos"],
+                "clientes": options["clientes"],
+                "max_detalles": options["max_detalles"],
+                "credito": options["credito"],
+                "semilla": options["semilla"],
+            },
+            "duracion_s": round(duracion, 3),
+            "ventas_creadas": creadas,
+            "ventas_por_segundo": round(creadas / duracion, 2) if duracion else None,
+            "respuestas_por_estado": por_estado,
+            "errores_bloqueo": sum(errores_bloqueo),
+            "latencia_ms": resumen_latencias(todas),
+            "consultas_por_venta": (
+                {
+                    "promedio": round(sum(todas_consultas) / len(todas_consultas), 2),
+                    "max": max(todas_consultas),
+                }
+                if todas_consultas
+                else None
+            ),
+        }
+
+        if not options["conservar"]:
+            self._limpiar()
+
+        texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if options["salida"]:
+            with open(options["salida"], "w", encoding="utf-8") as archivo:
+                archivo.write(texto + "\n")
+            self.stdout.write(f"Resultado guardado en {options['salida']}")
+        self.stdout.write(texto)
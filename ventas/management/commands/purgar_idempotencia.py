@@ -0,0 +1,36 @@
+from django.core.cache.backends.db import DatabaseCache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
+from django.utils import timezone
+
+from yuyitos.idempotencia import ALIAS_CACHE, almacen
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las respuestas guardadas por Idempotency-Key (ventas y abonos) "
+        "que ya expiraron. Las vigentes y las marcas de solicitudes en curso "
+        "no se tocan."
+    )
+
+    def handle(self, *args, **options):
+        cache = almacen()
+        if not isinstance(cache, DatabaseCache):
+            raise CommandError(
+                f"El caché '{ALIAS_CACHE}' no es DatabaseCache: "
+                "no hay filas vencidas que purgar."
+            )
+
+        db = router.db_for_write(cache.cache_model_class)
+        connection = connections[db]
+        tabla = connection.ops.quote_name(cache._table)
+        # igual que DatabaseCache: "expires" se guarda sin microsegundos
+        ahora = connection.ops.adapt_datetimefield_value(timezone.now().replace(microsecond=0))
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {tabla} WHERE expires < %s", [ahora])
+            borradas = cursor.rowcount
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Entradas de idempotencia vencidas borradas: {borradas}.")
+        )
@@ -0,0 +1,76 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from ventas.models import Venta, DetalleVenta
+
+# Ventas reparadas por UPDATE
+TAMANO_BLOQUE = 1000
+
+CERO = Value(Decimal("0.00"), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def _suma_detalles(venta_ref):
+    return Coalesce(
+        Subquery(
+            DetalleVenta.objects.filter(venta=venta_ref)
+            .values("venta")
+            .annotate(suma=Sum("subtotal"))
+            .values("suma")
+        ),
+        CERO,
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara Venta.total con la suma de sus detalles (una sola consulta "
+        "agregada para todas las ventas) y opcionalmente repara los descuadres."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reparar",
+            action="store_true",
+            help="Reescribe el total de las ventas descuadradas.",
+        )
+        parser.add_argument(
+            "--mostrar",
+            type=int,
+            default=20,
+            help="Cuántas ventas descuadradas listar (0 = todas).",
+        )
+
+    def handle(self, *args, **options):
+        descuadradas = list(
+            Venta.objects.annotate(suma_detalles=_suma_detalles(OuterRef("pk")))
+            .exclude(total=F("suma_detalles"))
+            .order_by("id")
+            .values_list("id", "total", "suma_detalles")
+        )
+
+        if not descuadradas:
+            self.stdout.write(self.style.SUCCESS("Todos los totales cuadran."))
+            return
+
+        self.stdout.write(
+            self.style.WARNING(f"Ventas con total descuadrado: {len(descuadradas)}")
+        )
+
+        mostrar = options["mostrar"] or len(descuadradas)
+        for venta_id, total, suma in descuadradas[:mostrar]:
+            self.stdout.write(
+                f"  Venta #{venta_id}: total={total} suma_detalles={suma} "
+                f"diferencia={total - suma}"
+            )
+
+        if options["reparar"]:
+            ids = [fila[0] for fila in descuadradas]
+            reparadas = 0
+            for inicio in range(0, len(ids), TAMANO_BLOQUE):
+                reparadas += Venta.objects.filter(
+                    pk__in=ids[inicio:inicio + TAMANO_BLOQUE]
+                ).update(total=_suma_detalles(OuterRef("pk")))
+            self.stdout.write(self.style.SUCCESS(f"Ventas reparadas: {reparadas}"))
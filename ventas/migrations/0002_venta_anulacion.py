@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='anulada',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='anulada_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='motivo_anulacion',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
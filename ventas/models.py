@@ -29,22 +29,43 @@ class Venta(models.Model):
     es_credito = models.BooleanField(default=False)
     observaciones = models.TextField(blank=True)
 
+    # Anulación: la venta queda registrada, pero con stock y crédito revertidos
+    anulada = models.BooleanField(default=False)
+    anulada_en = models.DateTimeField(null=True, blank=True)
+    motivo_anulacion = models.CharField(max_length=255, blank=True)
+
     def actualizar_total(self):
-        """Recalcula el total a partir de los detalles."""
-        total = sum(
-            (detalle.subtotal or Decimal("0.00"))
-            for detalle in self.detalles.all()
-        )
-        self.total = total
+        """
+        Recalcula el total desde cero con un SUM de los detalles.
+
+        En el flujo normal no hace falta: DetalleVenta.save()/delete()
+        aplican la diferencia del subtotal directamente en la BD.
+        Queda para reparar descuadres (ver comando verificar_totales).
+        """
+        total = self.detalles.aggregate(total=models.Sum("subtotal"))["total"]
+        self.total = total or Decimal("0.00")
         self.save(update_fields=["total"])
 
+    @staticmethod
+    def sumar_al_total(venta_id, delta):
+        """
+        total = total + delta, en un solo UPDATE y sin leer la venta.
+        """
+        if delta:
+            Venta.objects.filter(pk=venta_id).update(total=models.F("total") + delta)
+
     def delete(self, *args, **kwargs):
         """
-        Si la venta era a crédito, registra un AJUSTE para revertir
-        el efecto de la compra en el saldo del cliente.
-        Luego elimina la venta normalmente.
+        Antes de borrar, anula la venta (si no lo estaba): devuelve el stock
+        de sus detalles y, si era a crédito, registra el AJUSTE que revierte
+        la compra en el saldo del cliente. Luego elimina la venta normalmente.
         """
-        if self.es_credito and self.cliente:
+        from .registro import anular_ventas  # import local para evitar ciclos
+
+        if not self.anulada:
+            anular_ventas([self.pk], motivo="Venta eliminada")
+
+        if self.es_credito and self.cliente_id:
             from clientes.models import MovimientoCredito  # import local para evitar ciclos
 
             mov_compra = MovimientoCredito.objects.filter(
@@ -52,16 +73,8 @@ class Venta(models.Model):
                 tipo="COMPRA",
             ).order_by("id").first()
 
+            # Marca el movimiento original como “venta eliminada”
             if mov_compra is not None:
-                # Crea un AJUSTE que compense la compra
-                self.cliente.registrar_movimiento_credito(
-                    tipo="AJUSTE",
-                    monto=mov_compra.monto,
-                    venta=None,
-                    observaciones=f"Ajuste por eliminación de Venta #{self.id}",
-                )
-
-                # Marca el movimiento original como “venta eliminada”
                 texto = mov_compra.observaciones or ""
                 if "venta eliminada" not in texto.lower():
                     mov_compra.observaciones = (texto + " (venta eliminada)").strip()
@@ -105,9 +118,10 @@ class Venta(models.Model):
         else:
             nombre = ""
 
+        estado = " (anulada)" if self.anulada else ""
         if nombre:
-            return f"Venta #{self.id} - {nombre} - ${self.total}"
-        return f"Venta #{self.id} - ${self.total}"
+            return f"Venta #{self.id} - {nombre} - ${self.total}{estado}"
+        return f"Venta #{self.id} - ${self.total}{estado}"
 
 
 class DetalleVenta(models.Model):
@@ -130,44 +144,124 @@ class DetalleVenta(models.Model):
     )
     subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
+    # Campos cuyo valor en BD se recuerda al cargar la instancia (from_db),
+    # para calcular diferencias de stock y total sin releer la fila.
+    CAMPOS_RASTREADOS = ("venta_id", "producto_id", "cantidad", "precio_unitario", "subtotal")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._recordar_valores()
+        return instance
+
+    def _recordar_valores(self):
+        self._valores_bd = {
+            campo: self.__dict__[campo]
+            for campo in self.CAMPOS_RASTREADOS
+            if campo in self.__dict__
+        }
+
+    def _valores_anteriores(self):
+        """
+        Valores actualmente grabados en la BD para este detalle, o None si es nuevo.
+        Solo consulta la BD si la instancia no viene de from_db (ej: pk puesto a mano).
+        """
+        if self._state.adding and self.pk is None:
+            return None
+
+        valores = getattr(self, "_valores_bd", None)
+        if valores is not None and len(valores) == len(self.CAMPOS_RASTREADOS):
+            return valores
+
+        if self.pk is None:
+            return None
+        return (
+            DetalleVenta.objects.filter(pk=self.pk)
+            .values(*self.CAMPOS_RASTREADOS)
+            .first()
+        )
+
     def save(self, *args, **kwargs):
         """
         - Pone precio_unitario = precio_venta del producto si viene vacío
-        - Ajusta stock del producto (nuevo, o cambio de cantidad)
+        - Ajusta stock del producto (nuevo, cambio de cantidad o de producto)
         - Recalcula subtotal
-        - Actualiza total de la venta
+        - Suma al total de la venta solo la diferencia del subtotal
+
+        Si el detalle ya existía y no cambió nada, no hace ninguna consulta.
         """
-        if self.pk:
-            anterior = DetalleVenta.objects.get(pk=self.pk)
-            diferencia = self.cantidad - anterior.cantidad
-        else:
-            anterior = None
-            diferencia = self.cantidad
+        anterior = self._valores_anteriores()
 
         if self.precio_unitario is None:
             self.precio_unitario = self.producto.precio_venta
 
-        if diferencia > 0:
-            if not self.producto.hay_stock(diferencia):
-                raise ValidationError(
-                    f"No hay stock suficiente de '{self.producto.nombre}' "
-                    f"para vender {self.cantidad} unidades."
-                )
-            self.producto.descontar_stock(diferencia)
-        elif diferencia < 0:
-            self.producto.aumentar_stock(-diferencia)
-
         self.subtotal = (self.precio_unitario or Decimal("0.00")) * self.cantidad
 
+        if anterior is not None and all(
+            anterior[campo] == getattr(self, campo) for campo in self.CAMPOS_RASTREADOS
+        ):
+            return
+
+        if anterior is None:
+            self._mover_stock(self.producto_id, -self.cantidad)
+        elif anterior["producto_id"] != self.producto_id:
+            # Cambió el producto: se descuenta del nuevo y se devuelve al anterior
+            self._mover_stock(self.producto_id, -self.cantidad)
+            self._mover_stock(anterior["producto_id"], anterior["cantidad"])
+        else:
+            self._mover_stock(self.producto_id, anterior["cantidad"] - self.cantidad)
+
         super().save(*args, **kwargs)
 
-        self.venta.actualizar_total()
+        if anterior is None:
+            self._sumar_al_total(self.venta_id, self.subtotal)
+        elif anterior["venta_id"] != self.venta_id:
+            self._sumar_al_total(anterior["venta_id"], -(anterior["subtotal"] or Decimal("0.00")))
+            self._sumar_al_total(self.venta_id, self.subtotal)
+        else:
+            self._sumar_al_total(
+                self.venta_id,
+                self.subtotal - (anterior["subtotal"] or Decimal("0.00")),
+            )
+
+        self._recordar_valores()
 
     def delete(self, *args, **kwargs):
-        venta = self.venta
-        self.producto.aumentar_stock(self.cantidad)
-        super().delete(*args, **kwargs)
-        venta.actualizar_total()
+        anterior = self._valores_anteriores() or {
+            campo: getattr(self, campo) for campo in self.CAMPOS_RASTREADOS
+        }
+        resultado = super().delete(*args, **kwargs)
+        self._mover_stock(anterior["producto_id"], anterior["cantidad"])
+        self._sumar_al_total(
+            anterior["venta_id"], -(anterior["subtotal"] or Decimal("0.00"))
+        )
+        return resultado
+
+    def _mover_stock(self, producto_id, delta):
+        """
+        delta < 0 descuenta (falla si no hay stock), delta > 0 devuelve stock.
+        Usa los UPDATE atómicos de Producto.objects, sin cargar el producto.
+        """
+        if delta < 0:
+            if not Producto.objects.descontar_stock(producto_id, -delta):
+                raise ValidationError(
+                    f"No hay stock suficiente de '{self.producto.nombre}' "
+                    f"para vender {self.cantidad} unidades."
+                )
+        elif delta > 0:
+            Producto.objects.aumentar_stock(producto_id, delta)
+        else:
+            return
+
+        # Si el producto ya estaba cargado, lo dejamos coherente sin releerlo
+        if DetalleVenta.producto.is_cached(self) and self.producto.pk == producto_id:
+            self.producto.stock_actual += delta
+
+    def _sumar_al_total(self, venta_id, delta):
+        Venta.sumar_al_total(venta_id, delta)
+        # Si la venta ya estaba cargada, la dejamos coherente sin releerla
+        if delta and DetalleVenta.venta.is_cached(self) and self.venta.pk == venta_id:
+            self.venta.total += delta
 
     def __str__(self):
         return f"{self.producto.nombre} x {self.cantidad}"
@@ -0,0 +1,392 @@
+"""
+Motor de registro de ventas.
+
+Separa la venta en dos pasos:
+
+1) preparar_venta(): valida el JSON de la venta contra productos y cliente
+   ya cargados (no hace consultas por detalle).
+2) confirmar_venta(): graba todo dentro de un único transaction.atomic
+   con una cantidad de consultas que no depende del número de detalles:
+   - un UPDATE condicional para descontar el stock de todos los productos
+   - un INSERT de la venta con su total ya calculado
+   - un bulk_create de los detalles
+   - el movimiento de crédito (si corresponde)
+
+anular_ventas() hace el camino inverso para un conjunto de ventas, también
+en una sola transacción y sin recorrer los detalles uno a uno.
+"""
+
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from clientes.libro_credito import asentar
+from clientes.models import Cliente, MovimientoCredito
+from inventario.models import Producto, StockInsuficiente
+from .models import Venta, DetalleVenta
+
+
+class VentaInvalida(Exception):
+    """
+    Error de negocio al preparar o confirmar una venta.
+    Lleva el status HTTP que debe devolver la API.
+    """
+
+    def __init__(self, mensaje, status=400):
+        super().__init__(mensaje)
+        self.mensaje = mensaje
+        self.status = status
+
+
+def cargar_productos(producto_ids):
+    """
+    Trae todos los productos pedidos en una sola consulta (IN).
+    Devuelve un dict {id: Producto}.
+    """
+    ids = set()
+    for pid in producto_ids:
+        try:
+            ids.add(int(pid))
+        except (TypeError, ValueError):
+            continue
+    if not ids:
+        return {}
+    return Producto.objects.in_bulk(ids)
+
+
+def ids_productos(detalles_data):
+    """
+    Extrae los producto_id de una lista de detalles (sin validar).
+    """
+    ids = []
+    if isinstance(detalles_data, list):
+        for det in detalles_data:
+            if isinstance(det, dict) and det.get("producto_id") is not None:
+                ids.append(det.get("producto_id"))
+    return ids
+
+
+def cargar_clientes(ventas_data):
+    """
+    Trae de una vez todos los clientes referenciados por un lote de ventas
+    (por cliente_id o por rut). Devuelve (por_id, por_rut).
+    """
+    ids = set()
+    ruts = set()
+    for data in ventas_data:
+        if not isinstance(data, dict):
+            continue
+        if data.get("cliente_id") is not None:
+            try:
+                ids.add(int(data.get("cliente_id")))
+            except (TypeError, ValueError):
+                continue
+        elif data.get("rut"):
+            ruts.add(data.get("rut"))
+
+    por_id = Cliente.objects.in_bulk(ids) if ids else {}
+    por_rut = Cliente.objects.in_bulk(ruts, field_name="rut") if ruts else {}
+    return por_id, por_rut
+
+
+def resolver_cliente(data, por_id, por_rut):
+    """
+    Misma regla que _obtener_cliente de la API, pero sobre clientes ya cargados:
+    primero cliente_id, si no viene se usa el rut.
+    """
+    cliente_id = data.get("cliente_id")
+    if cliente_id is not None:
+        try:
+            return por_id.get(int(cliente_id))
+        except (TypeError, ValueError):
+            return None
+
+    rut = data.get("rut")
+    if rut:
+        return por_rut.get(rut)
+
+    return None
+
+
+def _buscar_producto(productos, producto_id):
+    # producto_id puede venir como int o como string desde el JSON
+    try:
+        return productos.get(int(producto_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def preparar_venta(data, cliente, productos):
+    """
+    Valida una venta con las mismas reglas de la API crear_venta.
+
+    - data: dict con el JSON de la venta
+    - cliente: Cliente ya resuelto (o None)
+    - productos: dict {id: Producto} con todos los productos de la venta
+
+    Devuelve un dict listo para confirmar_venta() o lanza VentaInvalida.
+    """
+    nombre_cliente_libre = (data.get("nombre_cliente_libre") or "").strip()
+    es_credito = bool(data.get("es_credito", False))
+    observaciones = (data.get("observaciones") or "").strip()
+
+    if es_credito:
+        # Para venta a crédito, el cliente es obligatorio
+        if cliente is None:
+            raise VentaInvalida(
+                "Para una venta a crédito debes indicar un cliente "
+                "(cliente_id o rut)."
+            )
+        if not cliente.tiene_credito or not cliente.es_activo:
+            raise VentaInvalida(
+                "El cliente no tiene crédito habilitado o está inactivo."
+            )
+
+    detalles_data = data.get("detalles")
+    if not isinstance(detalles_data, list) or len(detalles_data) == 0:
+        raise VentaInvalida("La venta debe incluir al menos un detalle de producto.")
+
+    detalles_preparados = []
+    cantidades = defaultdict(int)
+    total = Decimal("0.00")
+
+    for idx, det in enumerate(detalles_data, start=1):
+        if not isinstance(det, dict):
+            raise VentaInvalida(f"El detalle #{idx} no es válido.")
+
+        producto_id = det.get("producto_id")
+        cantidad_raw = det.get("cantidad", 1)
+        precio_unit_raw = det.get("precio_unitario")
+
+        if producto_id is None:
+            raise VentaInvalida(f"En el detalle #{idx} falta 'producto_id'.")
+
+        producto = _buscar_producto(productos, producto_id)
+        if producto is None:
+            raise VentaInvalida(
+                f"Producto con id {producto_id} no existe (detalle #{idx}).",
+                status=404,
+            )
+
+        # cantidad
+        try:
+            cantidad = int(cantidad_raw)
+        except (TypeError, ValueError):
+            raise VentaInvalida(
+                f"La 'cantidad' debe ser un entero válido (detalle #{idx})."
+            )
+
+        if cantidad <= 0:
+            raise VentaInvalida(f"La 'cantidad' debe ser mayor que 0 (detalle #{idx}).")
+
+        # precio_unitario
+        if precio_unit_raw is not None:
+            try:
+                precio_unitario = Decimal(str(precio_unit_raw))
+            except (InvalidOperation, TypeError):
+                raise VentaInvalida(
+                    f"El 'precio_unitario' debe ser un número válido (detalle #{idx})."
+                )
+        else:
+            # usamos el precio_venta del producto
+            precio_unitario = producto.precio_venta
+
+        if precio_unitario <= 0:
+            raise VentaInvalida(
+                f"El precio_unitario debe ser mayor que 0 (detalle #{idx})."
+            )
+
+        # Verificar stock disponible (acumulando si el producto se repite)
+        cantidades[producto.id] += cantidad
+        if not producto.hay_stock(cantidades[producto.id]):
+            raise VentaInvalida(
+                f"No hay stock suficiente de '{producto.nombre}' "
+                f"para vender {cantidad} unidades (detalle #{idx})."
+            )
+
+        subtotal = precio_unitario * cantidad
+        total += subtotal
+
+        detalles_preparados.append(
+            {
+                "producto": producto,
+                "cantidad": cantidad,
+                "precio_unitario": precio_unitario,
+                "subtotal": subtotal,
+            }
+        )
+
+    # Si es crédito, validar cupo antes de grabar nada
+    if es_credito and not cliente.puede_comprar_a_credito(total):
+        raise VentaInvalida(
+            "El total de la venta excede el cupo de crédito disponible "
+            "para este cliente."
+        )
+
+    return {
+        "cliente": cliente,
+        "nombre_cliente_libre": nombre_cliente_libre if cliente is None else "",
+        "es_credito": es_credito,
+        "observaciones": observaciones,
+        "detalles": detalles_preparados,
+        "cantidades": dict(cantidades),
+        "total": total,
+    }
+
+
+def confirmar_venta(preparada, origen="API"):
+    """
+    Graba una venta preparada con preparar_venta() en una sola transacción.
+
+    Devuelve (venta, movimiento) donde movimiento es el MovimientoCredito
+    de la compra (o None si la venta es al contado).
+    Lanza VentaInvalida si el stock o el cupo cambiaron entre la validación
+    y la grabación; en ese caso no queda nada grabado.
+    """
+    cliente = preparada["cliente"]
+
+    with transaction.atomic():
+        try:
+            Producto.objects.descontar_stock_lote(preparada["cantidades"])
+        except StockInsuficiente:
+            # sale de este atomic: la BD deshace el descuento
+            raise VentaInvalida(
+                "No hay stock suficiente para completar la venta "
+                "(el stock cambió mientras se registraba)."
+            )
+
+        venta = Venta.objects.create(
+            cliente=cliente,
+            nombre_cliente_libre=preparada["nombre_cliente_libre"],
+            es_credito=preparada["es_credito"],
+            observaciones=preparada["observaciones"],
+            total=preparada["total"],
+        )
+
+        # bulk_create no pasa por DetalleVenta.save(): el stock y el total
+        # ya quedaron resueltos arriba.
+        DetalleVenta.objects.bulk_create(
+            [
+                DetalleVenta(
+                    venta=venta,
+                    producto=det["producto"],
+                    cantidad=det["cantidad"],
+                    precio_unitario=det["precio_unitario"],
+                    subtotal=det["subtotal"],
+                )
+                for det in preparada["detalles"]
+            ]
+        )
+
+        movimiento = None
+        if venta.es_credito and cliente:
+            try:
+                movimiento = cliente.registrar_movimiento_credito(
+                    tipo="COMPRA",
+                    monto=venta.total,
+                    venta=venta,
+                    observaciones=f"Compra a crédito ({origen}) Venta #{venta.id}",
+                )
+            except ValidationError as e:
+                raise VentaInvalida(" ".join(e.messages))
+
+    # Deja los productos cargados en memoria coherentes con la BD
+    # (sirve cuando se confirman varias ventas con los mismos objetos).
+    for det in preparada["detalles"]:
+        det["producto"].stock_actual -= det["cantidad"]
+
+    return venta, movimiento
+
+
+def anular_ventas(venta_ids, motivo=""):
+    """
+    Anula un conjunto de ventas en una sola transacción:
+
+    - devuelve el stock de todos sus detalles con un único UPDATE agrupado
+      por producto (Producto.objects.aumentar_stock_lote)
+    - para las ventas a crédito, crea con bulk_create los AJUSTE que
+      compensan lo cargado al cliente y actualiza su saldo_actual
+    - marca las ventas como anuladas (no se borran)
+
+    Las ventas que no existen o que ya estaban anuladas se ignoran.
+    Devuelve la lista de ids efectivamente anulados.
+    """
+    ids = set()
+    for vid in venta_ids:
+        try:
+            ids.add(int(vid))
+        except (TypeError, ValueError):
+            continue
+    if not ids:
+        return []
+
+    with transaction.atomic():
+        ventas = list(
+            Venta.objects.select_for_update()
+            .filter(pk__in=ids, anulada=False)
+            .order_by("id")
+            .values("id", "es_credito", "cliente_id")
+        )
+        if not ventas:
+            return []
+        ids = [v["id"] for v in ventas]
+
+        # Stock: cantidades totales por producto de todas las ventas
+        cantidades = dict(
+            DetalleVenta.objects.filter(venta_id__in=ids)
+            .values("producto_id")
+            .annotate(cantidad=Sum("cantidad"))
+            .values_list("producto_id", "cantidad")
+        )
+        Producto.objects.aumentar_stock_lote(cantidades)
+
+        # Crédito: lo cargado por cada venta (COMPRA menos AJUSTE ya hechos)
+        credito = [v for v in ventas if v["es_credito"] and v["cliente_id"]]
+        if credito:
+            _revertir_credito(credito)
+
+        Venta.objects.filter(pk__in=ids).update(
+            anulada=True,
+            anulada_en=timezone.now(),
+            motivo_anulacion=(motivo or "")[:255],
+        )
+
+    return ids
+
+
+def _revertir_credito(ventas):
+    """
+    Crea los AJUSTE que compensan las compras a crédito de las ventas dadas
+    (dicts con id y cliente_id) y deja el saldo de cada cliente al día.
+    """
+    netos = defaultdict(Decimal)
+    movimientos = (
+        MovimientoCredito.objects.filter(
+            venta_id__in=[v["id"] for v in ventas],
+            tipo__in=["COMPRA", "AJUSTE"],
+        )
+        .values("venta_id", "tipo")
+        .annotate(monto=Sum("monto"))
+    )
+    for mov in movimientos:
+        if mov["tipo"] == "COMPRA":
+            netos[mov["venta_id"]] += mov["monto"]
+        else:
+            netos[mov["venta_id"]] -= mov["monto"]
+
+    # El libro de crédito bloquea a los clientes y los actualiza en lote
+    asentar(
+        MovimientoCredito(
+            cliente_id=v["cliente_id"],
+            venta_id=v["id"],
+            tipo="AJUSTE",
+            monto=netos[v["id"]],
+            observaciones=f"Ajuste por anulación de Venta #{v['id']}",
+        )
+        for v in ventas
+        if netos.get(v["id"], Decimal("0.00")) > 0
+    )
@@ -896,3 +896,865 @@ class ApiReportesProductosMasVendidosMejoradoTests(BaseApiVentasTestCase):
             self.assertIn("cantidad", prod)
             self.assertIn("total", prod)
 
+
+
+# =====================================================
+# PRUEBAS: motor de registro de ventas (ventas.registro)
+# =====================================================
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class RegistroVentaTests(BaseApiVentasTestCase):
+    """
+    Pruebas del registro set-based de ventas usado por POST /api/ventas/crear/.
+    """
+
+    def _crear_productos(self, cantidad, stock=50):
+        return [
+            Producto.objects.create(
+                nombre=f"Producto Motor {i}",
+                precio_compra=Decimal("500.00"),
+                precio_venta=Decimal("1000.00"),
+                stock_actual=stock,
+            )
+            for i in range(cantidad)
+        ]
+
+    def _postear_venta(self, productos, **extra):
+        payload = {
+            "es_credito": False,
+            "cliente_id": self.cliente.id,
+            "detalles": [
+                {"producto_id": p.id, "cantidad": 2} for p in productos
+            ],
+        }
+        payload.update(extra)
+        return self.client.post(
+            "/api/ventas/crear/",
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+
+    def test_crear_venta_descuenta_stock_y_calcula_total(self):
+        """
+        La venta debe descontar stock de cada producto y dejar el total
+        igual a la suma de los subtotales.
+        """
+        productos = self._crear_productos(3, stock=10)
+
+        response = self._postear_venta(productos)
+        self.assertEqual(response.status_code, 201)
+
+        venta = Venta.objects.latest("id")
+        self.assertEqual(venta.total, Decimal("6000.00"))
+        self.assertEqual(venta.detalles.count(), 3)
+
+        for p in productos:
+            p.refresh_from_db()
+            self.assertEqual(p.stock_actual, 8)
+
+    def test_cantidad_de_consultas_no_crece_con_los_detalles(self):
+        """
+        Una venta de 1 detalle y una de 20 detalles deben ejecutar
+        la misma cantidad de consultas.
+        """
+        productos = self._crear_productos(21)
+
+        with CaptureQueriesContext(connection) as pocas_lineas:
+            response = self._postear_venta(productos[:1])
+        self.assertEqual(response.status_code, 201)
+
+        with CaptureQueriesContext(connection) as muchas_lineas:
+            response = self._postear_venta(productos[1:])
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(len(pocas_lineas), len(muchas_lineas))
+
+    def test_stock_insuficiente_no_graba_nada(self):
+        """
+        Si un producto no tiene stock, la API responde 400
+        y no quedan venta, detalles ni stock descontado.
+        """
+        con_stock, sin_stock = self._crear_productos(2, stock=1)
+        sin_stock.stock_actual = 0
+        sin_stock.save()
+
+        ventas_antes = Venta.objects.count()
+        payload_detalles = [
+            {"producto_id": con_stock.id, "cantidad": 1},
+            {"producto_id": sin_stock.id, "cantidad": 1},
+        ]
+
+        response = self._postear_venta([], detalles=payload_detalles)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Venta.objects.count(), ventas_antes)
+        con_stock.refresh_from_db()
+        self.assertEqual(con_stock.stock_actual, 1)
+
+    def test_producto_repetido_suma_cantidades_para_el_stock(self):
+        """
+        Si el mismo producto aparece en dos detalles, el stock se valida
+        contra la suma de ambas cantidades.
+        """
+        (producto,) = self._crear_productos(1, stock=3)
+
+        response = self._postear_venta([producto, producto])
+
+        self.assertEqual(response.status_code, 400)
+        producto.refresh_from_db()
+        self.assertEqual(producto.stock_actual, 3)
+
+
+class ApiVentasLoteTests(BaseApiVentasTestCase):
+    """
+    Plan de pruebas para:
+    POST /api/ventas/lote/
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.producto.stock_actual = 5
+        self.producto.save()
+
+    def _postear_lote(self, ventas):
+        return self.client.post(
+            "/api/ventas/lote/",
+            data=json.dumps({"ventas": ventas}),
+            content_type="application/json",
+        )
+
+    def test_lote_devuelve_un_resultado_por_venta_en_orden(self):
+        """
+        Ventas válidas e inválidas en el mismo lote:
+        - las válidas se crean
+        - las inválidas vuelven con su error, sin afectar a las demás
+        """
+        ventas = [
+            {
+                "referencia": "caja1-1",
+                "cliente_id": self.cliente.id,
+                "detalles": [{"producto_id": self.producto.id, "cantidad": 2}],
+            },
+            {
+                "referencia": "caja1-2",
+                "es_credito": True,
+                "detalles": [{"producto_id": self.producto.id, "cantidad": 1}],
+            },
+            {
+                "referencia": "caja1-3",
+                "es_credito": True,
+                "rut": self.cliente.rut,
+                "detalles": [{"producto_id": self.producto.id, "cantidad": 1}],
+            },
+        ]
+
+        response = self._postear_lote(ventas)
+        self.assertEqual(response.status_code, 200)
+
+        data = response.json()
+        self.assertEqual(data["creadas"], 2)
+        self.assertEqual(data["rechazadas"], 1)
+
+        resultados = data["resultados"]
+        self.assertEqual([r["referencia"] for r in resultados], ["caja1-1", "caja1-2", "caja1-3"])
+        self.assertTrue(resultados[0]["ok"])
+        # Venta a crédito sin cliente: misma regla que crear_venta
+        self.assertFalse(resultados[1]["ok"])
+        self.assertEqual(resultados[1]["status"], 400)
+        self.assertTrue(resultados[2]["ok"])
+        self.assertIsNotNone(resultados[2]["movimiento_credito_id"])
+
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, 2)
+
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.saldo_actual, Decimal("1500.00"))
+
+    def test_lote_descuenta_stock_entre_ventas_del_mismo_lote(self):
+        """
+        El stock consumido por una venta del lote se considera en las siguientes.
+        """
+        ventas = [
+            {"nombre_cliente_libre": "A", "detalles": [{"producto_id": self.producto.id, "cantidad": 4}]},
+            {"nombre_cliente_libre": "B", "detalles": [{"producto_id": self.producto.id, "cantidad": 4}]},
+        ]
+
+        response = self._postear_lote(ventas)
+        data = response.json()
+
+        self.assertTrue(data["resultados"][0]["ok"])
+        self.assertFalse(data["resultados"][1]["ok"])
+        self.assertEqual(data["resultados"][1]["status"], 400)
+
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, 1)
+
+    def test_lote_respeta_cupo_de_credito_acumulado(self):
+        """
+        Dos compras a crédito que juntas exceden el cupo: la segunda se rechaza.
+        """
+        self.cliente.cupo_maximo = Decimal("2000.00")
+        self.cliente.save()
+
+        venta = {
+            "es_credito": True,
+            "cliente_id": self.cliente.id,
+            "detalles": [{"producto_id": self.producto.id, "cantidad": 1}],
+        }
+
+        response = self._postear_lote([venta, venta])
+        resultados = response.json()["resultados"]
+
+        self.assertTrue(resultados[0]["ok"])
+        self.assertFalse(resultados[1]["ok"])
+
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.saldo_actual, Decimal("1500.00"))
+
+    def test_lote_vacio_devuelve_400(self):
+        response = self._postear_lote([])
+        self.assertEqual(response.status_code, 400)
+
+
+class ApiVentasIdempotenciaTests(BaseApiVentasTestCase):
+    """
+    POST /api/ventas/crear/ con cabecera Idempotency-Key.
+    """
+
+    def setUp(self):
+        super().setUp()
+        from yuyitos.idempotencia import almacen
+
+        almacen().clear()
+        self.producto.stock_actual = 10
+        self.producto.save()
+
+    def _postear(self, clave, cantidad=1):
+        payload = {
+            "cliente_id": self.cliente.id,
+            "detalles": [{"producto_id": self.producto.id, "cantidad": cantidad}],
+        }
+        return self.client.post(
+            "/api/ventas/crear/",
+            data=json.dumps(payload),
+            content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY=clave,
+        )
+
+    def test_reintento_con_misma_clave_no_crea_otra_venta(self):
+        """
+        El reintento devuelve la misma respuesta y no descuenta stock otra vez.
+        """
+        primera = self._postear("caja1-venta-1")
+        segunda = self._postear("caja1-venta-1")
+
+        self.assertEqual(primera.status_code, 201)
+        self.assertEqual(segunda.status_code, 201)
+        self.assertEqual(segunda["Idempotent-Replayed"], "true")
+        self.assertEqual(
+            primera.json()["venta"]["id"],
+            segunda.json()["venta"]["id"],
+        )
+        self.assertEqual(Venta.objects.count(), 1)
+
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, 9)
+
+    def test_misma_clave_con_otro_cuerpo_devuelve_422(self):
+        self._postear("caja1-venta-2", cantidad=1)
+        response = self._postear("caja1-venta-2", cantidad=3)
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Venta.objects.count(), 1)
+
+    def test_claves_distintas_crean_ventas_distintas(self):
+        self._postear("caja1-venta-3")
+        self._postear("caja1-venta-4")
+
+        self.assertEqual(Venta.objects.count(), 2)
+
+    def test_purgar_borra_solo_las_entradas_vencidas(self):
+        """
+        purgar_idempotencia borra las filas vencidas del caché en la BD y deja
+        las respuestas vigentes y las marcas de solicitudes en curso.
+        """
+        from io import StringIO
+        from unittest import mock
+
+        from django.core.management import call_command
+        from yuyitos.idempotencia import almacen
+
+        cache = almacen()
+        cache.set("idem:vencida", {"status": 201}, timeout=10)
+        cache.set("idem:vigente", {"status": 201})
+        cache.add("idem:vigente:en_curso", True, timeout=60)
+
+        dentro_de_30s = timezone.now() + timedelta(seconds=30)
+        salida = StringIO()
+        with mock.patch("django.utils.timezone.now", return_value=dentro_de_30s):
+            call_command("purgar_idempotencia", stdout=salida)
+
+        self.assertIn("borradas: 1", salida.getvalue())
+        self.assertFalse(cache.has_key("idem:vencida"))
+        self.assertTrue(cache.has_key("idem:vigente"))
+        # la solicitud en curso sigue bloqueando los reintentos
+        self.assertFalse(cache.add("idem:vigente:en_curso", True))
+
+
+# =====================================================
+# PRUEBAS: total incremental de la venta
+# =====================================================
+
+from io import StringIO
+
+from django.core.management import call_command
+
+
+class VentaTotalIncrementalTests(BaseVentaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.producto = Producto.objects.create(
+            nombre="Producto Total",
+            precio_compra=Decimal("500.00"),
+            precio_venta=Decimal("1000.00"),
+            stock_actual=20,
+        )
+        self.venta = Venta.objects.create(cliente=self.cliente)
+
+    def test_crear_modificar_y_borrar_detalle_mantiene_el_total(self):
+        detalle = DetalleVenta.objects.create(
+            venta=self.venta, producto=self.producto, cantidad=2
+        )
+        self.venta.refresh_from_db()
+        self.assertEqual(self.venta.total, Decimal("2000.00"))
+
+        detalle.cantidad = 5
+        detalle.save()
+        self.venta.refresh_from_db()
+        self.assertEqual(self.venta.total, Decimal("5000.00"))
+
+        DetalleVenta.objects.create(
+            venta=self.venta, producto=self.producto, cantidad=1
+        )
+        detalle.delete()
+        self.venta.refresh_from_db()
+        self.assertEqual(self.venta.total, Decimal("1000.00"))
+
+    def test_guardar_detalle_no_recorre_los_demas_detalles(self):
+        """
+        El total se ajusta con un UPDATE total = total + delta,
+        no con un SELECT de todos los detalles.
+        """
+        detalle = DetalleVenta.objects.create(
+            venta=self.venta, producto=self.producto, cantidad=1
+        )
+
+        with CaptureQueriesContext(connection) as consultas:
+            detalle.cantidad = 2
+            detalle.save()
+
+        sql = " ".join(q["sql"] for q in consultas.captured_queries)
+        self.assertNotIn('SUM("ventas_detalleventa"."subtotal")', sql)
+
+    def test_verificar_totales_detecta_y_repara_descuadre(self):
+        DetalleVenta.objects.create(
+            venta=self.venta, producto=self.producto, cantidad=3
+        )
+        Venta.objects.filter(pk=self.venta.pk).update(total=Decimal("1.00"))
+
+        salida = StringIO()
+        call_command("verificar_totales", stdout=salida)
+        self.assertIn(f"Venta #{self.venta.pk}", salida.getvalue())
+
+        call_command("verificar_totales", "--reparar", stdout=StringIO())
+        self.venta.refresh_from_db()
+        self.assertEqual(self.venta.total, Decimal("3000.00"))
+
+        salida = StringIO()
+        call_command("verificar_totales", stdout=salida)
+        self.assertIn("Todos los totales cuadran", salida.getvalue())
+
+
+class DetalleVentaCambiosTests(BaseVentaTestCase):
+    """
+    DetalleVenta recuerda sus valores cargados (from_db) y no relee la fila
+    para calcular las diferencias de stock y total.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.producto = Producto.objects.create(
+            nombre="Producto Cambios",
+            precio_compra=Decimal("500.00"),
+            precio_venta=Decimal("1000.00"),
+            stock_actual=20,
+        )
+        self.otro_producto = Producto.objects.create(
+            nombre="Otro Producto Cambios",
+            precio_compra=Decimal("500.00"),
+            precio_venta=Decimal("2000.00"),
+            stock_actual=20,
+        )
+        self.venta = Venta.objects.create(cliente=self.cliente)
+        detalle = DetalleVenta.objects.create(
+            venta=self.venta, producto=self.producto, cantidad=2
+        )
+        self.detalle = DetalleVenta.objects.get(pk=detalle.pk)
+
+    def test_guardar_detalle_sin_cambios_no_hace_consultas(self):
+        with self.assertNumQueries(0):
+            self.detalle.save()
+
+    def test_cambiar_cantidad_no_relee_detalle_producto_ni_venta(self):
+        """
+        Solo 3 UPDATE: stock, detalle y total de la venta.
+        """
+        self.detalle.cantidad = 5
+
+        with self.assertNumQueries(3):
+            self.detalle.save()
+
+        self.producto.refresh_from_db()
+        self.venta.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, 15)
+        self.assertEqual(self.venta.total, Decimal("5000.00"))
+
+    def test_guardar_dos_veces_usa_los_valores_recien_grabados(self):
+        self.detalle.cantidad = 4
+        self.detalle.save()
+        self.detalle.cantidad = 3
+        self.detalle.save()
+
+        self.producto.refresh_from_db()
+        self.venta.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, 17)
+        self.assertEqual(self.venta.total, Decimal("3000.00"))
+
+    def test_cambiar_producto_devuelve_stock_al_anterior(self):
+        self.detalle.producto = self.otro_producto
+        self.detalle.precio_unitario = None
+        self.detalle.save()
+
+        self.producto.refresh_from_db()
+        self.otro_producto.refresh_from_db()
+        self.venta.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, 20)
+        self.assertEqual(self.otro_producto.stock_actual, 18)
+        self.assertEqual(self.venta.total, Decimal("4000.00"))
+
+    def test_aumentar_cantidad_sin_stock_lanza_validation_error(self):
+        self.detalle.cantidad = 50
+
+        with self.assertRaises(ValidationError):
+            self.detalle.save()
+
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, 18)
+
+
+from clientes.models import MovimientoCredito
+from .registro import anular_ventas, cargar_productos, confirmar_venta, preparar_venta
+
+
+class AnulacionVentasTests(BaseApiVentasTestCase):
+    """
+    Anulación de ventas: devuelve stock, revierte crédito y conserva la venta.
+    """
+
+    def setUp(self):
+        super().setUp()
+        # La anulación por API es solo para administradores
+        self.user.groups.add(Group.objects.get(name="Admin"))
+
+        self.producto.stock_actual = 50
+        self.producto.save()
+        self.otro_producto = Producto.objects.create(
+            nombre="Otro Producto Anulación",
+            precio_compra=Decimal("500.00"),
+            precio_venta=Decimal("1000.00"),
+            stock_actual=50,
+        )
+
+    def _vender(self, es_credito=False, cantidad=2):
+        productos = [self.producto, self.otro_producto]
+        data = {
+            "es_credito": es_credito,
+            "detalles": [{"producto_id": p.id, "cantidad": cantidad} for p in productos],
+        }
+        preparada = preparar_venta(
+            data, self.cliente, cargar_productos([p.id for p in productos])
+        )
+        venta, _ = confirmar_venta(preparada, origen="Test")
+        return venta
+
+    def _postear_anulacion(self, venta_ids, motivo=""):
+        return self.client.post(
+            "/api/ventas/anular/",
+            data=json.dumps({"venta_ids": venta_ids, "motivo": motivo}),
+            content_type="application/json",
+        )
+
+    def test_anular_devuelve_stock_y_marca_las_ventas(self):
+        ventas = [self._vender(cantidad=2), self._vender(cantidad=3)]
+
+        anuladas = anular_ventas([v.id for v in ventas], motivo="Cierre de caja")
+
+        self.assertEqual(sorted(anuladas), sorted(v.id for v in ventas))
+        for p in (self.producto, self.otro_producto):
+            p.refresh_from_db()
+            self.assertEqual(p.stock_actual, 50)
+
+        for venta in ventas:
+            venta.refresh_from_db()
+            self.assertTrue(venta.anulada)
+            self.assertIsNotNone(venta.anulada_en)
+            self.assertEqual(venta.motivo_anulacion, "Cierre de caja")
+            # La venta se conserva con sus detalles y su total
+            self.assertEqual(venta.detalles.count(), 2)
+            self.assertGreater(venta.total, 0)
+
+    def test_anular_venta_a_credito_crea_ajuste_y_baja_el_saldo(self):
+        venta = self._vender(es_credito=True, cantidad=2)
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.saldo_actual, Decimal("5000.00"))
+
+        anular_ventas([venta.id])
+
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.saldo_actual, Decimal("0.00"))
+        ajuste = MovimientoCredito.objects.get(venta=venta, tipo="AJUSTE")
+        self.assertEqual(ajuste.monto, Decimal("5000.00"))
+        self.assertEqual(ajuste.saldo_despues, Decimal("0.00"))
+
+    def test_anular_dos_veces_no_devuelve_stock_de_nuevo(self):
+        venta = self._vender(es_credito=True, cantidad=2)
+
+        self.assertEqual(anular_ventas([venta.id]), [venta.id])
+        self.assertEqual(anular_ventas([venta.id]), [])
+
+        self.producto.refresh_from_db()
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, 50)
+        self.assertEqual(self.cliente.saldo_actual, Decimal("0.00"))
+        self.assertEqual(
+            MovimientoCredito.objects.filter(venta=venta, tipo="AJUSTE").count(), 1
+        )
+
+    def test_cantidad_de_consultas_no_crece_con_las_ventas(self):
+        pocas = [self._vender(es_credito=True, cantidad=1) for _ in range(2)]
+        muchas = [self._vender(es_credito=True, cantidad=1) for _ in range(10)]
+
+        with CaptureQueriesContext(connection) as pocas_ctx:
+            anular_ventas([v.id for v in pocas])
+        with CaptureQueriesContext(connection) as muchas_ctx:
+            anular_ventas([v.id for v in muchas])
+
+        self.assertEqual(len(pocas_ctx), len(muchas_ctx))
+
+    def test_eliminar_venta_devuelve_stock(self):
+        venta = self._vender(es_credito=True, cantidad=4)
+
+        venta.delete()
+
+        self.producto.refresh_from_db()
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, 50)
+        self.assertEqual(self.cliente.saldo_actual, Decimal("0.00"))
+        self.assertFalse(Venta.objects.filter(pk=venta.pk).exists())
+
+    def test_api_anular_informa_ids_no_anulados(self):
+        venta = self._vender()
+
+        response = self._postear_anulacion([venta.id, 999999], motivo="Error")
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["anuladas"], [venta.id])
+        self.assertEqual(data["no_anuladas"], [999999])
+
+    def test_api_anular_sin_ids_devuelve_400(self):
+        response = self._postear_anulacion([])
+        self.assertEqual(response.status_code, 400)
+
+    def test_api_anular_requiere_admin(self):
+        venta = self._vender()
+        self.user.groups.remove(Group.objects.get(name="Admin"))
+
+        response = self._postear_anulacion([venta.id])
+
+        self.assertNotEqual(response.status_code, 200)
+        venta.refresh_from_db()
+        self.assertFalse(venta.anulada)
+
+    def test_estadisticas_hoy_excluyen_ventas_anuladas(self):
+        vigente = self._vender(cantidad=1)
+        anulada = self._vender(cantidad=3)
+        anular_ventas([anulada.id])
+
+        response = self.client.get("/api/ventas/estadisticas/hoy/")
+
+        data = response.json()
+        self.assertEqual(data["cantidad_ventas"], 1)
+        self.assertEqual(data["total_ventas"], float(vigente.total))
+
+
+from yuyitos.pruebas import PresupuestoConsultasMixin
+
+
+class PresupuestoSQLVentasTests(PresupuestoConsultasMixin, BaseApiVentasTestCase):
+    """
+    Presupuesto de consultas de POST /api/ventas/crear/.
+    """
+
+    def test_crear_venta_a_credito_con_varios_detalles(self):
+        productos = [
+            Producto.objects.create(
+                nombre=f"Producto Presupuesto {i}",
+                precio_compra=Decimal("100.00"),
+                precio_venta=Decimal("200.00"),
+                stock_actual=10,
+            )
+            for i in range(10)
+        ]
+        payload = {
+            "es_credito": True,
+            "cliente_id": self.cliente.id,
+            "detalles": [{"producto_id": p.id, "cantidad": 1} for p in productos],
+        }
+
+        # sesión, usuario, cliente, productos, transacción y detalle de la respuesta
+        with self.assertMaxConsultas(15):
+            response = self.client.post(
+                "/api/ventas/crear/",
+                data=json.dumps(payload),
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 201)
+
+
+from inventario.cache import productos_por_codigo
+from inventario.models import Categoria
+
+
+class ApiPosScanTests(BaseApiVentasTestCase):
+    """
+    GET /api/pos/scan/<codigo>/ servido desde el caché por código de barras.
+    """
+
+    def setUp(self):
+        super().setUp()
+        productos_por_codigo.limpiar()
+        self.producto.codigo_barras = "7801234567890"
+        self.producto.stock_actual = 10
+        self.producto.save()
+
+    def _scan(self, codigo="7801234567890"):
+        return self.client.get(f"/api/pos/scan/{codigo}/")
+
+    def test_scan_devuelve_producto_y_luego_sale_del_cache(self):
+        primera = self._scan()
+        self.assertEqual(primera.status_code, 200)
+        self.assertEqual(primera["X-Cache"], "MISS")
+        self.assertEqual(primera.json()["id"], self.producto.id)
+
+        # Solo sesión y usuario: el producto no se consulta
+        with self.assertNumQueries(2):
+            segunda = self._scan()
+        self.assertEqual(segunda["X-Cache"], "HIT")
+        self.assertEqual(segunda.json(), primera.json())
+
+    def test_scan_codigo_inexistente_devuelve_404(self):
+        response = self._scan("000")
+        self.assertEqual(response.status_code, 404)
+        self.assertIn("error", response.json())
+
+    def test_guardar_producto_invalida_el_cache(self):
+        self._scan()
+        self.producto.precio_venta = Decimal("1990.00")
+        self.producto.save()
+
+        response = self._scan()
+
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["precio_venta"], "1990.00")
+
+    def test_venta_invalida_el_stock_cacheado(self):
+        self._scan()
+        Producto.objects.descontar_stock(self.producto.id, 3)
+
+        response = self._scan()
+
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["stock_actual"], 7)
+
+    def test_producto_desactivado_deja_de_encontrarse(self):
+        self._scan()
+        self.producto.es_activo = False
+        self.producto.save()
+
+        self.assertEqual(self._scan().status_code, 404)
+
+    def test_escaneo_entre_la_venta_y_el_commit_no_queda_en_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Producto.objects.descontar_stock(self.producto.id, 3)
+            # otra caja escanea antes del commit: lee el stock viejo y lo guarda
+            productos_por_codigo.guardar(
+                "7801234567890",
+                self.producto.id,
+                b'{"stock_actual": 10}',
+                productos_por_codigo.generacion(),
+            )
+
+        response = self._scan()
+
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["stock_actual"], 7)
+
+    def test_renombrar_categoria_invalida_el_cache(self):
+        categoria = Categoria.objects.create(nombre="Bebidas")
+        self.producto.categoria = categoria
+        self.producto.save()
+        self.assertEqual(self._scan().json()["categoria"], "Bebidas")
+
+        categoria.nombre = "Bebestibles"
+        categoria.save()
+
+        response = self._scan()
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["categoria"], "Bebestibles")
+
+
+from inventario.sugerencias import indice_sugerencias
+
+
+class ApiPosSugerenciasTests(BaseApiVentasTestCase):
+    """
+    GET /api/pos/sugerencias/?q= servido desde el índice en memoria.
+    """
+
+    def setUp(self):
+        super().setUp()
+        indice_sugerencias.limpiar()
+        self.addCleanup(indice_sugerencias.limpiar)
+
+    def test_sugiere_por_prefijo_sin_consultar_productos(self):
+        self.client.get("/api/pos/sugerencias/", {"q": "prod"})
+
+        # Solo sesión y usuario
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/pos/sugerencias/", {"q": "PRODUCTO ven"})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["count"], 1)
+        self.assertEqual(data["results"][0]["id"], self.producto.id)
+        self.assertEqual(data["results"][0]["precio_venta"], "1500.00")
+
+    def test_sin_texto_no_sugiere_nada(self):
+        response = self.client.get("/api/pos/sugerencias/")
+
+        self.assertEqual(response.json()["results"], [])
+
+
+from django.core.cache import cache
+
+from inventario.cache import categorias
+
+
+class ApiPosBootstrapTests(PresupuestoConsultasMixin, BaseApiVentasTestCase):
+    """
+    GET /api/pos/bootstrap/: todo lo que la caja carga al iniciar.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        categorias.invalidar()
+
+    def test_trae_todas_las_secciones_con_pocas_consultas(self):
+        # sesión + usuario + grupos + productos + clientes + categorías + ventas de hoy
+        with self.assertMaxConsultas(7):
+            response = self.client.get("/api/pos/bootstrap/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Cache"], "MISS")
+        data = response.json()
+        self.assertEqual(data["rol"], "cajero")
+        self.assertEqual([p["id"] for p in data["productos"]], [self.producto.id])
+        self.assertEqual(data["productos"][0]["precio_venta"], "1500.00")
+        self.assertEqual([c["id"] for c in data["clientes"]], [self.cliente.id])
+        self.assertEqual(data["estadisticas_hoy"]["cantidad_ventas"], 0)
+        self.assertIn("categorias", data)
+
+    def test_segunda_carga_sale_del_cache_del_rol(self):
+        self.client.get("/api/pos/bootstrap/")
+
+        # sesión + usuario + grupos
+        with self.assertMaxConsultas(3):
+            response = self.client.get("/api/pos/bootstrap/")
+
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertIn("max-age=", response["Cache-Control"])
+
+    def test_cajero_no_ve_precio_de_compra_y_admin_si(self):
+        data = self.client.get("/api/pos/bootstrap/").json()
+        self.assertNotIn("precio_compra", data["productos"][0])
+
+        self.user.groups.add(Group.objects.get(name="Admin"))
+        data = self.client.get("/api/pos/bootstrap/").json()
+
+        self.assertEqual(data["rol"], "admin")
+        self.assertEqual(data["productos"][0]["precio_compra"], "1000.00")
+
+    def test_usuario_sin_rol_de_caja_recibe_403(self):
+        self.user.groups.clear()
+
+        response = self.client.get("/api/pos/bootstrap/")
+
+        self.assertEqual(response.status_code, 403)
+
+
+class StreamingListadosVentasTests(BaseApiReportesTestCase):
+    """
+    ?stream=1 en /api/pos/productos/ y en los reportes con listas.
+    """
+
+    def _cuerpo(self, response):
+        self.assertTrue(response.streaming)
+        return json.loads(b"".join(response.streaming_content))
+
+    def test_reporte_por_dia_en_streaming_igual_al_normal(self):
+        params = {
+            "fecha_desde": self.ayer.date().isoformat(),
+            "fecha_hasta": self.hoy.date().isoformat(),
+        }
+        normal = self.client.get("/api/reportes/ventas-por-dia/", params).json()
+
+        datos = self._cuerpo(
+            self.client.get("/api/reportes/ventas-por-dia/", {**params, "stream": "1"})
+        )
+
+        self.assertEqual(datos, normal)
+        self.assertEqual(len(datos["dias"]), 2)
+
+    def test_limit_grande_activa_el_streaming(self):
+        response = self.client.get("/api/reportes/productos-mas-vendidos/", {"limit": 5000})
+
+        datos = self._cuerpo(response)
+        self.assertIn("rango", datos)
+        self.assertIsInstance(datos["productos"], list)
+
+        response = self.client.get("/api/reportes/productos-mas-vendidos/", {"limit": 10})
+        self.assertFalse(response.streaming)
+
+    def test_productos_pos_en_streaming(self):
+        normal = self.client.get("/api/pos/productos/").json()
+
+        datos = self._cuerpo(self.client.get("/api/pos/productos/", {"stream": "1"}))
+
+        self.assertEqual(datos, normal)
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import api_ventas, api_reportes
+from . import api_ventas, api_reportes, api_productos, api_pos
 
 urlpatterns = [
     # Crear venta
@@ -9,6 +9,20 @@ urlpatterns = [
         name="api_crear_venta",
     ),
 
+    # Crear varias ventas de una vez (sincronización de cajas)
+    path(
+        "ventas/lote/",
+        api_ventas.crear_ventas_lote,
+        name="api_crear_ventas_lote",
+    ),
+
+    # Anular varias ventas (devuelve stock y revierte crédito)
+    path(
+        "ventas/anular/",
+        api_ventas.anular_ventas_api,
+        name="api_anular_ventas",
+    ),
+
     # Estadísticas de hoy 
     path(
         "ventas/estadisticas/hoy/",
@@ -16,6 +30,34 @@ urlpatterns = [
         name="api_estadisticas_hoy",
     ),
 
+    # Datos iniciales de la caja en una sola respuesta
+    path(
+        "pos/bootstrap/",
+        api_pos.bootstrap,
+        name="api_pos_bootstrap",
+    ),
+
+    # Productos activos para la caja (con búsqueda ?q=)
+    path(
+        "pos/productos/",
+        api_productos.lista_productos,
+        name="api_pos_productos",
+    ),
+
+    # Lector de código de barras de la caja
+    path(
+        "pos/scan/<str:codigo>/",
+        api_productos.scan_producto,
+        name="api_pos_scan",
+    ),
+
+    # Sugerencias mientras se escribe (?q=)
+    path(
+        "pos/sugerencias/",
+        api_productos.sugerencias_productos,
+        name="api_pos_sugerencias",
+    ),
+
     # Reporte resumen de ventas
     path(
         "reportes/ventas-resumen/",
@@ -0,0 +1,52 @@
+"""
+Utilidades compartidas por los comandos bench_* (pruebas de carga).
+"""
+
+import math
+import subprocess
+
+from django.conf import settings
+
+
+def percentil(valores, p):
+    """
+    Percentil por rango más cercano (valores ya ordenados).
+    """
+    if not valores:
+        return None
+    indice = max(0, math.ceil(p / 100 * len(valores)) - 1)
+    return valores[min(indice, len(valores) - 1)]
+
+
+def milisegundos(segundos):
+    return round(segundos * 1000, 3) if segundos is not None else None
+
+
+def resumen_latencias(segundos):
+    """
+    p50/p95/p99/max en milisegundos de una lista de duraciones en segundos.
+    """
+    ordenadas = sorted(segundos)
+    return {
+        "p50": milisegundos(percentil(ordenadas, 50)),
+        "p95": milisegundos(percentil(ordenadas, 95)),
+        "p99": milisegundos(percentil(ordenadas, 99)),
+        "max": milisegundos(ordenadas[-1] if ordenadas else None),
+    }
+
+
+def commit_actual():
+    """
+    Hash del commit actual (para comparar corridas entre commits), o None.
+    """
+    try:
+        salida = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=settings.BASE_DIR,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return salida.stdout.strip() or None
@@ -0,0 +1,86 @@
+"""
+GET condicional (ETag / 304 Not Modified) para la API.
+
+El ETag de un listado no se calcula sobre el cuerpo (eso obliga a armarlo
+entero) sino sobre una huella barata de las tablas que lo componen: el
+último actualizado_en y la cantidad de filas, en un solo SELECT que usa el
+índice de actualizado_en. Si nada cambió, la vista ni se ejecuta: se
+responde 304 sin leer ni serializar filas.
+
+- Un alta o una modificación mueve el último actualizado_en.
+- Una baja cambia la cantidad de filas.
+- Los parámetros de la URL (q, fields, limit, cursor...) y la cabecera
+  Accept entran al ETag: cada combinación se valida por separado.
+
+Por eso todo lo que cambie datos de un listado debe tocar actualizado_en,
+incluidos los update() y bulk_update() (auto_now no se aplica solo ahí).
+"""
+
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, quote_etag
+
+# Subir al cambiar el formato de las respuestas: invalida los ETag que
+# tengan guardados los clientes
+VERSION_RESPUESTAS = 1
+
+
+def huella_tabla(qs):
+    """
+    (último actualizado_en, cantidad de filas) de qs.
+    """
+    datos = qs.aggregate(ultimo=Max("actualizado_en"), filas=Count("pk"))
+    return datos["ultimo"], datos["filas"]
+
+
+def calcular_etag(*partes):
+    texto = "|".join(
+        "" if p is None else p.isoformat() if hasattr(p, "isoformat") else str(p)
+        for p in (VERSION_RESPUESTAS, *partes)
+    )
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()[:32]
+
+
+def etag_de_tablas(*modelos):
+    """
+    Función de ETag para @condicional: huella de cada modelo + la URL pedida
+    + Accept (el mismo listado puede pedirse en otro formato).
+    """
+    def etag(request, *args, **kwargs):
+        partes = [request.get_full_path(), request.headers.get("Accept", "")]
+        for modelo in modelos:
+            partes.extend(huella_tabla(modelo._default_manager.all()))
+        return calcular_etag(*partes)
+    return etag
+
+
+def condicional(etag_func):
+    """
+    Como django.views.decorators.http.condition, pero solo para GET/HEAD
+    (un POST a la misma URL no paga la consulta del ETag) y sin poner ETag
+    en respuestas de error, para que un 400 o 404 no quede validado.
+
+    etag_func(request, *args, **kwargs) devuelve el ETag, o None si no
+    aplica (la vista responde normalmente).
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return vista(request, *args, **kwargs)
+
+            etag = etag_func(request, *args, **kwargs)
+            if etag is None:
+                return vista(request, *args, **kwargs)
+            etag = quote_etag(etag)
+
+            respuesta = get_conditional_response(request, etag=etag)
+            if respuesta is None:
+                respuesta = vista(request, *args, **kwargs)
+                if respuesta.status_code == 200:
+                    respuesta.headers.setdefault("ETag", etag)
+            return respuesta
+        return envoltura
+    return decorador
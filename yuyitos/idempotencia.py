@@ -0,0 +1,117 @@
+"""
+Soporte para la cabecera Idempotency-Key en los POST de ventas y abonos.
+
+Si una caja reintenta un POST (por ejemplo, después de un timeout) con la
+misma Idempotency-Key, se devuelve la respuesta guardada del primer intento
+sin volver a ejecutar la vista ni tocar el ORM.
+
+Las respuestas se guardan en el caché "idempotencia" (ver CACHES en
+settings.py), en la base de datos para que todos los workers vean las
+mismas claves. Ese caché es acotado (MAX_ENTRIES) y cada entrada expira
+después de TIMEOUT segundos; purgar_idempotencia borra las vencidas.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+
+CABECERA = "HTTP_IDEMPOTENCY_KEY"
+ALIAS_CACHE = "idempotencia"
+
+# Largo máximo aceptado para la clave enviada por el cliente
+LARGO_MAXIMO_CLAVE = 255
+
+# Cuánto dura la marca de "solicitud en curso" si la vista nunca termina
+SEGUNDOS_EN_CURSO = 60
+
+
+def almacen():
+    return caches[ALIAS_CACHE]
+
+
+def _llave(request, clave):
+    """
+    La clave se separa por ruta y usuario, para que dos cajas distintas
+    no choquen si generan la misma Idempotency-Key.
+    """
+    usuario = request.user.pk if request.user.is_authenticated else "anonimo"
+    base = f"{request.path}|{usuario}|{clave}"
+    return "idem:" + hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+
+def _respuesta_guardada(guardada):
+    response = HttpResponse(
+        guardada["contenido"],
+        status=guardada["status"],
+        content_type=guardada["content_type"],
+    )
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotente(vista):
+    """
+    Decorador para vistas POST que respeta la cabecera Idempotency-Key.
+
+    - Sin cabecera: la vista se ejecuta normalmente.
+    - Primera vez con la clave: se ejecuta la vista y se guarda la respuesta
+      (salvo errores 5xx, que se pueden reintentar).
+    - Reintento con la misma clave y el mismo cuerpo: se devuelve la
+      respuesta guardada con la cabecera Idempotent-Replayed: true.
+    - Misma clave con otro cuerpo: 422.
+    - Misma clave mientras el primer intento sigue en curso: 409.
+    """
+
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        clave = request.META.get(CABECERA, "").strip()
+        if not clave:
+            return vista(request, *args, **kwargs)
+
+        if len(clave) > LARGO_MAXIMO_CLAVE:
+            return JsonResponse(
+                {"error": f"La Idempotency-Key no puede superar {LARGO_MAXIMO_CLAVE} caracteres."},
+                status=400,
+            )
+
+        cache = almacen()
+        llave = _llave(request, clave)
+        huella = hashlib.sha256(request.body).hexdigest()
+
+        guardada = cache.get(llave)
+        if guardada is not None:
+            if guardada["huella"] != huella:
+                return JsonResponse(
+                    {"error": "La Idempotency-Key ya se usó con un cuerpo distinto."},
+                    status=422,
+                )
+            return _respuesta_guardada(guardada)
+
+        llave_en_curso = llave + ":en_curso"
+        if not cache.add(llave_en_curso, True, timeout=SEGUNDOS_EN_CURSO):
+            return JsonResponse(
+                {"error": "Ya hay una solicitud en curso con esta Idempotency-Key."},
+                status=409,
+            )
+
+        try:
+            response = vista(request, *args, **kwargs)
+
+            if response.status_code < 500 and not response.streaming:
+                cache.set(
+                    llave,
+                    {
+                        "huella": huella,
+                        "status": response.status_code,
+                        "content_type": response.get("Content-Type", "application/json"),
+                        "contenido": response.content,
+                    },
+                )
+        finally:
+            cache.delete(llave_en_curso)
+
+        return response
+
+    return envoltura
@@ -0,0 +1,82 @@
+"""
+Presupuesto de SQL por solicitud.
+
+PresupuestoSQLMiddleware cuenta las consultas y el tiempo de BD de cada
+request (con connection.execute_wrapper, sin depender de DEBUG) y deja un
+warning en el logger "yuyitos.sql" cuando se pasa del presupuesto:
+
+- SQL_PRESUPUESTO_CONSULTAS: máximo de consultas por request
+- SQL_PRESUPUESTO_MS: máximo de milisegundos de BD por request
+- SQL_CABECERAS: si es True agrega X-DB-Queries y X-DB-Time a la respuesta
+
+Las consultas que se ejecutan mientras se consume una respuesta en
+streaming quedan fuera de la medición.
+"""
+
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("yuyitos.sql")
+
+
+class MedidorSQL:
+    """
+    execute_wrapper que acumula la cantidad de consultas y su duración.
+    """
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos += time.perf_counter() - inicio
+            self.consultas += 1
+
+    @property
+    def milisegundos(self):
+        return self.segundos * 1000
+
+
+class PresupuestoSQLMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        medidor = MedidorSQL()
+        with ExitStack() as stack:
+            for conexion in connections.all():
+                stack.enter_context(conexion.execute_wrapper(medidor))
+            response = self.get_response(request)
+
+        # Se leen en cada request para que override_settings funcione en tests
+        max_consultas = getattr(settings, "SQL_PRESUPUESTO_CONSULTAS", None)
+        max_ms = getattr(settings, "SQL_PRESUPUESTO_MS", None)
+
+        excedido = (max_consultas is not None and medidor.consultas > max_consultas) or (
+            max_ms is not None and medidor.milisegundos > max_ms
+        )
+        if excedido:
+            logger.warning(
+                "Presupuesto SQL excedido en %s %s: %d consultas, %.1f ms "
+                "(máximo %s consultas, %s ms)",
+                request.method,
+                request.path,
+                medidor.consultas,
+                medidor.milisegundos,
+                max_consultas,
+                max_ms,
+            )
+
+        if getattr(settings, "SQL_CABECERAS", False):
+            response["X-DB-Queries"] = str(medidor.consultas)
+            response["X-DB-Time"] = f"{medidor.milisegundos:.1f}ms"
+
+        return response
@@ -0,0 +1,50 @@
+"""
+Paginación por cursor (keyset) para los listados de la API.
+
+En vez de OFFSET, el cursor guarda los valores de orden de la última fila
+entregada; la página siguiente se pide con un WHERE sobre esos valores, que
+usa el índice y no se desordena si se agregan o borran filas entremedio.
+
+El cursor viaja como texto opaco: JSON en base64 (url-safe, sin relleno).
+"""
+
+import base64
+import binascii
+import json
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(valores):
+    """
+    dict -> texto para devolver como "next".
+    """
+    crudo = json.dumps(valores, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(crudo).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(texto):
+    """
+    Texto recibido en ?cursor= -> dict. Lanza CursorInvalido si no se puede leer.
+    """
+    try:
+        relleno = "=" * (-len(texto) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(texto + relleno))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise CursorInvalido("El cursor no es válido.")
+    if not isinstance(valores, dict):
+        raise CursorInvalido("El cursor no es válido.")
+    return valores
+
+
+def leer_limite(request, por_defecto, maximo):
+    """
+    ?limit= acotado entre 1 y maximo (por_defecto si no viene o no es número).
+    """
+    try:
+        limite = int(request.GET.get("limit", por_defecto))
+    except (TypeError, ValueError):
+        limite = por_defecto
+    return max(1, min(limite, maximo))
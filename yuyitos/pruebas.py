@@ -0,0 +1,34 @@
+"""
+Ayudas para los tests de las apps.
+
+PresupuestoConsultasMixin agrega assertMaxConsultas() a un TestCase, para
+fijar cuántas consultas puede hacer como máximo un endpoint. A diferencia
+de assertNumQueries, no falla si el endpoint mejora; solo si empeora.
+
+    class MisTests(PresupuestoConsultasMixin, TestCase):
+        def test_listado(self):
+            with self.assertMaxConsultas(3):
+                self.client.get("/api/productos/")
+"""
+
+from contextlib import contextmanager
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+class PresupuestoConsultasMixin:
+    @contextmanager
+    def assertMaxConsultas(self, maximo, using="default"):
+        with CaptureQueriesContext(connections[using]) as contexto:
+            yield contexto
+
+        ejecutadas = len(contexto.captured_queries)
+        if ejecutadas > maximo:
+            detalle = "\n".join(
+                f"{n}. {consulta['sql']}"
+                for n, consulta in enumerate(contexto.captured_queries, start=1)
+            )
+            self.fail(
+                f"Se ejecutaron {ejecutadas} consultas, el presupuesto es {maximo}:\n{detalle}"
+            )
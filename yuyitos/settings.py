@@ -51,6 +51,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "yuyitos.middleware.PresupuestoSQLMiddleware",  # cuenta consultas por request
     "whitenoise.middleware.WhiteNoiseMiddleware",  # <- para archivos estáticos en Render
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -88,12 +89,18 @@ WSGI_APPLICATION = "yuyitos.wsgi.application"
 # Más adelante, cuando tengamos MariaDB/MySQL en la nube, definimos DB_* en Render
 # y usará esa base remota.
 
+# SQLite no tiene SELECT ... FOR UPDATE: con IMMEDIATE cada transacción
+# toma el bloqueo de escritura al empezar, así dos cajas que mueven el mismo
+# saldo se turnan en vez de pisarse (ver clientes/libro_credito.py).
+_OPCIONES_SQLITE = {"transaction_mode": "IMMEDIATE", "timeout": 20}
+
 if "RENDER" in os.environ and not os.environ.get("DB_HOST"):
     # Modo Render sin DB configurada -> SQLite
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
+            "OPTIONS": _OPCIONES_SQLITE,
         }
     }
 else:
@@ -118,9 +125,82 @@ if "test" in sys.argv:
     DATABASES["default"] = {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db_test.sqlite3",
+        "OPTIONS": _OPCIONES_SQLITE,
     }
 
 
+# =========================
+# Caché
+# =========================
+# "idempotencia" guarda las respuestas de los POST con Idempotency-Key
+# (ver yuyitos/idempotencia.py) y la marca de "solicitud en curso". Tiene que
+# ser compartido por todos los workers: si cada proceso tuviera el suyo, un
+# reintento que cae en otro worker volvería a registrar la venta. Por eso es
+# un caché en la base de datos (tabla creada con
+# "python manage.py createcachetable"), acotado a MAX_ENTRIES y con
+# expiración TIMEOUT. Las entradas vencidas se borran con purgar_idempotencia.
+
+IDEMPOTENCIA_TTL = int(os.environ.get("IDEMPOTENCIA_TTL", 60 * 60 * 24))
+IDEMPOTENCIA_MAX_ENTRADAS = int(os.environ.get("IDEMPOTENCIA_MAX_ENTRADAS", 10000))
+
+_CACHE_IDEMPOTENCIA = {
+    "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+    "LOCATION": "cache_idempotencia",
+    "TIMEOUT": IDEMPOTENCIA_TTL,
+    "OPTIONS": {"MAX_ENTRIES": IDEMPOTENCIA_MAX_ENTRADAS},
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "yuyitos",
+    },
+    "idempotencia": _CACHE_IDEMPOTENCIA,
+}
+
+
+# Caché en memoria del lector de código de barras (ver inventario/cache.py).
+# Es por proceso: el TTL acota cuánto puede quedar desactualizado un worker.
+
+POS_CACHE_MAX_ENTRADAS = int(os.environ.get("POS_CACHE_MAX_ENTRADAS", 5000))
+POS_CACHE_TTL = int(os.environ.get("POS_CACHE_TTL", 30))
+
+# Categorías en memoria de cada worker (ver inventario/cache.py): segundos
+# que un worker puede tardar en ver un cambio hecho en otro proceso.
+POS_CATEGORIAS_TTL = int(os.environ.get("POS_CATEGORIAS_TTL", 300))
+
+# Índice de sugerencias de la caja (ver inventario/sugerencias.py): cada
+# cuántos segundos un worker relee de la BD los productos modificados.
+POS_SUGERENCIAS_REFRESCO = int(os.environ.get("POS_SUGERENCIAS_REFRESCO", 5))
+
+# Cuánto puede tardar en confirmarse una transacción después de fijar
+# actualizado_en (la fila se ve recién al confirmar). La sincronización del
+# catálogo (/api/catalogo/) y la revisión de sugerencias releen lo grabado en
+# este margen, así que debe cubrir la espera por bloqueos (timeout de
+# _OPCIONES_SQLITE, 20 s; innodb_lock_wait_timeout en MySQL, 50 s por
+# defecto) más la transacción más larga (un lote de 500 ventas).
+MARGEN_CONFIRMACION_SEGUNDOS = int(os.environ.get("MARGEN_CONFIRMACION_SEGUNDOS", 120))
+
+# /api/pos/bootstrap/ (ver ventas/api_pos.py): segundos que se reutiliza la
+# respuesta de cada rol, en el caché "default" y en el navegador.
+POS_BOOTSTRAP_TTL = int(os.environ.get("POS_BOOTSTRAP_TTL", 5))
+
+# Informe de antigüedad de deuda (ver clientes/antiguedad.py): segundos que
+# se reutiliza cada página en el caché "default". Cada movimiento de crédito
+# la invalida en el proceso que lo asienta; el TTL acota a los demás workers.
+CREDITO_ANTIGUEDAD_TTL = int(os.environ.get("CREDITO_ANTIGUEDAD_TTL", 300))
+
+
+# Presupuesto de SQL por request (ver yuyitos/middleware.py).
+# Las solicitudes que lo exceden se registran en el logger "yuyitos.sql".
+
+SQL_PRESUPUESTO_CONSULTAS = int(os.environ.get("SQL_PRESUPUESTO_CONSULTAS", 30))
+SQL_PRESUPUESTO_MS = float(os.environ.get("SQL_PRESUPUESTO_MS", 200))
+
+# Cabeceras X-DB-Queries / X-DB-Time en las respuestas (por defecto solo con DEBUG)
+SQL_CABECERAS = os.environ.get("SQL_CABECERAS", str(DEBUG)) == "True"
+
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -0,0 +1,88 @@
+"""
+Respuestas JSON en streaming para listados grandes.
+
+JsonResponse necesita la lista completa de resultados en memoria (las filas,
+los dicts y el texto JSON) antes de enviar el primer byte. Con ?stream=1 las
+vistas de listados responden con respuesta_json_streaming: se recorre un
+iterador (normalmente QuerySet.iterator(chunk_size=...)) y se envía de a
+trozos, así que la memoria del worker no crece con la cantidad de filas.
+
+El cuerpo es el mismo JSON, salvo que "count" va al final (se conoce recién
+al terminar). Si la BD falla a mitad de camino la respuesta queda cortada:
+el cliente lo nota porque el JSON no cierra.
+
+En MySQL, mysqlclient trae igual todas las filas del SELECT a memoria (no
+tiene cursores del lado del servidor); lo que se ahorra son los objetos y
+el texto JSON de cada fila.
+"""
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+# Elementos por trozo enviado y por lectura de QuerySet.iterator()
+FILAS_POR_TROZO = 1000
+
+# Con un limit mayor que esto la respuesta va en streaming aunque no se
+# pida ?stream=1
+UMBRAL_STREAMING = 1000
+
+
+def quiere_streaming(request, limite=None):
+    """
+    True si se pidió ?stream=1 o una página de más de UMBRAL_STREAMING filas.
+    """
+    if request.GET.get("stream", "").lower() in ("1", "true"):
+        return True
+    return limite is not None and limite > UMBRAL_STREAMING
+
+
+def iterar(filas):
+    """
+    QuerySet -> iterator(chunk_size=FILAS_POR_TROZO) (sin caché de resultados);
+    cualquier otro iterable se devuelve tal cual.
+    """
+    if hasattr(filas, "iterator"):
+        return filas.iterator(chunk_size=FILAS_POR_TROZO)
+    return filas
+
+
+def trozos(elementos, por_trozo):
+    trozo = []
+    for elemento in elementos:
+        trozo.append(elemento)
+        if len(trozo) == por_trozo:
+            yield trozo
+            trozo = []
+    if trozo:
+        yield trozo
+
+
+def json_por_trozos(encabezado, clave, elementos, contar="count", encoder=None, por_trozo=None):
+    """
+    Bytes de {**encabezado, clave: [elementos...], contar: N}, de a
+    por_trozo elementos (sin contar si contar es None).
+    """
+    codificar = (encoder or DjangoJSONEncoder(ensure_ascii=False)).encode
+    inicio = codificar({**encabezado, clave: []})
+
+    # el encabezado, sin la lista vacía ni el "}" final
+    yield inicio[: inicio.rindex("[")].encode("utf-8") + b"["
+    total = 0
+    separador = ""
+    for trozo in trozos(elementos, por_trozo or FILAS_POR_TROZO):
+        # el trozo como lista JSON, sin los corchetes
+        yield (separador + codificar(trozo)[1:-1]).encode("utf-8")
+        separador = ","
+        total += len(trozo)
+    fin = "]" if contar is None else f"],{codificar(contar)}:{total}"
+    yield (fin + "}").encode("utf-8")
+
+
+def respuesta_json_streaming(elementos, encabezado=None, clave="results", contar="count"):
+    """
+    StreamingHttpResponse con json_por_trozos (ver el docstring del módulo).
+    """
+    return StreamingHttpResponse(
+        json_por_trozos(encabezado or {}, clave, elementos, contar),
+        content_type="application/json",
+    )